@@ -0,0 +1,310 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+from core_symbol import CORE_SYMBOL
+from testUtils import Utils
+from testUtils import Account
+from Node import Node
+from Node import BlockType
+from RpcClient import AsyncRpcClient
+from RpcClient import RpcClient
+from RpcClient import RpcError
+from BlockCache import BlockCache
+from BlockFollower import BlockFollower
+
+###########################################################################################
+class AsyncNode(object):
+    """asyncio counterpart of Node, for driving many outstanding requests against a node from one process. Everything
+    goes over HTTP: queries to nodeos, signing to keosd (walletMgr). Results have the same structure as Node's, so the
+    Node static helpers (getTransId, validateTransaction, currencyStrToInt, ...) apply to them unchanged."""
+
+    # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-arguments
+    def __init__(self, host, port, walletMgr=None, maxConnections=64):
+        self.host=host
+        self.port=port
+        self.endpointHttp="http://%s:%d" % (self.host, self.port)
+        self.rpc=AsyncRpcClient(self.host, self.port, maxConnections=maxConnections)
+        self.walletMgr=walletMgr
+        self.__walletRpc=None
+        self.maxConnections=maxConnections
+        self.infoValid=None
+        self.lastRetrievedHeadBlockNum=None
+        self.lastRetrievedLIB=None
+        self.blockSamples=deque(maxlen=Node.BlockSampleCount)
+        self.blockCache=BlockCache()
+        self.transBlockHints={}     # transaction id -> block num the node reported applying it in
+
+    @staticmethod
+    def fromNode(node, maxConnections=64):
+        return AsyncNode(node.host, node.port, walletMgr=node.walletMgr, maxConnections=maxConnections)
+
+    def __str__(self):
+        return "Host: %s, Port:%d" % (self.host, self.port)
+
+    def walletRpc(self):
+        assert self.walletMgr is not None, print("ERROR: %s has no wallet manager to sign transactions with" % (self))
+        if self.__walletRpc is None or self.__walletRpc.host != self.walletMgr.host or self.__walletRpc.port != self.walletMgr.port:
+            if self.__walletRpc is not None:
+                self.__walletRpc.close()
+            self.__walletRpc=AsyncRpcClient(self.walletMgr.host, self.walletMgr.port, maxConnections=self.maxConnections)
+        return self.__walletRpc
+
+    def close(self):
+        self.rpc.close()
+        if self.__walletRpc is not None:
+            self.__walletRpc.close()
+
+    async def processRpcCmd(self, path, params, cmdDesc, silentErrors=True, exitOnError=False, exitMsg=None):
+        """Async Node.processRpcCmd. Returns the decoded json response, or None on error."""
+        exitMsg=Node.startRpcCmd(self.endpointHttp, path, params, exitMsg)
+        start=time.perf_counter()
+        try:
+            ret=await self.rpc.call(path, params)
+        except RpcError as ex:
+            Node.reportRpcCmdError(ex, cmdDesc, time.perf_counter()-start, silentErrors, exitOnError, exitMsg)
+            return None
+        return Node.checkRpcCmdResult(ret, cmdDesc, time.perf_counter()-start, exitOnError, exitMsg)
+
+    async def getInfo(self, silentErrors=False, exitOnError=False):
+        info=await self.processRpcCmd(RpcClient.ChainApi + "get_info", None, "get info", silentErrors=silentErrors, exitOnError=exitOnError)
+        if info is None:
+            self.infoValid=False
+        else:
+            self.infoValid=True
+            self.lastRetrievedHeadBlockNum=int(info["head_block_num"])
+            self.lastRetrievedLIB=int(info["last_irreversible_block_num"])
+            self.blockSamples.append((time.time(), self.lastRetrievedHeadBlockNum, self.lastRetrievedLIB))
+        return info
+
+    async def getBlockNum(self, blockType=BlockType.head):
+        assert isinstance(blockType, BlockType)
+        info=await self.getInfo(silentErrors=True)
+        if info is None:
+            return None
+        return self.lastRetrievedHeadBlockNum if blockType==BlockType.head else self.lastRetrievedLIB
+
+    async def getHeadBlockNum(self):
+        return await self.getBlockNum(BlockType.head)
+
+    async def getIrreversibleBlockNum(self):
+        return await self.getBlockNum(BlockType.lib)
+
+    def estimateBlockWait(self, blockNum, blockType=BlockType.head):
+        return Node.estimateBlockWaitFromSamples(self.blockSamples, blockNum, blockType)
+
+    async def getBlock(self, blockNum, silentErrors=False, exitOnError=False):
+        """Async Node.getBlock, sharing its caching rules: reversible blocks are only served from the cache after
+        confirming the node still has the same block id at that height."""
+        assert(isinstance(blockNum, int))
+        block,revalidate=self.blockCache.lookup(blockNum)
+        if revalidate:
+            block=self.blockCache.revalidate(blockNum, block, await self.getBlockIdByNum(blockNum), self.lastRetrievedLIB)
+        if block is not None:
+            return block
+
+        params={"block_num_or_id": blockNum}
+        msg="(block number=%s)" % (blockNum)
+        block=await self.processRpcCmd(RpcClient.ChainApi + "get_block", params, "get block", silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
+        self.blockCache.addFetched(blockNum, block, self.lastRetrievedLIB)
+        return block
+
+    async def getBlockIdByNum(self, blockNum):
+        params={"block_num_or_id": blockNum}
+        state=await self.processRpcCmd(RpcClient.ChainApi + "get_block_header_state", params, "get block header state")
+        if state is None:
+            return None
+        return state["id"]
+
+    async def getTable(self, contract, scope, table, exitOnError=False):
+        msg="contract=%s, scope=%s, table=%s" % (contract, scope, table)
+        # limit matches the cleos "get table" default
+        params={"json": True, "code": contract, "scope": scope, "table": table, "limit": 10}
+        return await self.processRpcCmd(RpcClient.ChainApi + "get_table_rows", params, "get table", exitOnError=exitOnError, exitMsg=msg)
+
+    async def getTransaction(self, transId, silentErrors=False, exitOnError=False):
+        """history get_transaction, without Node.getTransaction's delayed retries (use waitForTransInBlock to wait)."""
+        assert(isinstance(transId, str))
+        msg="(transaction id=%s)" % (transId)
+        return await self.processRpcCmd(RpcClient.HistoryApi + "get_transaction", {"id": transId}, "get transaction",
+                                        silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
+
+    async def getTransBlockNum(self, transId):
+        """Number of the block on the node's current chain containing transId, or None if it is not in one (yet)."""
+        blockNum=self.transBlockHints.get(transId)
+        if blockNum is None:
+            trans=await self.getTransaction(transId, silentErrors=True)
+            if trans is not None and "block_num" in trans:
+                blockNum=int(trans["block_num"])
+        if blockNum is None:
+            return None
+
+        # the reported block num is only where this node speculatively applied the transaction, so confirm it
+        # against the blocks around it, most likely ones first.
+        headBlockNum=await self.getHeadBlockNum()
+        if headBlockNum is None:
+            return None
+        later=range(blockNum, min(blockNum+Node.TransBlockHintMargin, headBlockNum)+1)
+        earlier=range(min(blockNum-1, headBlockNum), max(blockNum-Node.TransBlockHintMargin, 1)-1, -1)
+        for num in list(later) + list(earlier):
+            block=await self.getBlock(num, silentErrors=True)
+            if block is None:
+                return None
+            if transId in BlockFollower.parseBlock(block)[2]:
+                return num
+        return None
+
+    async def isTransInAnyBlock(self, transId):
+        return await self.getTransBlockNum(transId) is not None
+
+    async def isTransFinalized(self, transId):
+        blockNum=await self.getTransBlockNum(transId)
+        if blockNum is None:
+            return False
+        return self.lastRetrievedLIB is not None and blockNum <= self.lastRetrievedLIB
+
+    @staticmethod
+    async def waitForObj(lam, timeout=None, sleepTime=None, maxSleepTime=None, nextProbe=None):
+        """Utils.waitForObj for a coroutine function lam, on the same schedule. Waiting only suspends the calling task."""
+        delays=Utils.waitDelays(timeout, sleepTime=sleepTime, maxSleepTime=maxSleepTime, nextProbe=nextProbe)
+        while True:
+            ret=await lam()
+            if ret is not None:
+                return ret
+            step=next(delays, None)
+            if step is None:
+                return None
+            delay,remaining=step
+            if Utils.Debug: Utils.Print("async sleep %.3f seconds, remaining time: %d seconds" % (delay, remaining))
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def waitForBool(lam, timeout=None, sleepTime=None, maxSleepTime=None, nextProbe=None):
+        async def myLam():
+            return True if await lam() else None
+        ret=await AsyncNode.waitForObj(myLam, timeout, sleepTime=sleepTime, maxSleepTime=maxSleepTime, nextProbe=nextProbe)
+        return False if ret is None else ret
+
+    def __nextBlockWait(self):
+        if self.lastRetrievedHeadBlockNum is None:
+            return None
+        return self.estimateBlockWait(self.lastRetrievedHeadBlockNum+1)
+
+    async def waitForTransInBlock(self, transId, timeout=None):
+        assert(isinstance(transId, str))
+        return await AsyncNode.waitForBool(lambda: self.isTransInAnyBlock(transId), timeout, nextProbe=self.__nextBlockWait)
+
+    async def waitForTransFinalization(self, transId, timeout=None):
+        assert(isinstance(transId, str))
+        return await AsyncNode.waitForBool(lambda: self.isTransFinalized(transId), timeout)
+
+    async def waitForNextBlock(self, timeout=None, blockType=BlockType.head):
+        num=await self.getBlockNum(blockType=blockType)
+        async def lam():
+            current=await self.getBlockNum(blockType=blockType)
+            return current is not None and num is not None and current > num
+        return await AsyncNode.waitForBool(lam, timeout, nextProbe=lambda: None if num is None else self.estimateBlockWait(num+1, blockType=blockType))
+
+    async def waitForBlock(self, blockNum, timeout=None, blockType=BlockType.head):
+        async def lam():
+            current=await self.getBlockNum(blockType=blockType)
+            return current is not None and current > blockNum
+        return await AsyncNode.waitForBool(lam, timeout, nextProbe=lambda: self.estimateBlockWait(blockNum+1, blockType=blockType))
+
+    async def waitForIrreversibleBlock(self, blockNum, timeout=None, blockType=BlockType.head):
+        return await self.waitForBlock(blockNum, timeout=timeout, blockType=blockType)
+
+    async def waitForTransBlockIfNeeded(self, trans, waitForTransBlock, exitOnError=False):
+        if not waitForTransBlock:
+            return trans
+
+        transId=Node.getTransId(trans)
+        if not await self.waitForTransInBlock(transId):
+            if exitOnError:
+                Utils.cmdError("transaction with id %s never made it to a block" % (transId))
+                Utils.errorExit("Failed to find transaction with id %s in a block before timeout" % (transId))
+            return None
+        return trans
+
+    def trackCmdTransaction(self, trans, ignoreNonTrans=False):
+        if trans is None or (ignoreNonTrans and not Node.isTrans(trans)):
+            return
+        transId=Node.getTransId(trans)
+        blockNum=Node.getTransBlockHint(trans)
+        if Utils.Debug: Utils.Print("  rpc returned transaction id: %s, status: %s, (possible) block num: %s" % (transId, Node.getTransStatus(trans), blockNum))
+        if blockNum is not None:
+            self.transBlockHints[transId]=blockNum
+
+    async def serializeActionData(self, account, action, data):
+        """Returns data (a json string or object) serialized with the contract abi, as hex."""
+        if isinstance(data, str):
+            data=json.loads(data)
+        ret=await self.rpc.chain("abi_json_to_bin", {"code": account, "action": action, "args": data})
+        return ret["binargs"]
+
+    async def pushTransaction(self, actions, contextFreeActions=None, silentErrors=False):
+        """Build, sign (through keosd) and push a transaction of actions (see Node.makeAction). Returns the same
+        tuple as Node.pushMessage: (True, trans) or (False, error output)."""
+        start=time.perf_counter()
+        try:
+            info=await self.rpc.chain("get_info")
+            trx=Node.makeTransaction(actions, info, contextFreeActions=contextFreeActions)
+            wallet=self.walletRpc()
+            availableKeys=await wallet.wallet("get_public_keys")
+            requiredKeys=await self.rpc.chain("get_required_keys", {"transaction": trx, "available_keys": availableKeys})
+            signed=await wallet.wallet("sign_transaction", [trx, requiredKeys["required_keys"], info["chain_id"]])
+            params={"signatures": signed["signatures"], "compression": "none", "packed_context_free_data": "", "transaction": trx}
+            trans=await self.rpc.chain("push_transaction", params)
+            self.trackCmdTransaction(trans, ignoreNonTrans=True)
+            if Utils.Debug:
+                end=time.perf_counter()
+                Utils.Print("push transaction Duration: %.3f sec" % (end-start))
+            return (True, trans)
+        except RpcError as ex:
+            if not silentErrors:
+                end=time.perf_counter()
+                Utils.Print("ERROR: Exception during push transaction.  rpc Duration=%.3f sec.  %s" % (end - start, ex.output))
+            return (False, ex.output)
+
+    async def pushMessage(self, account, action, data, opts, silentErrors=False):
+        """Async Node.pushMessage. opts may only contain -p/--permission and -f/--force-unique."""
+        authorization,forceUnique=Node.parseTransactionOpts(opts)
+        try:
+            hexData=await self.serializeActionData(account, action, data if data is not None else {})
+        except RpcError as ex:
+            if not silentErrors:
+                Utils.Print("ERROR: Exception during push message serialization of %s::%s.  %s" % (account, action, ex.output))
+            return (False, ex.output)
+        contextFreeActions=[Node.makeNonceAction()] if forceUnique else None
+        return await self.pushTransaction([Node.makeAction(account, action, hexData, authorization)], contextFreeActions=contextFreeActions, silentErrors=silentErrors)
+
+    # Trasfer funds. Returns "transfer" json return object
+    async def transferFunds(self, source, destination, amountStr, memo="memo", force=False, waitForTransBlock=False, exitOnError=True):
+        assert isinstance(amountStr, str)
+        assert(source)
+        assert(isinstance(source, Account))
+        assert(destination)
+        assert(isinstance(destination, Account))
+
+        data={"from": source.name, "to": destination.name, "quantity": amountStr, "memo": memo}
+        opts="--permission %s@active%s" % (source.name, " --force-unique" if force else "")
+        success,trans=await self.pushMessage("eosio.token", "transfer", data, opts, silentErrors=not exitOnError)
+        if not success:
+            Utils.Print("ERROR: Exception during funds transfer.  %s" % (trans))
+            if exitOnError:
+                Utils.cmdError("could not transfer \"%s\" from %s to %s" % (amountStr, source, destination))
+                Utils.errorExit("Failed to transfer \"%s\" from %s to %s" % (amountStr, source, destination))
+            return None
+
+        return await self.waitForTransBlockIfNeeded(trans, waitForTransBlock, exitOnError=exitOnError)
+
+    async def getCurrencyBalance(self, contract, account, symbol=CORE_SYMBOL, exitOnError=False):
+        """Async Node.getCurrencyBalance, same output e.g. '99999.9950 CUR\\n'"""
+        msg="contract=%s, account=%s, symbol=%s" % (contract, account, symbol)
+        params={"code": contract, "account": account, "symbol": symbol}
+        balances=await self.processRpcCmd(RpcClient.ChainApi + "get_currency_balance", params, "get currency balance", exitOnError=exitOnError, exitMsg=msg)
+        if balances is None:
+            return None
+        return "".join("%s\n" % (balance) for balance in balances)
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+###########################################################################################
+class BlockCache(object):
+    """In-process cache for Node.getBlock results.
+    Irreversible blocks (block num <= the node's last known lib) are kept until evicted, least recently used first, once
+    maxIrreversible is exceeded. Reversible blocks are kept per block num together with their block id, the caller must
+    confirm the node still has that id at that height before using one."""
+
+    def __init__(self, maxIrreversible=10000, maxReversible=1000):
+        self.maxIrreversible=maxIrreversible
+        self.maxReversible=maxReversible
+        self.__irreversible=OrderedDict()    # block num -> block
+        self.__reversible=OrderedDict()      # block num -> block
+        self.__lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+        self.revalidations=0
+        self.evictions=0
+
+    def __str__(self):
+        return "hits=%d, misses=%d, revalidations=%d, evictions=%d, irreversible=%d, reversible=%d" % (
+            self.hits, self.misses, self.revalidations, self.evictions, len(self.__irreversible), len(self.__reversible))
+
+    def getIrreversible(self, blockNum):
+        with self.__lock:
+            block=self.__irreversible.get(blockNum)
+            if block is not None:
+                self.__irreversible.move_to_end(blockNum)
+            return block
+
+    def getReversible(self, blockNum):
+        with self.__lock:
+            return self.__reversible.get(blockNum)
+
+    def add(self, blockNum, block, lib):
+        """Cache block, permanently if it is at or below lib."""
+        with self.__lock:
+            if lib is not None and blockNum <= lib:
+                self.__reversible.pop(blockNum, None)
+                self.__irreversible[blockNum]=block
+                self.__irreversible.move_to_end(blockNum)
+                while len(self.__irreversible) > self.maxIrreversible:
+                    self.__irreversible.popitem(last=False)
+                    self.evictions+=1
+            else:
+                self.__reversible[blockNum]=block
+                self.__reversible.move_to_end(blockNum)
+                while len(self.__reversible) > self.maxReversible:
+                    self.__reversible.popitem(last=False)
+                    self.evictions+=1
+
+    def lookup(self, blockNum):
+        """First step of a cached getBlock, shared by Node and AsyncNode. Returns (block, False) for a cached
+        irreversible block (counted as a hit), (block, True) for a cached reversible block the caller has to confirm
+        with revalidate, or (None, False)."""
+        block=self.getIrreversible(blockNum)
+        if block is not None:
+            self.recordHit()
+            return (block, False)
+        block=self.getReversible(blockNum)
+        return (block, block is not None)
+
+    def revalidate(self, blockNum, block, blockId, lib):
+        """Returns the reversible block from lookup if the node still has blockId at blockNum (promoting it once it is
+        at or below lib), otherwise discards it and returns None."""
+        if block["id"] == blockId:
+            self.recordHit(revalidated=True)
+            if lib is not None and blockNum <= lib:
+                self.add(blockNum, block, lib)
+            return block
+        self.discardReversible(blockNum)
+        return None
+
+    def addFetched(self, blockNum, block, lib):
+        """Last step of a cached getBlock: count the miss and cache the block fetched from the node, if any."""
+        self.recordMiss()
+        if block is not None:
+            self.add(blockNum, block, lib)
+
+    def discardReversible(self, blockNum):
+        with self.__lock:
+            self.__reversible.pop(blockNum, None)
+
+    def recordHit(self, revalidated=False):
+        with self.__lock:
+            self.hits+=1
+            if revalidated:
+                self.revalidations+=1
+
+    def recordMiss(self):
+        with self.__lock:
+            self.misses+=1
+
+    def stats(self):
+        with self.__lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations, "evictions": self.evictions,
+                    "irreversible": len(self.__irreversible), "reversible": len(self.__reversible)}
+
+    def clear(self):
+        with self.__lock:
+            self.__irreversible.clear()
+            self.__reversible.clear()
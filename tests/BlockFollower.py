@@ -0,0 +1,214 @@
+import threading
+
+from testUtils import Utils
+from StateHistory import WebSocketError
+
+###########################################################################################
+class BlockFollower(object):
+    """Follows one node's chain, fetching every block only once. Keeps block number -> (block id, previous id) for the
+    followed range and a bounded transaction id -> block number index over it. When a newly fetched block does not link
+    to the stored one below it (or the node reports a different head id) the stored blocks are treated as forked out:
+    they are dropped, with their transactions, and refetched from the node's current chain.
+
+    When the node runs the state history plugin (node.stateHistory) new blocks are streamed from it instead of
+    fetched one get block at a time, falling back to get block whenever the stream is behind or broken."""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, node, maxBlocks=10000):
+        self.node=node
+        self.maxBlocks=maxBlocks
+        self.blocks={}          # block num -> (block id, previous block id)
+        self.blockTrxs={}       # block num -> [trx id, ...]
+        self.trxBlocks={}       # trx id -> block num
+        self.firstBlockNum=None
+        self.lastBlockNum=None
+        self.blocksIngested=0
+        self.blocksDropped=0      # followed blocks that turned out to be forked out
+        self.blocksStreamed=0
+        self.__stream=None
+        self.__failedStreamClient=None
+        self.__lock=threading.RLock()
+
+    @staticmethod
+    def parseBlock(block):
+        """Returns (block id, previous block id, [trx ids]) for a block as returned by Node.getBlock (chain api or mongodb)."""
+        if "block_id" in block:
+            # mongodb document
+            blockId=block["block_id"]
+            block=block["block"]
+        else:
+            blockId=block["id"]
+        trxIds=[]
+        for trx in block.get("transactions", []):
+            trxObj=trx["trx"]
+            if isinstance(trxObj, list):
+                # [variant index, value], as in block logs and state history blocks
+                trxObj=trxObj[1]
+            # deferred transactions are only referenced by id
+            trxIds.append(trxObj if isinstance(trxObj, str) else trxObj["id"])
+        return (blockId, block["previous"], trxIds)
+
+    def getTransBlockNum(self, transId):
+        """Block number containing transId, or None if it is not in the followed range."""
+        with self.__lock:
+            return self.trxBlocks.get(transId)
+
+    def getBlockId(self, blockNum):
+        with self.__lock:
+            entry=self.blocks.get(blockNum)
+            return None if entry is None else entry[0]
+
+    def update(self, info=None):
+        """Ingest all blocks up to the node's current head. info is a get info result the caller already has, to not
+        query it again. Returns False if the node could not be queried."""
+        with self.__lock:
+            headBlockId=None
+            if self.node.enableMongo:
+                headBlockNum=self.node.getHeadBlockNum()
+            else:
+                if info is None:
+                    info=self.node.getInfo(silentErrors=True)
+                if info is None:
+                    return False
+                headBlockNum=info["head_block_num"]
+                headBlockId=info["head_block_id"]
+            if headBlockNum is None:
+                return False
+            headBlockNum=int(headBlockNum)
+
+            if self.lastBlockNum is not None and headBlockNum < self.lastBlockNum:
+                # node switched to a shorter fork (or lost blocks on restart)
+                self.__dropFrom(headBlockNum+1)
+            # when starting out, follow from the head. older blocks are only fetched on demand through backfill
+            start=headBlockNum if self.lastBlockNum is None else self.lastBlockNum+1
+            ret=self.__ingestStream(start, headBlockNum)
+            if not ret:
+                start=headBlockNum if self.lastBlockNum is None else self.lastBlockNum+1
+                ret=self.__ingestRange(start, headBlockNum)
+
+            if ret and headBlockId is not None and self.getBlockId(headBlockNum) not in (None, headBlockId):
+                # same height, different block. refetching it walks back down to the fork point.
+                self.__dropFrom(headBlockNum)
+                ret=self.__ingestRange(headBlockNum, headBlockNum)
+
+            self.__trim()
+            return ret
+
+    def backfill(self, fromBlockNum):
+        """Ingest blocks from fromBlockNum up to the start of the followed range."""
+        with self.__lock:
+            if self.firstBlockNum is None and (not self.update() or self.firstBlockNum is None):
+                return False
+            fromBlockNum=max(fromBlockNum, 1)
+            if fromBlockNum >= self.firstBlockNum:
+                return True
+            return self.__ingestRange(fromBlockNum, self.firstBlockNum-1)
+
+    def __ingestRange(self, start, end):
+        num=start
+        while num <= end:
+            block=self.node.getBlock(num, silentErrors=True)
+            if block is None:
+                return False
+            try:
+                blockId,previousId,trxIds=BlockFollower.parseBlock(block)
+            except (TypeError, KeyError) as _:
+                Utils.Print("ERROR: unexpected block structure for block %d. Block: %s" % (num, block))
+                return False
+
+            below=self.blocks.get(num-1)
+            if below is not None and below[0] != previousId:
+                # stored block num-1 was forked out, refetch it from the node's current chain
+                if Utils.Debug: Utils.Print("Fork detected at block %d on %s" % (num-1, self.node))
+                self.__dropFrom(num-1)
+                num=max(num-1, 1)
+                continue
+
+            above=self.blocks.get(num+1)
+            if above is not None and above[1] != blockId:
+                # backfilled block does not link to what we followed before, drop everything above it
+                self.__dropFrom(num+1)
+
+            self.__add(num, blockId, previousId, trxIds)
+            num+=1
+
+        return True
+
+    def __ingestStream(self, start, end):
+        """Ingest blocks from the node's state history stream until end is followed. Returns False if the stream is not
+        available or did not get there, the caller then gets the rest with get block."""
+        client=getattr(self.node, "stateHistory", None)
+        if client is None or client is self.__failedStreamClient or self.node.enableMongo or start > end:
+            return False
+        try:
+            if self.__stream is None:
+                self.__stream=client.blocks(start, idleTimeout=Utils.BlockInterval)
+            while self.lastBlockNum is None or self.lastBlockNum < end:
+                result=next(self.__stream)
+                if result is None:
+                    return False
+                blockNum=result["this_block"]["block_num"]
+                blockId,previousId,trxIds=BlockFollower.parseBlock(dict(result["block"], id=result["this_block"]["block_id"]))
+                stored=self.blocks.get(blockNum)
+                if stored is not None and stored[0] != blockId:
+                    # the node switched forks, the stream starts over at the first block of the new branch
+                    if Utils.Debug: Utils.Print("Fork detected at block %d on %s" % (blockNum, self.node))
+                    self.__dropFrom(blockNum)
+                below=self.blocks.get(blockNum-1)
+                if (below is not None and below[0] != previousId) or (self.lastBlockNum is not None and blockNum > self.lastBlockNum+1):
+                    # does not link to what was followed, let get block sort it out
+                    self.__closeStream()
+                    return False
+                self.__add(blockNum, blockId, previousId, trxIds)
+                self.blocksStreamed+=1
+            return True
+        except (WebSocketError, OSError, StopIteration) as ex:
+            # not tried again until the node is relaunched with a new client
+            Utils.Print("WARNING: state history stream of %s failed, falling back to get block: %s" % (self.node, ex))
+            self.__failedStreamClient=client
+            self.__closeStream()
+            return False
+
+    def __closeStream(self):
+        if self.__stream is not None:
+            self.__stream.close()
+            self.__stream=None
+
+    def __add(self, blockNum, blockId, previousId, trxIds):
+        self.__remove(blockNum)
+        self.blocks[blockNum]=(blockId, previousId)
+        self.blockTrxs[blockNum]=trxIds
+        for trxId in trxIds:
+            self.trxBlocks[trxId]=blockNum
+        self.blocksIngested+=1
+        if self.firstBlockNum is None or blockNum < self.firstBlockNum:
+            self.firstBlockNum=blockNum
+        if self.lastBlockNum is None or blockNum > self.lastBlockNum:
+            self.lastBlockNum=blockNum
+
+    def __remove(self, blockNum):
+        if blockNum not in self.blocks:
+            return
+        del self.blocks[blockNum]
+        for trxId in self.blockTrxs.pop(blockNum, []):
+            if self.trxBlocks.get(trxId) == blockNum:
+                del self.trxBlocks[trxId]
+
+    def __dropFrom(self, blockNum):
+        """Drop every followed block at or above blockNum."""
+        if self.lastBlockNum is None:
+            return
+        for num in range(max(blockNum, self.firstBlockNum), self.lastBlockNum+1):
+            if num in self.blocks:
+                self.blocksDropped+=1
+            self.__remove(num)
+        if blockNum <= self.firstBlockNum:
+            self.firstBlockNum=None
+            self.lastBlockNum=None
+        else:
+            self.lastBlockNum=blockNum-1
+
+    def __trim(self):
+        while self.firstBlockNum is not None and len(self.blocks) > self.maxBlocks:
+            self.__remove(self.firstBlockNum)
+            self.firstBlockNum+=1
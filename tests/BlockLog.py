@@ -0,0 +1,313 @@
+import datetime
+import hashlib
+import mmap
+import os
+import struct
+import zlib
+
+from EosKeys import EosKeys
+from TransactionBuilder import AbiSerializer
+
+###########################################################################################
+class BinaryReader(object):
+    """Reads fc::raw packed values from a buffer, starting at pos."""
+
+    __u16=struct.Struct("<H")
+    __u32=struct.Struct("<I")
+    __u64=struct.Struct("<Q")
+    __i64=struct.Struct("<q")
+
+    def __init__(self, buf, pos=0):
+        self.buf=buf
+        self.pos=pos
+
+    def u8(self):
+        value=self.buf[self.pos]
+        self.pos+=1
+        return value
+
+    def u16(self):
+        value=BinaryReader.__u16.unpack_from(self.buf, self.pos)[0]
+        self.pos+=2
+        return value
+
+    def u32(self):
+        value=BinaryReader.__u32.unpack_from(self.buf, self.pos)[0]
+        self.pos+=4
+        return value
+
+    def u64(self):
+        value=BinaryReader.__u64.unpack_from(self.buf, self.pos)[0]
+        self.pos+=8
+        return value
+
+    def i64(self):
+        value=BinaryReader.__i64.unpack_from(self.buf, self.pos)[0]
+        self.pos+=8
+        return value
+
+    def varuint32(self):
+        value=0
+        shift=0
+        while True:
+            byte=self.buf[self.pos]
+            self.pos+=1
+            value|=(byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value
+            shift+=7
+
+    def raw(self, size):
+        value=bytes(self.buf[self.pos:self.pos+size])
+        self.pos+=size
+        return value
+
+    def bytes(self):
+        return self.raw(self.varuint32())
+
+    def checksum256(self):
+        return self.raw(32).hex()
+
+    def name(self):
+        return AbiSerializer.intToName(self.u64())
+
+    def publicKey(self):
+        keyType=self.u8()
+        assert keyType == 0, "unsupported public key type %d" % (keyType)
+        return EosKeys.publicKeyToString(self.raw(33))
+
+    def signature(self):
+        sigType=self.u8()
+        assert sigType == 0, "unsupported signature type %d" % (sigType)
+        return EosKeys.signatureToString(self.raw(65))
+
+    def array(self, readItem):
+        return [readItem() for _ in range(self.varuint32())]
+
+    def extensions(self):
+        return self.array(lambda: [self.u16(), self.bytes().hex()])
+
+    def blockTimestamp(self):
+        # block_timestamp_type is in half seconds since 2000-01-01
+        return BinaryReader.formatTime(self.u32()*500*1000 + 946684800000*1000)
+
+    def timePointSec(self):
+        return BinaryReader.formatTime(self.u32()*1000000, fraction=False)
+
+    def timePoint(self):
+        return BinaryReader.formatTime(self.i64())
+
+    @staticmethod
+    def formatTime(microseconds, fraction=True):
+        """fc's time format, e.g. 2018-06-01T12:00:00.500"""
+        date=datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=microseconds)
+        if not fraction:
+            return date.strftime("%Y-%m-%dT%H:%M:%S")
+        return date.strftime("%Y-%m-%dT%H:%M:%S.") + "%03d" % (date.microsecond//1000)
+
+###########################################################################################
+class BlockLog(object):
+    """Random access, read only view of a node's blocks.log and blocks.index, both memory mapped. Blocks are only
+    deserialized when asked for, to the dicts eosio-blocklog --as-json-array prints (packed transactions are left
+    packed, see unpackTransaction), so walking a chain of any length with blocks() uses constant memory.
+
+    blocks.log holds a header (version, first block number from version 2 on, genesis state, a totem) followed by each
+    packed signed_block and its own position as uint64; blocks.index holds the uint64 position of every block from the
+    first one on. A node that is still running may not have appended the index entries of its newest blocks yet, those
+    are found through the trailing positions in blocks.log instead."""
+
+    __pos=struct.Struct("<Q")
+    Npos=0xffffffffffffffff
+    TrxStatus=["executed", "soft_fail", "hard_fail", "delayed", "expired"]
+    Compression=["none", "zlib"]
+
+    def __init__(self, blocksDir):
+        self.blocksDir=blocksDir
+        self.__logFile=None
+        self.__log=None
+        self.__indexFile=None
+        self.__index=None
+        self.__extraPositions={}
+        self.version=0
+        self.firstBlockNum=1
+        self.headBlockNum=0
+        self.__genesisPos=0
+        self.__open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @staticmethod
+    def __mmap(path):
+        """(file, read only mmap) of path, or (None, None) if it is missing or empty (which mmap can't map)."""
+        try:
+            f=open(path, "rb")
+        except FileNotFoundError as _:
+            return (None, None)
+        if os.fstat(f.fileno()).st_size == 0:
+            f.close()
+            return (None, None)
+        return (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __open(self):
+        self.__logFile,self.__log=BlockLog.__mmap(os.path.join(self.blocksDir, "blocks.log"))
+        if self.__log is None:
+            return
+        reader=BinaryReader(self.__log)
+        self.version=reader.u32()
+        assert 1 <= self.version <= 2, "unsupported block log version %d in %s" % (self.version, self.blocksDir)
+        if self.version > 1:
+            self.firstBlockNum=reader.u32()
+        self.__genesisPos=reader.pos
+
+        headPos=BlockLog.__pos.unpack_from(self.__log, len(self.__log)-8)[0]
+        if headPos == BlockLog.Npos:
+            # only the genesis state, no blocks yet
+            return
+        self.headBlockNum=self.__blockNumAt(headPos)
+
+        self.__indexFile,self.__index=BlockLog.__mmap(os.path.join(self.blocksDir, "blocks.index"))
+        indexed=len(self.__index)//8 if self.__index is not None else 0
+        lastIndexed=self.firstBlockNum+indexed-1
+        if lastIndexed < self.headBlockNum:
+            # walk back from the end of the log to the last indexed block
+            end=len(self.__log)
+            for blockNum in range(self.headBlockNum, lastIndexed, -1):
+                pos=BlockLog.__pos.unpack_from(self.__log, end-8)[0]
+                self.__extraPositions[blockNum]=pos
+                end=pos
+
+    def close(self):
+        for resource in [self.__log, self.__logFile, self.__index, self.__indexFile]:
+            if resource is not None:
+                resource.close()
+        self.__log=self.__logFile=self.__index=self.__indexFile=None
+
+    def __len__(self):
+        return self.headBlockNum-self.firstBlockNum+1 if self.headBlockNum else 0
+
+    def __blockNumAt(self, pos):
+        # the block number is in the previous block id, 4 bytes timestamp + 8 producer + 2 confirmed into the block
+        return int.from_bytes(self.__log[pos+14:pos+18], "big")+1
+
+    def blockPos(self, blockNum):
+        """Position of blockNum in blocks.log, None if the log does not have it."""
+        if not self.firstBlockNum <= blockNum <= self.headBlockNum:
+            return None
+        pos=self.__extraPositions.get(blockNum)
+        if pos is None:
+            pos=BlockLog.__pos.unpack_from(self.__index, 8*(blockNum-self.firstBlockNum))[0]
+        return pos
+
+    def genesis(self):
+        reader=BinaryReader(self.__log, self.__genesisPos)
+        genesis={"initial_timestamp": reader.timePoint(), "initial_key": reader.publicKey()}
+        config={"max_block_net_usage": reader.u64()}
+        for field in ["target_block_net_usage_pct", "max_transaction_net_usage", "base_per_transaction_net_usage", "net_usage_leeway",
+                      "context_free_discount_net_usage_num", "context_free_discount_net_usage_den", "max_block_cpu_usage",
+                      "target_block_cpu_usage_pct", "max_transaction_cpu_usage", "min_transaction_cpu_usage", "max_transaction_lifetime",
+                      "deferred_trx_expiration_window", "max_transaction_delay", "max_inline_action_size"]:
+            config[field]=reader.u32()
+        config["max_inline_action_depth"]=reader.u16()
+        config["max_authority_depth"]=reader.u16()
+        genesis["initial_configuration"]=config
+        return genesis
+
+    def rawBlock(self, blockNum):
+        """The packed signed_block bytes, None if not in the log."""
+        pos=self.blockPos(blockNum)
+        if pos is None:
+            return None
+        end=self.blockPos(blockNum+1) if blockNum < self.headBlockNum else len(self.__log)
+        return self.__log[pos:end-8]
+
+    @staticmethod
+    def __skipHeader(reader):
+        reader.pos+=4+8+2+32*3+4
+        if reader.u8():
+            reader.u32()
+            for _ in range(reader.varuint32()):
+                reader.pos+=8+34
+        for _ in range(reader.varuint32()):
+            reader.u16()
+            reader.pos+=reader.varuint32()
+
+    def blockId(self, blockNum):
+        """Id of blockNum, hashed from its header without deserializing the block."""
+        raw=self.rawBlock(blockNum)
+        if raw is None:
+            return None
+        reader=BinaryReader(raw)
+        BlockLog.__skipHeader(reader)
+        digest=hashlib.sha256(raw[:reader.pos]).digest()
+        return (blockNum.to_bytes(4, "big") + digest[4:]).hex()
+
+    def readBlock(self, blockNum):
+        """blockNum as a dict, with block_num, id and ref_block_prefix added like eosio-blocklog. None if not in the log."""
+        raw=self.rawBlock(blockNum)
+        if raw is None:
+            return None
+        return BlockLog.unpackBlock(raw, blockNum)
+
+    @staticmethod
+    def unpackBlock(raw, blockNum):
+        """Packed signed_block bytes as a dict, see readBlock."""
+        reader=BinaryReader(raw)
+        block={"timestamp": reader.blockTimestamp(), "producer": reader.name(), "confirmed": reader.u16(),
+               "previous": reader.checksum256(), "transaction_mroot": reader.checksum256(), "action_mroot": reader.checksum256(),
+               "schedule_version": reader.u32()}
+        newProducers=None
+        if reader.u8():
+            newProducers={"version": reader.u32(),
+                          "producers": reader.array(lambda: {"producer_name": reader.name(), "block_signing_key": reader.publicKey()})}
+        block["new_producers"]=newProducers
+        block["header_extensions"]=reader.extensions()
+        headerEnd=reader.pos
+        block["producer_signature"]=reader.signature()
+        block["transactions"]=reader.array(lambda: BlockLog.__readReceipt(reader))
+        block["block_extensions"]=reader.extensions()
+
+        blockId=blockNum.to_bytes(4, "big") + hashlib.sha256(raw[:headerEnd]).digest()[4:]
+        return dict({"block_num": blockNum, "id": blockId.hex(), "ref_block_prefix": struct.unpack_from("<I", blockId, 8)[0]}, **block)
+
+    @staticmethod
+    def __readReceipt(reader):
+        receipt={"status": BlockLog.TrxStatus[reader.u8()], "cpu_usage_us": reader.u32(), "net_usage_words": reader.varuint32()}
+        if reader.varuint32() == 0:
+            receipt["trx"]=[0, reader.checksum256()]
+        else:
+            signatures=reader.array(reader.signature)
+            compression=BlockLog.Compression[reader.u8()]
+            packedContextFreeData=reader.bytes()
+            packedTrx=reader.bytes()
+            receipt["trx"]=[1, {"id": hashlib.sha256(BlockLog.__decompress(packedTrx, compression)).hexdigest(),
+                                "signatures": signatures, "compression": compression,
+                                "packed_context_free_data": packedContextFreeData.hex(), "packed_trx": packedTrx.hex()}]
+        return receipt
+
+    @staticmethod
+    def __decompress(data, compression):
+        return zlib.decompress(data) if compression == "zlib" else data
+
+    @staticmethod
+    def unpackTransaction(packedTrx):
+        """The transaction (action data left hex) of a packed transaction dict as in readBlock's receipts."""
+        reader=BinaryReader(BlockLog.__decompress(bytes.fromhex(packedTrx["packed_trx"]), packedTrx["compression"]))
+        def readAction():
+            return {"account": reader.name(), "name": reader.name(),
+                    "authorization": reader.array(lambda: {"actor": reader.name(), "permission": reader.name()}),
+                    "data": reader.bytes().hex()}
+        return {"expiration": reader.timePointSec(), "ref_block_num": reader.u16(), "ref_block_prefix": reader.u32(),
+                "max_net_usage_words": reader.varuint32(), "max_cpu_usage_ms": reader.u8(), "delay_sec": reader.varuint32(),
+                "context_free_actions": reader.array(readAction), "actions": reader.array(readAction),
+                "transaction_extensions": reader.extensions()}
+
+    def blocks(self, first=None, last=None):
+        """Generator of the blocks first through last (default: the whole log), see readBlock."""
+        first=self.firstBlockNum if first is None else max(first, self.firstBlockNum)
+        last=self.headBlockNum if last is None else min(last, self.headBlockNum)
+        for blockNum in range(first, last+1):
+            yield self.readBlock(blockNum)
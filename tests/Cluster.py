@@ -11,6 +11,9 @@ import datetime
 import sys
 import random
 import json
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 from core_symbol import CORE_SYMBOL
 from testUtils import Utils
@@ -18,6 +21,15 @@ from testUtils import Account
 from Node import BlockType
 from Node import Node
 from WalletMgr import WalletMgr
+from MongoSession import MongoSession
+from MongoSession import MongoError
+from RpcClient import RpcError
+from SnapshotCache import SnapshotCache
+from BlockLog import BlockLog
+from EosKeys import EosKeys
+from DivergenceMonitor import DivergenceMonitor
+
+NodeResult=namedtuple("NodeResult", "node result error")
 
 # pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-public-methods
@@ -33,6 +45,16 @@ class Cluster(object):
     __configDir="etc/eosio/"
     __dataDir="var/lib/"
     __fileDivider="================================================================="
+    # worker threads used to query cluster nodes concurrently
+    __fanOutWorkers=32
+    # seconds between get info probes of a starting node in waitForNodesReady
+    readyProbeInterval=0.25
+    # most actions bootstrap packs into one transaction
+    bootstrapActionsPerTrx=50
+    # accounts createAccounts creates per transaction, each with newaccount, buyram, delegatebw and transfer actions
+    accountsPerTrx=10
+    # transactions per push_transactions request of createAccounts, the requests are pushed concurrently
+    createAccountsTrxsPerPush=50
 
     # pylint: disable=too-many-arguments
     # walletd [True|False] Is keosd running. If not load the wallet plugin
@@ -84,6 +106,9 @@ class Cluster(object):
 
         self.useBiosBootFile=False
         self.filesToCleanup=[]
+        self.__executor=None
+        self.__mongoSession=None
+        self.divergenceMonitor=None
 
 
     def setChainStrategy(self, chainSyncStrategy=Utils.SyncReplayTag):
@@ -94,13 +119,61 @@ class Cluster(object):
     def setWalletMgr(self, walletMgr):
         self.walletMgr=walletMgr
 
+    def getExecutor(self):
+        """Thread pool shared by all concurrent cluster operations."""
+        if self.__executor is None:
+            self.__executor=ThreadPoolExecutor(max_workers=Cluster.__fanOutWorkers)
+        return self.__executor
+
+    def runOnNodes(self, func, nodes=None, timeout=None, skipKilled=True):
+        """Call func(node) for each node (default: all cluster nodes) concurrently. Returns a list of NodeResult(node, result, error)
+        in node order, error being the exception func raised, or a TimeoutError if it did not complete within timeout seconds.
+        Killed nodes are skipped unless skipKilled is False."""
+        if nodes is None:
+            nodes=self.nodes
+        nodes=[node for node in nodes if not (skipKilled and node.killed)]
+        executor=self.getExecutor()
+        futures=[executor.submit(func, node) for node in nodes]
+        endTime=None if timeout is None else time.time()+timeout
+        results=[]
+        for node,future in zip(nodes, futures):
+            try:
+                remaining=None if endTime is None else max(endTime-time.time(), 0)
+                results.append(NodeResult(node, future.result(timeout=remaining), None))
+            except FutureTimeoutError as _:
+                future.cancel()
+                results.append(NodeResult(node, None, TimeoutError("%s did not respond within %s seconds" % (node, timeout))))
+            except Exception as ex: # pylint: disable=broad-except
+                results.append(NodeResult(node, None, ex))
+        return results
+
+    def startDivergenceMonitor(self, interval=1.0):
+        """Start checking in the background that all nodes have the same irreversible blocks, see DivergenceMonitor."""
+        if self.divergenceMonitor is None:
+            self.divergenceMonitor=DivergenceMonitor(self, interval)
+        if not self.divergenceMonitor.isRunning():
+            self.divergenceMonitor.start()
+        return self.divergenceMonitor
+
+    def stopDivergenceMonitor(self, raiseOnDivergence=True):
+        """Stop the divergence monitor. Returns the DivergenceError it found (raised instead if raiseOnDivergence), None otherwise."""
+        if self.divergenceMonitor is None:
+            return None
+        self.divergenceMonitor.stop(raiseOnDivergence)
+        return self.divergenceMonitor.error
+
+    def checkDivergence(self):
+        """Raise the DivergenceError the divergence monitor found, if it found one."""
+        if self.divergenceMonitor is not None:
+            self.divergenceMonitor.check()
+
     # launch local nodes and set self.nodes
     # pylint: disable=too-many-locals
     # pylint: disable=too-many-return-statements
     # pylint: disable=too-many-branches
     # pylint: disable=too-many-statements
     def launch(self, pnodes=1, totalNodes=1, prodCount=1, topo="mesh", p2pPlugin="net", delay=1, onlyBios=False, dontBootstrap=False,
-               totalProducers=None, extraNodeosArgs=None, useBiosBootFile=True, specificExtraNodeosArgs=None):
+               totalProducers=None, extraNodeosArgs=None, useBiosBootFile=True, specificExtraNodeosArgs=None, snapshotCacheDir=None):
         """Launch cluster.
         pnodes: producer nodes count
         totalNodes: producer + non-producer nodes count
@@ -116,6 +189,9 @@ class Cluster(object):
           A value of false uses manual bootstrapping in this script, which does not do things like stake votes for producers.
         specificExtraNodeosArgs: dictionary of arguments to pass to a specific node (via --specific-num and
                                  --specific-nodeos flags on launcher), example: { "5" : "--plugin eosio::test_control_api_plugin" }
+        snapshotCacheDir: directory of a SnapshotCache. When it has a bootstrapped chain for this layout, the nodes are
+          started from its snapshot and bootstrap is skipped, otherwise a snapshot is taken after bootstrap and cached.
+          Chain history before the snapshot (e.g. block 1) is not available on nodes started from a snapshot.
         """
         assert(isinstance(topo, str))
 
@@ -162,6 +238,8 @@ class Cluster(object):
             nodeosArgs += extraNodeosArgs
         if Utils.Debug:
             nodeosArgs += " --contracts-console"
+        if snapshotCacheDir is not None:
+            nodeosArgs += " --plugin eosio::producer_api_plugin"
 
         if nodeosArgs:
             cmdArr.append("--nodeos")
@@ -305,11 +383,25 @@ class Cluster(object):
 
         Cluster.__LauncherCmdArr = cmdArr.copy()
 
-        s=" ".join(cmdArr)
-        if Utils.Debug: Utils.Print("cmd: %s" % (s))
-        if 0 != subprocess.call(cmdArr):
-            Utils.Print("ERROR: Launcher failed to launch. failed cmd: %s" % (s))
-            return False
+        cache=None
+        cacheMeta=None
+        if snapshotCacheDir is not None and not dontBootstrap:
+            cache=SnapshotCache(snapshotCacheDir)
+            # everything but the genesis timestamp
+            launcherArgs=[arg for prev,arg in zip([None]+cmdArr, cmdArr) if arg != "-i" and prev != "-i"]
+            bootstrapMode={"onlyBios": onlyBios, "useBiosBootFile": useBiosBootFile, "prodCount": prodCount, "totalProducers": totalProducers}
+            cacheKey,cacheLayout=cache.makeKey(launcherArgs, bootstrapMode)
+            cacheMeta=cache.lookup(cacheKey)
+
+        if cacheMeta is not None:
+            Utils.Print("Starting cluster from cached snapshot %s." % (cache.snapshotPath(cacheKey)))
+            self.__launchFromSnapshot(cache, cacheKey, totalNodes, nodeosArgs, specificExtraNodeosArgs)
+        else:
+            s=" ".join(cmdArr)
+            if Utils.Debug: Utils.Print("cmd: %s" % (s))
+            if 0 != subprocess.call(cmdArr):
+                Utils.Print("ERROR: Launcher failed to launch. failed cmd: %s" % (s))
+                return False
 
         self.nodes=list(range(totalNodes)) # placeholder for cleanup purposes only
 
@@ -321,6 +413,12 @@ class Cluster(object):
 
         self.nodes=nodes
 
+        notReady=self.waitForNodesReady(timeout=Utils.systemWaitTimeout)
+        if notReady:
+            Utils.Print("ERROR: %d %s instances did not respond within %d seconds: %s" %
+                        (len(notReady), Utils.EosServerName, Utils.systemWaitTimeout, ", ".join(str(node.port) for node in notReady)))
+            return False
+
         if onlyBios:
             biosNode=Node(Cluster.__BiosHost, Cluster.__BiosPort, walletMgr=self.walletMgr)
             if not biosNode.checkPulse():
@@ -329,23 +427,38 @@ class Cluster(object):
 
             self.nodes=[biosNode]
 
-        # ensure cluster node are inter-connected by ensuring everyone has block 1
-        Utils.Print("Cluster viability smoke test. Validate every cluster node has block 1. ")
-        if not self.waitOnClusterBlockNumSync(1):
-            Utils.Print("ERROR: Cluster doesn't seem to be in sync. Some nodes missing block 1")
-            return False
+        if cacheMeta is not None:
+            # producers are only in sync once they produce on top of the snapshot
+            targetBlockNum=cacheMeta["head_block_num"]+1
+            Utils.Print("Cluster viability smoke test. Validate every cluster node has block %d. " % (targetBlockNum))
+            if not self.waitOnClusterBlockNumSync(targetBlockNum):
+                Utils.Print("ERROR: Cluster doesn't seem to be in sync. Some nodes missing block %d" % (targetBlockNum))
+                return False
+        else:
+            # ensure cluster node are inter-connected by ensuring everyone has block 1
+            Utils.Print("Cluster viability smoke test. Validate every cluster node has block 1. ")
+            if not self.waitOnClusterBlockNumSync(1):
+                Utils.Print("ERROR: Cluster doesn't seem to be in sync. Some nodes missing block 1")
+                return False
 
         if dontBootstrap:
             Utils.Print("Skipping bootstrap.")
             return True
 
-        Utils.Print("Bootstrap cluster.")
-        if onlyBios or not useBiosBootFile:
+        if cacheMeta is not None:
+            Utils.Print("Skipping bootstrap, chain is bootstrapped in the snapshot.")
+            self.biosNode=Node(Cluster.__BiosHost, Cluster.__BiosPort, walletMgr=self.walletMgr)
+            self.useBiosBootFile=not onlyBios and useBiosBootFile
+            if not self.__restoreWallet(cache.walletKeys(cacheKey)):
+                return False
+        elif onlyBios or not useBiosBootFile:
+            Utils.Print("Bootstrap cluster.")
             self.biosNode=Cluster.bootstrap(totalNodes, prodCount, totalProducers, Cluster.__BiosHost, Cluster.__BiosPort, self.walletMgr, onlyBios)
             if self.biosNode is None:
                 Utils.Print("ERROR: Bootstrap failed.")
                 return False
         else:
+            Utils.Print("Bootstrap cluster.")
             self.useBiosBootFile=True
             self.biosNode=Cluster.bios_bootstrap(totalNodes, Cluster.__BiosHost, Cluster.__BiosPort, self.walletMgr)
             if self.biosNode is None:
@@ -376,8 +489,94 @@ class Cluster(object):
         self.defproduceraAccount=self.defProducerAccounts["defproducera"]
         self.defproducerbAccount=self.defProducerAccounts["defproducerb"]
 
+        if cache is not None and cacheMeta is None:
+            self.__storeSnapshot(cache, cacheKey, cacheLayout)
+
+        return True
+
+    # pylint: disable=too-many-arguments
+    def __launchFromSnapshot(self, cache, cacheKey, totalNodes, nodeosArgs, specificExtraNodeosArgs):
+        """Start the bios and cluster nodes the way the launcher does, but with the config dirs of the cache entry and
+        from its snapshot instead of genesis. Writes the nodeos.pid files discoverLocalNodes reads and the launcher's
+        last_run.json, so killall (eosio-launcher -k) stops these nodes too."""
+        cache.restoreConfig(cacheKey, Cluster.__configDir)
+        snapshot=cache.snapshotPath(cacheKey)
+        runningNodes=[]
+        try:
+            for nodeInstance in ["bios"] + list(range(totalNodes)):
+                nodeName=Cluster.nodeExtensionToName(nodeInstance)
+                dataDir=Cluster.__dataDir + nodeName
+                if os.path.exists(dataDir):
+                    shutil.rmtree(dataDir)
+                os.makedirs(dataDir)
+
+                args=nodeosArgs
+                if nodeInstance == "bios":
+                    # as the launcher does, keep mongo on node 00 only
+                    args=re.sub(r"--plugin +eosio::mongo_db_plugin", "", args)
+                    args=re.sub(r"--mongodb-uri +[^ ]+", "", args)
+                elif specificExtraNodeosArgs is not None:
+                    specificArgs=specificExtraNodeosArgs.get(nodeInstance, specificExtraNodeosArgs.get(str(nodeInstance)))
+                    if specificArgs is not None:
+                        args+=" " + specificArgs
+                if nodeInstance != "bios" and Cluster.__isProducerConfig(Cluster.__configDir + nodeName):
+                    # the snapshot's head block is old, producers would wait for a recent block before producing (the
+                    # bios config already enables stale production)
+                    args+=" --enable-stale-production true"
+
+                cmd="%s %s --config-dir %s --data-dir %s --snapshot %s" % (
+                    Utils.EosServerPath, args, Cluster.__configDir + nodeName, dataDir, snapshot)
+                if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
+                with open(dataDir + "/stdout.txt", "w") as sout, open(dataDir + "/stderr.txt", "w") as serr:
+                    popen=subprocess.Popen(cmd.split(), stdout=sout, stderr=serr)
+                with open(dataDir + "/nodeos.pid", "w") as f:
+                    f.write(str(popen.pid))
+                runningNodes.append({"remote": False, "pid_file": dataDir + "/nodeos.pid", "kill_cmd": ""})
+        finally:
+            # also when a later node failed to start, so the ones already running get killed
+            with open("last_run.json", "w") as f:
+                json.dump({"running_nodes": runningNodes}, f, indent=2)
+
+    @staticmethod
+    def __isProducerConfig(configDir):
+        """Whether the config.ini in configDir has the node produce blocks."""
+        with open(configDir + "/config.ini") as f:
+            return any(line.split("=")[0].strip() == "producer-name" for line in f)
+
+    def __restoreWallet(self, walletKeys):
+        """Set up the ignition wallet bootstrap would have, with the keys recorded in the snapshot cache."""
+        self.walletMgr.killall()
+        self.walletMgr.cleanup()
+        if not self.walletMgr.launch():
+            Utils.Print("ERROR: Failed to launch bootstrap wallet.")
+            return False
+
+        ignWallet=self.walletMgr.create("ignition")
+        accounts=[]
+        for name,privateKey,publicKey in walletKeys:
+            account=Account(name)
+            account.ownerPrivateKey=account.activePrivateKey=privateKey
+            account.ownerPublicKey=account.activePublicKey=publicKey
+            accounts.append(account)
+        if not self.walletMgr.importKeys(accounts, ignWallet):
+            Utils.Print("ERROR: Failed to import account keys into ignition wallet.")
+            return False
         return True
 
+    def __storeSnapshot(self, cache, cacheKey, cacheLayout):
+        """Snapshot the just bootstrapped chain on the bios node and add it to the cache."""
+        start=time.perf_counter()
+        try:
+            snapshot=self.biosNode.rpc.producer("create_snapshot")
+        except RpcError as ex:
+            Utils.Print("WARNING: Failed to create a snapshot of the bootstrapped chain, not caching it. %s" % (ex.output))
+            return
+        headBlockNum=int(snapshot["head_block_id"][0:8], 16)
+        walletKeys=[(self.eosioAccount.name, self.eosioAccount.ownerPrivateKey, self.eosioAccount.ownerPublicKey)]
+        if cache.store(cacheKey, cacheLayout, snapshot["snapshot_name"], Cluster.__configDir, walletKeys, headBlockNum):
+            Utils.Print("Cached snapshot of bootstrapped chain at block %d in %s. Duration: %.3f sec" % (
+                headBlockNum, cache.entryDir(cacheKey), time.perf_counter()-start))
+
     # Initialize the default nodes (at present just the root node)
     def initializeNodes(self, defproduceraPrvtKey=None, defproducerbPrvtKey=None, onlyBios=False):
         port=Cluster.__BiosPort if onlyBios else self.port
@@ -454,18 +653,29 @@ class Cluster(object):
         assert(self.nodes)
 
         def doNodesHaveBlockNum(nodes, targetBlockNum, blockType):
-            for node in nodes:
-                try:
-                    if (not node.killed) and (not node.isBlockPresent(targetBlockNum, blockType=blockType)):
-                        return False
-                except (TypeError) as _:
-                    # This can happen if client connects before server is listening
+            # fail the wait as soon as the nodes are known to have diverged
+            self.checkDivergence()
+            lam = lambda node: node.isBlockPresent(targetBlockNum, blockType=blockType)
+            for nodeResult in self.runOnNodes(lam, nodes, timeout=Utils.rpcTimeout):
+                # errors (TypeError) can happen if client connects before server is listening, rpc and socket errors
+                # (including the timeout) while a node is still starting or catching up; anything else is a bug
+                if nodeResult.error is not None:
+                    if not isinstance(nodeResult.error, (RpcError, OSError, TypeError)):
+                        raise nodeResult.error
+                    return False
+                if not nodeResult.result:
                     return False
 
             return True
 
+        def estimateSyncWait():
+            # the slowest node determines when the whole cluster has the block
+            estimates=[node.estimateBlockWait(targetBlockNum, blockType=blockType) for node in self.nodes if not node.killed]
+            estimates=[e for e in estimates if e is not None]
+            return max(estimates) if estimates else None
+
         lam = lambda: doNodesHaveBlockNum(self.nodes, targetBlockNum, blockType)
-        ret=Utils.waitForBool(lam, timeout)
+        ret=Utils.waitForBool(lam, timeout, nextProbe=estimateSyncWait)
         return ret
 
     @staticmethod
@@ -492,56 +702,27 @@ class Cluster(object):
             raise
 
     @staticmethod
-    def createAccountKeys(count):
+    def createAccountKeys(count, seed=None):
+        """count accounts with random names and owner and active key pairs, generated in process. With a seed the
+        names and keys are the same on every run."""
+        start=time.perf_counter()
+        keyPairs=EosKeys.createKeyPairs(2*count, seed=seed)
+        rand=random.Random("%s/names" % (seed)) if seed is not None else random
         accounts=[]
-        p = re.compile('Private key: (.+)\nPublic key: (.+)\n', re.MULTILINE)
-        for _ in range(0, count):
-            try:
-                cmd="%s create key --to-console" % (Utils.EosClientPath)
-                if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
-                keyStr=Utils.checkOutput(cmd.split())
-                m=p.search(keyStr)
-                if m is None:
-                    Utils.Print("ERROR: Owner key creation regex mismatch")
-                    break
-
-                ownerPrivate=m.group(1)
-                ownerPublic=m.group(2)
-
-                cmd="%s create key --to-console" % (Utils.EosClientPath)
-                if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
-                keyStr=Utils.checkOutput(cmd.split())
-                m=p.match(keyStr)
-                if m is None:
-                    Utils.Print("ERROR: Active key creation regex mismatch")
-                    break
-
-                activePrivate=m.group(1)
-                activePublic=m.group(2)
-
-                name=''.join(random.choice(string.ascii_lowercase) for _ in range(12))
-                account=Account(name)
-                account.ownerPrivateKey=ownerPrivate
-                account.ownerPublicKey=ownerPublic
-                account.activePrivateKey=activePrivate
-                account.activePublicKey=activePublic
-                accounts.append(account)
-                if Utils.Debug: Utils.Print("name: %s, key(owner): ['%s', '%s], key(active): ['%s', '%s']" % (name, ownerPublic, ownerPrivate, activePublic, activePrivate))
-
-            except subprocess.CalledProcessError as ex:
-                msg=ex.output.decode("utf-8")
-                Utils.Print("ERROR: Exception during key creation. %s" % (msg))
-                break
-
-        if count != len(accounts):
-            Utils.Print("Account keys creation failed. Expected %d, actual: %d" % (count, len(accounts)))
-            return None
+        for i in range(count):
+            name=''.join(rand.choice(string.ascii_lowercase) for _ in range(12))
+            account=Account(name)
+            account.ownerPrivateKey,account.ownerPublicKey=keyPairs[2*i]
+            account.activePrivateKey,account.activePublicKey=keyPairs[2*i+1]
+            accounts.append(account)
+            if Utils.Debug and count <= 100: Utils.Print("name: %s, key(owner): ['%s', '%s], key(active): ['%s', '%s']" % (name, account.ownerPublicKey, account.ownerPrivateKey, account.activePublicKey, account.activePrivateKey))
+        if Utils.Debug: Utils.Print("Created keys for %d accounts in %.3f sec" % (count, time.perf_counter()-start))
 
         return accounts
 
     # create account keys and import into wallet. Wallet initialization will be user responsibility
     # also imports defproducera and defproducerb accounts
-    def populateWallet(self, accountsCount, wallet):
+    def populateWallet(self, accountsCount, wallet, seed=None):
         if self.walletMgr is None:
             Utils.Print("ERROR: WalletMgr hasn't been initialized.")
             return False
@@ -549,27 +730,15 @@ class Cluster(object):
         accounts=None
         if accountsCount > 0:
             Utils.Print ("Create account keys.")
-            accounts = self.createAccountKeys(accountsCount)
+            accounts = self.createAccountKeys(accountsCount, seed=seed)
             if accounts is None:
                 Utils.Print("Account keys creation failed.")
                 return False
 
-        Utils.Print("Importing keys for account %s into wallet %s." % (self.defproduceraAccount.name, wallet.name))
-        if not self.walletMgr.importKey(self.defproduceraAccount, wallet):
-            Utils.Print("ERROR: Failed to import key for account %s" % (self.defproduceraAccount.name))
+        if not self.walletMgr.importKeys([self.defproduceraAccount, self.defproducerbAccount] + (accounts or []), wallet):
+            Utils.Print("ERROR: Failed to import account keys into wallet %s" % (wallet.name))
             return False
 
-        Utils.Print("Importing keys for account %s into wallet %s." % (self.defproducerbAccount.name, wallet.name))
-        if not self.walletMgr.importKey(self.defproducerbAccount, wallet):
-            Utils.Print("ERROR: Failed to import key for account %s" % (self.defproducerbAccount.name))
-            return False
-
-        for account in accounts:
-            Utils.Print("Importing keys for account %s into wallet %s." % (account.name, wallet.name))
-            if not self.walletMgr.importKey(account, wallet):
-                Utils.Print("ERROR: Failed to import key for account %s" % (account.name))
-                return False
-
         self.accounts=accounts
         return True
 
@@ -587,13 +756,18 @@ class Cluster(object):
 
     # Spread funds across accounts with transactions spread through cluster nodes.
     #  Validate transactions are synchronized on root node
-    def spreadFunds(self, source, accounts, amount=1):
+    def spreadFunds(self, source, accounts, amount=1, fanout=None):
+        """Leave amount with each of accounts, funded from source. By default the funds go down the chain of accounts,
+        each transfer on the next live node after the previous transfer is in a block there. With a fanout they go down
+        a tree, see spreadFundsTree."""
         assert(source)
         assert(isinstance(source, Account))
         assert(accounts)
         assert(isinstance(accounts, list))
         assert(len(accounts) > 0)
         Utils.Print("len(accounts): %d" % (len(accounts)))
+        if fanout is not None:
+            return self.spreadFundsTree(source, accounts, amount, fanout)
 
         count=len(accounts)
         transferAmount=(count*amount)+amount
@@ -656,6 +830,59 @@ class Cluster(object):
 
         return True
 
+    # pylint: disable=too-many-locals
+    def spreadFundsTree(self, source, accounts, amount=1, fanout=4):
+        """spreadFunds down a tree: source funds the first fanout accounts, account i funds accounts fanout*(i+1) up to
+        fanout*(i+2)-1, each with amount for every account of its subtree. The transfers of one tree level are
+        independent, they are pushed concurrently, round-robin across the live nodes, and the level is done when all
+        its transactions are in a block on every live node, so this takes one block wait per level."""
+        assert(fanout >= 1)
+        count=len(accounts)
+        subtree=[1]*count
+        for i in range(count-1, fanout-1, -1):
+            subtree[i//fanout-1]+=subtree[i]
+
+        signers={account.name: account for account in [source]+accounts}
+        if any(account.activePrivateKey is None for account in signers.values()):
+            signers=None
+        memo="spread funds %d" % (int(time.time()*1e6))
+        liveNodes=[node for node in self.nodes if not node.killed]
+        if not liveNodes:
+            Utils.Print("ERROR: No active nodes found.")
+            return False
+
+        levelStart,levelEnd=0,min(fanout, count)
+        nextNode=0
+        while levelStart < count:
+            start=time.perf_counter()
+            nodeTransfers={}
+            for i in range(levelStart, levelEnd):
+                fromm=source if i < fanout else accounts[i//fanout-1]
+                amountStr=Node.currencyIntToStr(amount*subtree[i], CORE_SYMBOL)
+                node=liveNodes[nextNode % len(liveNodes)]
+                nextNode+=1
+                if Utils.Debug: Utils.Print("Transfer %s units from account %s to %s on eos server port %d." % (amountStr, fromm.name, accounts[i].name, node.port))
+                nodeTransfers.setdefault(node, []).append(Node.makeTransferAction(fromm, accounts[i], amountStr, memo))
+
+            futures=[self.getExecutor().submit(node.pushTransactions, transfers, signers=signers) for node,transfers in nodeTransfers.items()]
+            transIds=[]
+            for future in futures:
+                for success,trans in future.result():
+                    if not success:
+                        Utils.Print("ERROR: Failed to spread funds. %s" % (trans))
+                        return False
+                    transIds.append(Node.getTransId(trans))
+
+            for nodeResult in self.runOnNodes(lambda node: node.waitForTransactionsInBlock(transIds), liveNodes):
+                if nodeResult.error is not None or not nodeResult.result:
+                    Utils.Print("ERROR: Failed to validate the transactions of accounts %d-%d got rolled into a block on server port %d." %
+                                (levelStart, levelEnd-1, nodeResult.node.port))
+                    return False
+            if Utils.Debug: Utils.Print("Funded accounts %d-%d in %.3f sec" % (levelStart, levelEnd-1, time.perf_counter()-start))
+            levelStart,levelEnd=levelEnd,min(fanout*(levelEnd+1), count)
+
+        return True
+
     def validateSpreadFunds(self, initialBalances, transferAmount, source, accounts):
         """Given initial Balances, will validate each account has the expected balance based upon transferAmount.
         This validation is repeated against every node in the cluster."""
@@ -668,29 +895,31 @@ class Cluster(object):
         assert(isinstance(initialBalances, dict))
         assert(isinstance(transferAmount, int))
 
-        for node in self.nodes:
-            if node.killed:
-                continue
-
+        def validateNodeFunds(node):
             if Utils.Debug: Utils.Print("Validate funds on %s server port %d." %
                                         (Utils.EosServerName, node.port))
+            return node.validateFunds(initialBalances, transferAmount, source, accounts)
 
-            if node.validateFunds(initialBalances, transferAmount, source, accounts) is False:
-                Utils.Print("ERROR: Failed to validate funds on eos node port: %d" % (node.port))
+        for nodeResult in self.runOnNodes(validateNodeFunds):
+            if nodeResult.error is not None:
+                raise nodeResult.error
+            if nodeResult.result is False:
+                Utils.Print("ERROR: Failed to validate funds on eos node port: %d" % (nodeResult.node.port))
                 return False
 
         return True
 
-    def spreadFundsAndValidate(self, transferAmount=1):
+    def spreadFundsAndValidate(self, transferAmount=1, fanout=None):
         """Sprays 'transferAmount' funds across configured accounts and validates action. The spray is done in a trickle down fashion with account 1
-        receiving transferAmount*n SYS and forwarding x-transferAmount funds. Transfer actions are spread round-robin across the cluster to vaidate system cohesiveness."""
+        receiving transferAmount*n SYS and forwarding x-transferAmount funds. Transfer actions are spread round-robin across the cluster to vaidate system cohesiveness.
+        With a fanout the funds trickle down a tree instead, see spreadFundsTree."""
 
         if Utils.Debug: Utils.Print("Get initial system balances.")
         initialBalances=self.nodes[0].getEosBalances([self.defproduceraAccount] + self.accounts)
         assert(initialBalances)
         assert(isinstance(initialBalances, dict))
 
-        if False == self.spreadFunds(self.defproduceraAccount, self.accounts, transferAmount):
+        if False == self.spreadFunds(self.defproduceraAccount, self.accounts, transferAmount, fanout):
             Utils.Print("ERROR: Failed to spread funds across nodes.")
             return False
 
@@ -919,9 +1148,19 @@ class Cluster(object):
     @staticmethod
     def bootstrap(totalNodes, prodCount, totalProducers, biosHost, biosPort, walletMgr, onlyBios=False):
         """Create 'prodCount' init accounts and deposits 10000000000 SYS in each. If prodCount is -1 will initialize all possible producers.
-        Ensure nodes are inter-connected prior to this call. One way to validate this will be to check if every node has block 1."""
+        Ensure nodes are inter-connected prior to this call. One way to validate this will be to check if every node has block 1.
+        Independent actions are packed into multi-action transactions, signed in process with the eosio keys and pushed in
+        one push_transactions request per step. All of them go to the bios node, so only the producer handover and the
+        final block inclusion and finality checks wait on blocks. Prints the duration of each phase at the end."""
 
         Utils.Print("Starting cluster bootstrap.")
+        timings=[]
+        phaseStart=[time.perf_counter()]
+        def endPhase(name):
+            now=time.perf_counter()
+            timings.append((name, now-phaseStart[0]))
+            phaseStart[0]=now
+
         if totalProducers is None:
             totalProducers=totalNodes
 
@@ -960,6 +1199,8 @@ class Cluster(object):
             Utils.Print("ERROR: Failed to import %s account keys into ignition wallet." % (eosioName))
             return None
 
+        endPhase("wallet")
+
         contract="eosio.bios"
         contractDir="contracts/%s" % (contract)
         wasmFile="%s.wasm" % (contract)
@@ -971,6 +1212,23 @@ class Cluster(object):
             return None
 
         Node.validateTransaction(trans)
+        endPhase("bios contract")
+
+        eosioTokenAccount=copy.deepcopy(eosioAccount)
+        eosioTokenAccount.name="eosio.token"
+        signers={eosioAccount.name: eosioAccount, eosioTokenAccount.name: eosioTokenAccount}
+
+        def pushActions(actions, desc):
+            """Push actions in transactions of up to bootstrapActionsPerTrx actions each, returns the transactions or None."""
+            perTrx=Cluster.bootstrapActionsPerTrx
+            trxs=[actions[i:i+perTrx] for i in range(0, len(actions), perTrx)]
+            results=biosNode.pushTransactions(trxs, signers=signers)
+            for success,trans in results:
+                if not success:
+                    Utils.Print("ERROR: Failed to %s. %s" % (desc, trans))
+                    return None
+                Node.validateTransaction(trans)
+            return [trans for _,trans in results]
 
         Utils.Print("Creating accounts: %s " % ", ".join(producerKeys.keys()))
         producerKeys.pop(eosioName)
@@ -982,63 +1240,40 @@ class Cluster(object):
             initx.ownerPublicKey=keys["public"]
             initx.activePrivateKey=keys["private"]
             initx.activePublicKey=keys["public"]
-            trans=biosNode.createAccount(initx, eosioAccount, 0)
-            if trans is None:
-                Utils.Print("ERROR: Failed to create account %s" % (name))
-                return None
-            Node.validateTransaction(trans)
             accounts.append(initx)
 
-        transId=Node.getTransId(trans)
-        if not biosNode.waitForTransInBlock(transId):
-            Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, biosNode.port))
+        if pushActions([Node.makeNewAccountAction(initx, eosioAccount) for initx in accounts], "create producer accounts") is None:
             return None
 
         Utils.Print("Validating system accounts within bootstrap")
         biosNode.validateAccounts(accounts)
+        endPhase("producer accounts")
 
         if not onlyBios:
             if prodCount == -1:
                 setProdsFile="setprods.json"
                 if Utils.Debug: Utils.Print("Reading in setprods file %s." % (setProdsFile))
                 with open(setProdsFile, "r") as f:
-                    setProdsStr=f.read()
-
-                    Utils.Print("Setting producers.")
-                    opts="--permission eosio@active"
-                    myTrans=biosNode.pushMessage("eosio", "setprods", setProdsStr, opts)
-                    if myTrans is None or not myTrans[0]:
-                        Utils.Print("ERROR: Failed to set producers.")
-                        return None
+                    setProds=json.load(f)
+                Utils.Print("Setting producers.")
             else:
                 counts=dict.fromkeys(range(totalNodes), 0) #initialize node prods count to 0
-                setProdsStr='{"schedule": ['
-                firstTime=True
-                prodNames=[]
+                schedule=[]
                 for name, keys in producerKeys.items():
                     if counts[keys["node"]] >= prodCount:
                         continue
-                    if firstTime:
-                        firstTime = False
-                    else:
-                        setProdsStr += ','
-
-                    setProdsStr += ' { "producer_name": "%s", "block_signing_key": "%s" }' % (keys["name"], keys["public"])
-                    prodNames.append(keys["name"])
+                    schedule.append({"producer_name": keys["name"], "block_signing_key": keys["public"]})
                     counts[keys["node"]] += 1
+                setProds={"schedule": schedule}
+                if Utils.Debug: Utils.Print("setprods: %s" % (json.dumps(setProds)))
+                Utils.Print("Setting producers: %s." % (", ".join(prod["producer_name"] for prod in schedule)))
 
-                setProdsStr += ' ] }'
-                if Utils.Debug: Utils.Print("setprods: %s" % (setProdsStr))
-                Utils.Print("Setting producers: %s." % (", ".join(prodNames)))
-                opts="--permission eosio@active"
-                # pylint: disable=redefined-variable-type
-                trans=biosNode.pushMessage("eosio", "setprods", setProdsStr, opts)
-                if trans is None or not trans[0]:
-                    Utils.Print("ERROR: Failed to set producer %s." % (keys["name"]))
-                    return None
+            setProdsAction=Node.makeAction("eosio", "setprods", setProds, [{"actor": eosioAccount.name, "permission": "active"}])
+            trxs=pushActions([setProdsAction], "set producers")
+            if trxs is None:
+                return None
 
-            trans=trans[1]
-            transId=Node.getTransId(trans)
+            transId=Node.getTransId(trxs[-1])
             if not biosNode.waitForTransInBlock(transId):
                 Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, biosNode.port))
                 return None
@@ -1049,39 +1284,15 @@ class Cluster(object):
             if not ret:
                 Utils.Print("ERROR: Block production handover failed.")
                 return None
-
-        eosioTokenAccount=copy.deepcopy(eosioAccount)
-        eosioTokenAccount.name="eosio.token"
-        trans=biosNode.createAccount(eosioTokenAccount, eosioAccount, 0)
-        if trans is None:
-            Utils.Print("ERROR: Failed to create account %s" % (eosioTokenAccount.name))
-            return None
-
-        eosioRamAccount=copy.deepcopy(eosioAccount)
-        eosioRamAccount.name="eosio.ram"
-        trans=biosNode.createAccount(eosioRamAccount, eosioAccount, 0)
-        if trans is None:
-            Utils.Print("ERROR: Failed to create account %s" % (eosioRamAccount.name))
-            return None
-
-        eosioRamfeeAccount=copy.deepcopy(eosioAccount)
-        eosioRamfeeAccount.name="eosio.ramfee"
-        trans=biosNode.createAccount(eosioRamfeeAccount, eosioAccount, 0)
-        if trans is None:
-            Utils.Print("ERROR: Failed to create account %s" % (eosioRamfeeAccount.name))
-            return None
-
-        eosioStakeAccount=copy.deepcopy(eosioAccount)
-        eosioStakeAccount.name="eosio.stake"
-        trans=biosNode.createAccount(eosioStakeAccount, eosioAccount, 0)
-        if trans is None:
-            Utils.Print("ERROR: Failed to create account %s" % (eosioStakeAccount.name))
-            return None
-
-        Node.validateTransaction(trans)
-        transId=Node.getTransId(trans)
-        if not biosNode.waitForTransInBlock(transId):
-            Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, biosNode.port))
+            endPhase("set producers")
+
+        systemAccounts=[eosioTokenAccount]
+        for name in ["eosio.ram", "eosio.ramfee", "eosio.stake"]:
+            systemAccount=copy.deepcopy(eosioAccount)
+            systemAccount.name=name
+            systemAccounts.append(systemAccount)
+        Utils.Print("Creating accounts: %s " % ", ".join(account.name for account in systemAccounts))
+        if pushActions([Node.makeNewAccountAction(account, eosioAccount) for account in systemAccounts], "create system accounts") is None:
             return None
 
         contract="eosio.token"
@@ -1093,43 +1304,19 @@ class Cluster(object):
         if trans is None:
             Utils.Print("ERROR: Failed to publish contract %s." % (contract))
             return None
+        endPhase("system accounts and token contract")
 
-        # Create currency0000, followed by issue currency0000
-        contract=eosioTokenAccount.name
-        Utils.Print("push create action to %s contract" % (contract))
-        action="create"
-        data="{\"issuer\":\"%s\",\"maximum_supply\":\"1000000000.0000 %s\",\"can_freeze\":\"0\",\"can_recall\":\"0\",\"can_whitelist\":\"0\"}" % (eosioTokenAccount.name, CORE_SYMBOL)
-        opts="--permission %s@active" % (contract)
-        trans=biosNode.pushMessage(contract, action, data, opts)
-        if trans is None or not trans[0]:
-            Utils.Print("ERROR: Failed to push create action to eosio contract.")
-            return None
-
-        Node.validateTransaction(trans[1])
-        transId=Node.getTransId(trans[1])
-        if not biosNode.waitForTransInBlock(transId):
-            Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, biosNode.port))
-            return None
-
+        # Create currency0000, followed by issue currency0000, in one transaction
         contract=eosioTokenAccount.name
-        Utils.Print("push issue action to %s contract" % (contract))
-        action="issue"
-        data="{\"to\":\"%s\",\"quantity\":\"1000000000.0000 %s\",\"memo\":\"initial issue\"}" % (eosioAccount.name, CORE_SYMBOL)
-        opts="--permission %s@active" % (contract)
-        trans=biosNode.pushMessage(contract, action, data, opts)
-        if trans is None or not trans[0]:
-            Utils.Print("ERROR: Failed to push issue action to eosio contract.")
-            return None
-
-        Node.validateTransaction(trans[1])
-        Utils.Print("Wait for issue action transaction to become finalized.")
-        transId=Node.getTransId(trans[1])
-        # biosNode.waitForTransInBlock(transId)
-        # guesstimating block finalization timeout. Two production rounds of 12 blocks per node, plus 60 seconds buffer
-        timeout = .5 * 12 * 2 * len(producerKeys) + 60
-        if not biosNode.waitForTransFinalization(transId, timeout=timeout):
-            Utils.Print("ERROR: Failed to validate transaction %s got rolled into a finalized block on server port %d." % (transId, biosNode.port))
+        Utils.Print("push create and issue actions to %s contract" % (contract))
+        tokenAuth=[{"actor": eosioTokenAccount.name, "permission": "active"}]
+        createData={"issuer": eosioTokenAccount.name, "maximum_supply": "1000000000.0000 %s" % (CORE_SYMBOL)}
+        issueData={"to": eosioAccount.name, "quantity": "1000000000.0000 %s" % (CORE_SYMBOL), "memo": "initial issue"}
+        trxs=pushActions([Node.makeAction(contract, "create", createData, tokenAuth), Node.makeAction(contract, "issue", issueData, tokenAuth)],
+                         "push create and issue actions to %s contract" % (contract))
+        if trxs is None:
             return None
+        issueTransId=Node.getTransId(trxs[-1])
 
         expectedAmount="1000000000.0000 {0}".format(CORE_SYMBOL)
         Utils.Print("Verify eosio issue, Expected: %s" % (expectedAmount))
@@ -1138,6 +1325,7 @@ class Cluster(object):
             Utils.Print("ERROR: Issue verification failed. Excepted %s, actual: %s" %
                         (expectedAmount, actualAmount))
             return None
+        endPhase("create and issue")
 
         contract="eosio.system"
         contractDir="contracts/%s" % (contract)
@@ -1150,29 +1338,33 @@ class Cluster(object):
             return None
 
         Node.validateTransaction(trans)
+        endPhase("system contract")
 
         initialFunds="1000000.0000 {0}".format(CORE_SYMBOL)
         Utils.Print("Transfer initial fund %s to individual accounts." % (initialFunds))
-        trans=None
-        contract=eosioTokenAccount.name
-        action="transfer"
-        for name, keys in producerKeys.items():
-            data="{\"from\":\"%s\",\"to\":\"%s\",\"quantity\":\"%s\",\"memo\":\"%s\"}" % (eosioAccount.name, name, initialFunds, "init transfer")
-            opts="--permission %s@active" % (eosioAccount.name)
-            trans=biosNode.pushMessage(contract, action, data, opts)
-            if trans is None or not trans[0]:
-                Utils.Print("ERROR: Failed to transfer funds from %s to %s." % (eosioTokenAccount.name, name))
-                return None
-
-            Node.validateTransaction(trans[1])
+        transfers=[Node.makeTransferAction(eosioAccount, account, initialFunds, "init transfer", contract=eosioTokenAccount.name) for account in accounts]
+        trxs=pushActions(transfers, "transfer initial funds from %s" % (eosioAccount.name))
+        if trxs is None:
+            return None
 
         Utils.Print("Wait for last transfer transaction to become finalized.")
-        transId=Node.getTransId(trans[1])
+        transId=Node.getTransId(trxs[-1])
         if not biosNode.waitForTransInBlock(transId):
             Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, biosNode.port))
             return None
+        endPhase("initial transfers")
 
-        Utils.Print("Cluster bootstrap done.")
+        # the issue has been making its way to finality while the steps above ran
+        Utils.Print("Wait for issue action transaction to become finalized.")
+        # guesstimating block finalization timeout. Two production rounds of 12 blocks per node, plus 60 seconds buffer
+        timeout = .5 * 12 * 2 * len(producerKeys) + 60
+        if not biosNode.waitForTransFinalization(issueTransId, timeout=timeout):
+            Utils.Print("ERROR: Failed to validate transaction %s got rolled into a finalized block on server port %d." % (issueTransId, biosNode.port))
+            return None
+        endPhase("issue finality")
+
+        Utils.Print("Cluster bootstrap done. Phase durations: %s, total %.3f sec" % (
+            ", ".join("%s %.3f sec" % (name, duration) for name,duration in timings), sum(duration for _,duration in timings)))
 
         return biosNode
 
@@ -1199,27 +1391,68 @@ class Cluster(object):
         dataLocation=Cluster.__dataDir + Cluster.nodeExtensionToName(nodeInstance)
         return r"[\n]?(\d+) (.* --data-dir %s .*)\n" % (dataLocation)
 
+    @staticmethod
+    def readNodePid(nodeInstance):
+        """(pid, command line) of the running nodeos for nodeInstance (a node number or "bios"), from the nodeos.pid
+        file the launcher writes to the node's data dir. None if there is no pid file or its process is not the node."""
+        dataLocation=Cluster.__dataDir + Cluster.nodeExtensionToName(nodeInstance)
+        try:
+            with open(dataLocation + "/nodeos.pid", "r") as f:
+                pid=int(f.read().strip())
+            os.kill(pid, 0)
+        except (OSError, ValueError) as _:
+            return None
+        try:
+            with open("/proc/%d/cmdline" % (pid), "rb") as f:
+                cmd=" ".join(arg.decode("utf-8") for arg in f.read().split(b"\0") if arg)
+        except OSError as _:
+            try:
+                cmd=Utils.checkOutput(["ps", "-o", "command=", "-p", str(pid)]).strip()
+            except subprocess.CalledProcessError as _:
+                return None
+        args=cmd.split()
+        if "--data-dir" not in args or dataLocation not in [arg.rstrip("/") for arg in args]:
+            # stale pid file, the pid now belongs to another process
+            return None
+        return (pid, cmd)
+
+    @staticmethod
+    def parseEosServers(psOut):
+        """Map of data dir to (pid, command line) for the nodeos processes in pgrep output."""
+        servers={}
+        for m in re.finditer(r"^(\d+) (.* --data-dir (\S+).*)$", psOut, re.MULTILINE):
+            servers[m.group(3).rstrip("/")]=(int(m.group(1)), m.group(2))
+        return servers
+
     # Populates list of EosInstanceInfo objects, matched to actual running instances
     def discoverLocalNodes(self, totalNodes, timeout=None):
+        """Nodes for the launched instances, pids and command lines taken from the launcher's pid files. Falls back to
+        matching pgrep output, which is polled up to timeout, for instances without a pid file."""
         nodes=[]
+        found={i: Cluster.readNodePid(i) for i in range(totalNodes)}
+        missing=[i for i,pidCmd in found.items() if pidCmd is None]
+        if missing:
+            if Utils.Debug: Utils.Print("No pid file for nodes %s, searching %s processes" % (missing, Utils.EosServerName))
+            psOut=Cluster.pgrepEosServers(timeout)
+            if psOut is None:
+                Utils.Print("ERROR: No nodes discovered.")
+                return nodes
+
+            if len(psOut) < 6660:
+                psOutDisplay=psOut
+            else:
+                psOutDisplay=psOut[:6660]+"..."
+            if Utils.Debug: Utils.Print("pgrep output: \"%s\"" % psOutDisplay)
+            servers=Cluster.parseEosServers(psOut)
+            for i in missing:
+                found[i]=servers.get(Cluster.__dataDir + Cluster.nodeExtensionToName(i))
 
-        psOut=Cluster.pgrepEosServers(timeout)
-        if psOut is None:
-            Utils.Print("ERROR: No nodes discovered.")
-            return nodes
-
-        if len(psOut) < 6660:
-            psOutDisplay=psOut
-        else:
-            psOutDisplay=psOut[:6660]+"..."
-        if Utils.Debug: Utils.Print("pgrep output: \"%s\"" % psOutDisplay)
         for i in range(0, totalNodes):
-            pattern=Cluster.pgrepEosServerPattern(i)
-            m=re.search(pattern, psOut, re.MULTILINE)
-            if m is None:
-                Utils.Print("ERROR: Failed to find %s pid. Pattern %s" % (Utils.EosServerName, pattern))
+            if found[i] is None:
+                Utils.Print("ERROR: Failed to find %s pid for %s" % (Utils.EosServerName, Cluster.nodeExtensionToName(i)))
                 break
-            instance=Node(self.host, self.port + i, pid=int(m.group(1)), cmd=m.group(2), walletMgr=self.walletMgr, enableMongo=self.enableMongo, mongoHost=self.mongoHost, mongoPort=self.mongoPort, mongoDb=self.mongoDb)
+            pid,cmd=found[i]
+            instance=Node(self.host, self.port + i, pid=pid, cmd=cmd, walletMgr=self.walletMgr, enableMongo=self.enableMongo, mongoHost=self.mongoHost, mongoPort=self.mongoPort, mongoDb=self.mongoDb)
             if Utils.Debug: Utils.Print("Node>", instance)
             nodes.append(instance)
 
@@ -1227,6 +1460,10 @@ class Cluster(object):
         return nodes
 
     def discoverBiosNodePid(self, timeout=None):
+        pidCmd=Cluster.readNodePid("bios")
+        if pidCmd is not None:
+            self.biosNode.pid=pidCmd[0]
+            return
         psOut=Cluster.pgrepEosServers(timeout=timeout)
         pattern=Cluster.pgrepEosServerPattern("bios")
         Utils.Print("pattern={\n%s\n}, psOut=\n%s\n" % (pattern,psOut))
@@ -1236,6 +1473,29 @@ class Cluster(object):
         else:
             self.biosNode.pid=int(m.group(1))
 
+    def waitForNodesReady(self, nodes=None, timeout=None):
+        """Wait until every node (default: all cluster nodes) answers get info, probing all of them concurrently every
+        readyProbeInterval seconds, so the wait is as long as the slowest node takes to start. Returns the list of nodes
+        that did not become ready within timeout (default Utils.systemWaitTimeout)."""
+        if timeout is None:
+            timeout=Utils.systemWaitTimeout
+        endTime=time.time()+timeout
+
+        def probe(node):
+            while True:
+                if node.checkPulse():
+                    return True
+                remaining=endTime-time.time()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(Cluster.readyProbeInterval, remaining))
+
+        start=time.perf_counter()
+        notReady=[nodeResult.node for nodeResult in self.runOnNodes(probe, nodes, timeout=timeout+Utils.rpcTimeout)
+                  if nodeResult.error is not None or not nodeResult.result]
+        if Utils.Debug: Utils.Print("Nodes ready check Duration: %.3f sec, %d not ready" % (time.perf_counter()-start, len(notReady)))
+        return notReady
+
     # Kills a percentange of Eos instances starting from the tail and update eosInstanceInfos state
     def killSomeEosInstances(self, killCount, killSignalStr=Utils.SigKillTag):
         killSignal=signal.SIGKILL
@@ -1343,15 +1603,20 @@ class Cluster(object):
             return False
         return True
 
+    def mongoSession(self):
+        if self.__mongoSession is None:
+            self.__mongoSession=MongoSession(Utils.MongoPath, self.mongoEndpointArgs)
+        return self.__mongoSession
+
     def isMongodDbRunning(self):
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
         subcommand="db.version()"
-        if Utils.Debug: Utils.Print("echo %s | %s" % (subcommand, cmd))
-        ret,outs,errs=Node.stdinAndCheckOutput(cmd.split(), subcommand)
-        if ret is not 0:
-            Utils.Print("ERROR: Failed to check database version: %s" % (Node.byteArrToStr(errs)) )
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
+        try:
+            version=self.mongoSession().query(subcommand)
+        except MongoError as ex:
+            Utils.Print("ERROR: Failed to check database version: %s" % (ex.output))
             return False
-        if Utils.Debug: Utils.Print("MongoDb response: %s" % (outs))
+        if Utils.Debug: Utils.Print("MongoDb response: %s" % (version))
         return True
 
     def waitForNextBlock(self, timeout=None):
@@ -1370,42 +1635,84 @@ class Cluster(object):
             os.remove(f)
 
         if self.enableMongo:
-            cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
             subcommand="db.dropDatabase()"
-            if Utils.Debug: Utils.Print("echo %s | %s" % (subcommand, cmd))
-            ret,_,errs=Node.stdinAndCheckOutput(cmd.split(), subcommand)
-            if ret is not 0:
-                Utils.Print("ERROR: Failed to drop database: %s" % (Node.byteArrToStr(errs)) )
+            if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
+            try:
+                self.mongoSession().query(subcommand)
+            except MongoError as ex:
+                Utils.Print("ERROR: Failed to drop database: %s" % (ex.output))
+            self.mongoSession().close()
 
 
-    # Create accounts and validates that the last transaction is received on root node
-    def createAccounts(self, creator, waitForTransBlock=True, stakedDeposit=1000):
-        if self.accounts is None:
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
+    def createAccounts(self, creator, waitForTransBlock=True, stakedDeposit=1000, accounts=None, stakeNet=100, stakeCPU=100, buyRAM=10000, validate=True):
+        """Create accounts (default: self.accounts) on the root node the way createInitializeAccount does, with the
+        actions of accountsPerTrx accounts packed into each transaction and the transactions pushed
+        createAccountsTrxsPerPush at a time, concurrently. Signed in process when creator has its active private key,
+        else through the wallet. Waits for the last transaction of every push to be in a block, if waitForTransBlock,
+        and checks that the root node has all the accounts, if validate."""
+        accounts=self.accounts if accounts is None else accounts
+        if not accounts:
             return True
 
-        transId=None
-        for account in self.accounts:
-            if Utils.Debug: Utils.Print("Create account %s." % (account.name))
-            trans=self.createAccountAndVerify(account, creator, stakedDeposit)
-            if trans is None:
-                Utils.Print("ERROR: Failed to create account %s." % (account.name))
-                return False
-            if Utils.Debug: Utils.Print("Account %s created." % (account.name))
-            transId=Node.getTransId(trans)
+        node=self.nodes[0]
+        start=time.perf_counter()
+        trxs=[]
+        for first in range(0, len(accounts), Cluster.accountsPerTrx):
+            actions=[]
+            for account in accounts[first:first+Cluster.accountsPerTrx]:
+                actions+=Node.makeCreateAccountActions(account, creator, stakedDeposit, stakeNet, stakeCPU, buyRAM)
+            trxs.append(actions)
+
+        signers={creator.name: creator} if creator.activePrivateKey is not None else None
+        perPush=Cluster.createAccountsTrxsPerPush
+        futures=[self.getExecutor().submit(node.pushTransactions, trxs[first:first+perPush], batchSize=perPush, signers=signers)
+                 for first in range(0, len(trxs), perPush)]
+        transIds=[]
+        for future in futures:
+            results=future.result()
+            for success,trans in results:
+                if not success:
+                    Utils.Print("ERROR: Failed to create accounts. %s" % (trans))
+                    return False
+            transIds.append(Node.getTransId(results[-1][1]))
+        if Utils.Debug: Utils.Print("Pushed %d transactions creating %d accounts in %.3f sec" % (len(trxs), len(accounts), time.perf_counter()-start))
+
+        if waitForTransBlock:
+            for transId in transIds:
+                if Utils.Debug: Utils.Print("Wait for transaction id %s on server port %d." % ( transId, node.port))
+                if node.waitForTransInBlock(transId) is False:
+                    Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, node.port))
+                    return False
 
-        if waitForTransBlock and transId is not None:
-            node=self.nodes[0]
-            if Utils.Debug: Utils.Print("Wait for transaction id %s on server port %d." % ( transId, node.port))
-            if node.waitForTransInBlock(transId) is False:
-                Utils.Print("ERROR: Failed to validate transaction %s got rolled into a block on server port %d." % (transId, node.port))
-                return False
+        if validate and not self.verifyAccounts(accounts, node):
+            return False
+        if Utils.Debug: Utils.Print("Created %d accounts in %.3f sec" % (len(accounts), time.perf_counter()-start))
+        return True
 
+    def verifyAccounts(self, accounts, node=None):
+        """Check, with concurrent get account queries, that node (default: the root node) has all accounts."""
+        node=self.nodes[0] if node is None else node
+        for account,ret in zip(accounts, self.getExecutor().map(node.verifyAccount, accounts)):
+            if ret is None:
+                Utils.Print("ERROR: Failed to verify account %s on server port %d." % (account.name, node.port))
+                return False
         return True
 
     def getInfos(self, silentErrors=False, exitOnError=False):
+        """Returns get info results of all nodes, in node order, queried concurrently. None for nodes that failed."""
+        lam = lambda node: node.getInfo(silentErrors=silentErrors)
         infos=[]
-        for node in self.nodes:
-            infos.append(node.getInfo(silentErrors=silentErrors, exitOnError=exitOnError))
+        for nodeResult in self.runOnNodes(lam, timeout=Utils.rpcTimeout, skipKilled=False):
+            info=nodeResult.result
+            if info is None:
+                if exitOnError:
+                    Utils.cmdError("could not get info from %s. %s" % (nodeResult.node, nodeResult.error))
+                    Utils.errorExit("Failed to get info from %s" % (nodeResult.node))
+                if nodeResult.error is not None and not silentErrors:
+                    Utils.Print("ERROR: get info from %s failed. %s" % (nodeResult.node, nodeResult.error))
+            infos.append(info)
 
         return infos
 
@@ -1439,113 +1746,84 @@ class Cluster(object):
         blockLogDir=Cluster.__dataDir + Cluster.nodeExtensionToName(nodeExtension) + "/blocks/"
         return Utils.getBlockLog(blockLogDir, exitOnError=False)
 
-    def printBlockLog(self):
-        blockLogBios=self.getBlockLog("bios")
-        Utils.Print(Cluster.__fileDivider)
-        Utils.Print("Block log from %s:\n%s" % (blockLogDir, json.dumps(blockLogBios, indent=1)))
+    def openBlockLog(self, nodeExtension):
+        """BlockLog reader over the blocks.log of node nodeExtension (a node number or "bios")."""
+        return BlockLog(Cluster.__dataDir + Cluster.nodeExtensionToName(nodeExtension) + "/blocks/")
 
-        if not hasattr(self, "nodes"):
-            return
-
-        numNodes=len(self.nodes)
-        for i in range(numNodes):
-            node=self.nodes[i]
-            blockLog=self.getBlockLog(i)
-            Utils.Print(Cluster.__fileDivider)
-            Utils.Print("Block log from %s:\n%s" % (blockLogDir, json.dumps(blockLog, indent=1)))
-
-
-    def compareBlockLogs(self):
-        blockLogs=[]
-        blockNameExtensions=[]
-        lowestMaxes=[]
-
-        def back(arr):
-            return arr[len(arr)-1]
-
-        def sortLowest(maxes,max):
-            for i in range(len(maxes)):
-                if max < maxes[i]:
-                    maxes.insert(i, max)
-                    return
-
-            maxes.append(max)
+    def printBlockLog(self):
+        nodeExtensions=["bios"]
+        if hasattr(self, "nodes"):
+            nodeExtensions+=list(range(len(self.nodes)))
 
-        i="bios"
-        blockLog=self.getBlockLog(i)
-        if blockLog is None:
-            Utils.errorExit("Node %s does not have a block log, all nodes must have a block log" % (i))
-        blockLogs.append(blockLog)
-        blockNameExtensions.append(i)
-        sortLowest(lowestMaxes,back(blockLog)["block_num"])
+        for nodeExtension in nodeExtensions:
+            with self.openBlockLog(nodeExtension) as blockLog:
+                Utils.Print(Cluster.__fileDivider)
+                Utils.Print("Block log from %s:" % (blockLog.blocksDir))
+                for block in blockLog.blocks():
+                    Utils.Print(json.dumps(block, indent=1))
 
+    @staticmethod
+    def firstDivergentBlock(blockLog, otherBlockLog, first, last):
+        """Lowest block number in first..last whose id differs between the two block logs, None if there is none. Every
+        block id covers the previous one, so once two logs diverge they stay diverged and the lowest differing id is found
+        by bisection with O(log(last-first)) id lookups."""
+        if first > last or blockLog.blockId(last) == otherBlockLog.blockId(last):
+            return None
+        while first < last:
+            middle=(first+last)//2
+            if blockLog.blockId(middle) == otherBlockLog.blockId(middle):
+                first=middle+1
+            else:
+                last=middle
+        return first
+
+    def compareBlockLogs(self, fullCompare=False):
+        """Compare the block logs of all nodes, each against the longest one, over the blocks both have. Block ids are
+        compared, bisecting to the first block that differs, which alone is deserialized to report the difference. Equal
+        ids imply equal headers and transaction merkle roots of all blocks up to them; set fullCompare to also compare
+        every common block byte for byte (signatures, block extensions and the packed transactions themselves)."""
         if not hasattr(self, "nodes"):
             Utils.errorExit("There are not multiple nodes to compare, this method assumes that two nodes or more are expected")
 
-        numNodes=len(self.nodes)
-        for i in range(numNodes):
-            node=self.nodes[i]
-            blockLog=self.getBlockLog(i)
-            if blockLog is None:
-                Utils.errorExit("Node %s does not have a block log, all nodes must have a block log" % (i))
-            blockLogs.append(blockLog)
-            blockNameExtensions.append(i)
-            sortLowest(lowestMaxes,back(blockLog)["block_num"])
-
-        numNodes=len(blockLogs)
+        start=time.time()
+        blockLogs=[]
+        for nodeExtension in ["bios"] + list(range(len(self.nodes))):
+            blockLog=self.openBlockLog(nodeExtension)
+            if len(blockLog) == 0:
+                Utils.errorExit("Node %s does not have a block log, all nodes must have a block log" % (nodeExtension))
+            blockLogs.append((nodeExtension, blockLog))
 
-        if numNodes < 2:
+        if len(blockLogs) < 2:
             Utils.errorExit("There are not multiple nodes to compare, this method assumes that two nodes or more are expected")
 
-        if lowestMaxes[0] < 2:
-            Utils.errorExit("One or more nodes only has %d blocks, if that is a valid scenario, then compareBlockLogs shouldn't be called" % (lowestMaxes[0]))
-
-        # create a list of block logs and name extensions for the given common block number span
-        def identifyCommon(blockLogs, blockNameExtensions, first, last):
-            commonBlockLogs=[]
-            commonBlockNameExtensions=[]
-            for i in range(numNodes):
-                if (len(blockLogs[i]) >= last): 
-                    commonBlockLogs.append(blockLogs[i][first:last])
-                    commonBlockNameExtensions.append(blockNameExtensions[i])
-            return (commonBlockLogs,commonBlockNameExtensions) 
-
-        # compare the contents of the blockLogs for the given common block number span
-        def compareCommon(blockLogs, blockNameExtensions, first, last):
-            if Utils.Debug: Utils.Print("comparing block num %s through %s" % (first, last))
-            commonBlockLogs=None
-            commonBlockNameExtensions=None
-            (commonBlockLogs,commonBlockNameExtensions) = identifyCommon(blockLogs, blockNameExtensions, first, last)
-            numBlockLogs=len(commonBlockLogs)
-            if numBlockLogs < 2:
-                return False
+        lowestHead=min(blockLog.headBlockNum for _,blockLog in blockLogs)
+        if lowestHead < 2:
+            Utils.errorExit("One or more nodes only has %d blocks, if that is a valid scenario, then compareBlockLogs shouldn't be called" % (lowestHead))
 
-            ret=None
-            for i in range(1,numBlockLogs):
-                context="<comparing block logs for node[%s] and node[%s]>" % (commonBlockNameExtensions[0], commonBlockNameExtensions[i])
-                if Utils.Debug: Utils.Print("context=%s" % (context))
-                ret=Utils.compare(commonBlockLogs[0], commonBlockLogs[i], context)
-                if ret is not None:
-                    blockLogDir1=Cluster.__dataDir + Cluster.nodeExtensionToName(commonBlockNameExtensions[0]) + "/blocks/"
-                    blockLogDir2=Cluster.__dataDir + Cluster.nodeExtensionToName(commonBlockNameExtensions[i]) + "/blocks/"
-                    Utils.Print(Cluster.__fileDivider)
-                    Utils.Print("Block log from %s:\n%s" % (blockLogDir1, json.dumps(commonBlockLogs[0], indent=1)))
-                    Utils.Print(Cluster.__fileDivider)
-                    Utils.Print("Block log from %s:\n%s" % (blockLogDir2, json.dumps(commonBlockLogs[i], indent=1)))
-                    Utils.Print(Cluster.__fileDivider)
-                    Utils.errorExit("Block logs do not match, difference description -> %s" % (ret))
+        referenceExtension,referenceLog=max(blockLogs, key=lambda entry: entry[1].headBlockNum)
+        for nodeExtension,blockLog in blockLogs:
+            if blockLog is referenceLog:
+                continue
+            first=max(referenceLog.firstBlockNum, blockLog.firstBlockNum)
+            last=min(referenceLog.headBlockNum, blockLog.headBlockNum)
+            blockNum=Cluster.firstDivergentBlock(referenceLog, blockLog, first, last)
+            if blockNum is None and fullCompare:
+                blockNum=next((num for num in range(first, last+1) if referenceLog.rawBlock(num) != blockLog.rawBlock(num)), None)
+            if blockNum is None:
+                continue
 
-            return True
+            context="<comparing block logs for node[%s] and node[%s]>" % (referenceExtension, nodeExtension)
+            referenceBlock=referenceLog.readBlock(blockNum)
+            block=blockLog.readBlock(blockNum)
+            ret=Utils.compare(referenceBlock, block, context)
+            Utils.Print(Cluster.__fileDivider)
+            Utils.Print("Block %d from %s:\n%s" % (blockNum, referenceLog.blocksDir, json.dumps(referenceBlock, indent=1)))
+            Utils.Print(Cluster.__fileDivider)
+            Utils.Print("Block %d from %s:\n%s" % (blockNum, blockLog.blocksDir, json.dumps(block, indent=1)))
+            Utils.Print(Cluster.__fileDivider)
+            Utils.errorExit("Block logs do not match, first difference at block %d, difference description -> %s" % (blockNum, ret))
 
-        def stripValues(lowestMaxes,greaterThan):
-            newLowest=[]
-            for low in lowestMaxes:
-                if low > greaterThan:
-                    newLowest.append(low)
-            return newLowest
-
-        first=0
-        while len(lowestMaxes)>0 and compareCommon(blockLogs, blockNameExtensions, first, lowestMaxes[0]):
-            first=lowestMaxes[0]+1
-            lowestMaxes=stripValues(lowestMaxes,lowestMaxes[0])
+        for _,blockLog in blockLogs:
+            blockLog.close()
+        if Utils.Debug: Utils.Print("Compared %d block logs up to block %d in %.3f seconds." % (len(blockLogs), referenceLog.headBlockNum, time.time()-start))
 
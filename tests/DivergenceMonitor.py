@@ -0,0 +1,121 @@
+import threading
+
+from testUtils import Utils
+
+###########################################################################################
+class DivergenceError(Exception):
+    """Raised when nodes have different blocks at an irreversible height. blocks is [(node id, block id, producer)] at
+    blockNum, one entry per node that could be queried."""
+
+    def __init__(self, blockNum, blocks):
+        self.blockNum=blockNum
+        self.blocks=blocks
+        desc=", ".join("node[%s] %s produced by %s" % (nodeId, blockId, producer) for nodeId,blockId,producer in blocks)
+        super().__init__("Nodes diverged below LIB at block %d: %s" % (blockNum, desc))
+
+###########################################################################################
+class DivergenceMonitor(object):
+    """Checks, while a test runs, that all cluster nodes have the same irreversible blocks. Every interval seconds the
+    nodes are asked for their LIB, and the block ids at the lowest LIB of all of them are compared. Block ids cover
+    their previous block, so agreeing there means agreeing on every block below it, and on a mismatch the first
+    diverging height is found by bisection from the last height that was checked.
+
+    The first divergence is printed as soon as it is found and then raised by check() and stop()."""
+
+    def __init__(self, cluster, interval=1.0):
+        self.cluster=cluster
+        self.interval=interval
+        self.lastCheckedBlockNum=0
+        self.samples=0
+        self.error=None
+        self.__thread=None
+        self.__stopEvent=threading.Event()
+        self.__lock=threading.Lock()
+
+    def start(self):
+        assert self.__thread is None, "divergence monitor already started"
+        self.__stopEvent.clear()
+        self.__thread=threading.Thread(target=self.__run, name="DivergenceMonitor", daemon=True)
+        self.__thread.start()
+
+    def stop(self, raiseOnDivergence=True):
+        """Stop monitoring, after a last sample. Raises the divergence found, if any, unless raiseOnDivergence is False."""
+        if self.__thread is not None:
+            self.__stopEvent.set()
+            self.__thread.join()
+            self.__thread=None
+            self.sample()
+        if raiseOnDivergence:
+            self.check()
+
+    def isRunning(self):
+        return self.__thread is not None
+
+    def check(self):
+        """Raise the DivergenceError found so far, if any."""
+        if self.error is not None:
+            raise self.error
+
+    def __run(self):
+        while self.error is None and not self.__stopEvent.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as ex: # pylint: disable=broad-except
+                Utils.Print("ERROR: divergence monitor sample failed: %s" % (ex))
+
+    @staticmethod
+    def __blockId(node, blockNum):
+        block=node.getBlock(blockNum, silentErrors=True)
+        return None if block is None else block["id"]
+
+    @staticmethod
+    def __blockIdAndProducer(node, blockNum):
+        block=node.getBlock(blockNum, silentErrors=True)
+        return (None, None) if block is None else (block["id"], block["producer"])
+
+    def sample(self):
+        """Compare the nodes' blocks at their lowest LIB once. Returns the DivergenceError found, None otherwise."""
+        with self.__lock:
+            if self.error is not None:
+                return self.error
+            self.samples+=1
+            nodeIds={node: nodeId for nodeId,node in enumerate(self.cluster.nodes)}
+            infos=[(result.node, result.result) for result in self.cluster.runOnNodes(lambda node: node.getInfo(silentErrors=True))
+                   if result.error is None and result.result is not None]
+            if len(infos) < 2:
+                return None
+            lib=min(int(info["last_irreversible_block_num"]) for _,info in infos)
+            if lib <= self.lastCheckedBlockNum:
+                return None
+
+            def libId(node, info):
+                if int(info["last_irreversible_block_num"]) == lib:
+                    return info["last_irreversible_block_id"]
+                return DivergenceMonitor.__blockId(node, lib)
+
+            results=self.cluster.runOnNodes(lambda node: libId(node, dict(infos)[node]), nodes=[node for node,_ in infos])
+            ids=[(result.node, result.result) for result in results if result.error is None and result.result is not None]
+            if len(set(blockId for _,blockId in ids)) <= 1:
+                if Utils.Debug: Utils.Print("Divergence monitor: %d nodes agree up to block %d" % (len(ids), lib))
+                self.lastCheckedBlockNum=lib
+                return None
+
+            referenceNode,referenceId=ids[0]
+            blockNum=min(self.__firstDivergentBlock(referenceNode, node, lib) for node,blockId in ids[1:] if blockId != referenceId)
+            results=self.cluster.runOnNodes(lambda node: DivergenceMonitor.__blockIdAndProducer(node, blockNum),
+                                            nodes=[node for node,_ in ids])
+            blocks=[(nodeIds.get(result.node, str(result.node)),)+result.result for result in results if result.error is None]
+            self.error=DivergenceError(blockNum, blocks)
+            Utils.Print("ERROR: %s" % (self.error))
+            return self.error
+
+    def __firstDivergentBlock(self, referenceNode, node, lib):
+        """Lowest block number above the last checked one at which node and referenceNode differ, given they differ at lib."""
+        first,last=self.lastCheckedBlockNum+1,lib
+        while first < last:
+            middle=(first+last)//2
+            if DivergenceMonitor.__blockId(referenceNode, middle) == DivergenceMonitor.__blockId(node, middle):
+                first=middle+1
+            else:
+                last=middle
+        return first
@@ -0,0 +1,385 @@
+import hashlib
+import hmac
+import os
+import random
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+###########################################################################################
+class Ripemd160(object):
+    """Pure python RIPEMD-160, for Python builds whose OpenSSL does not provide it (OpenSSL 3 without the legacy provider)."""
+
+    __r1=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 7, 4, 13, 1, 10, 6, 15, 3, 12, 0, 9, 5, 2, 14, 11, 8,
+          3, 10, 14, 4, 9, 15, 8, 1, 2, 7, 0, 6, 13, 11, 5, 12, 1, 9, 11, 10, 0, 8, 12, 4, 13, 3, 7, 15, 14, 5, 6, 2,
+          4, 0, 5, 9, 7, 12, 2, 10, 14, 1, 3, 8, 11, 6, 15, 13]
+    __r2=[5, 14, 7, 0, 9, 2, 11, 4, 13, 6, 15, 8, 1, 10, 3, 12, 6, 11, 3, 7, 0, 13, 5, 10, 14, 15, 8, 12, 4, 9, 1, 2,
+          15, 5, 1, 3, 7, 14, 6, 9, 11, 8, 12, 2, 10, 0, 4, 13, 8, 6, 4, 1, 3, 11, 15, 0, 5, 12, 2, 13, 9, 7, 10, 14,
+          12, 15, 10, 4, 1, 5, 8, 7, 6, 2, 13, 14, 0, 3, 9, 11]
+    __s1=[11, 14, 15, 12, 5, 8, 7, 9, 11, 13, 14, 15, 6, 7, 9, 8, 7, 6, 8, 13, 11, 9, 7, 15, 7, 12, 15, 9, 11, 7, 13, 12,
+          11, 13, 6, 7, 14, 9, 13, 15, 14, 8, 13, 6, 5, 12, 7, 5, 11, 12, 14, 15, 14, 15, 9, 8, 9, 14, 5, 6, 8, 6, 5, 12,
+          9, 15, 5, 11, 6, 8, 13, 12, 5, 12, 13, 14, 11, 8, 5, 6]
+    __s2=[8, 9, 9, 11, 13, 15, 15, 5, 7, 7, 8, 11, 14, 14, 12, 6, 9, 13, 15, 7, 12, 8, 9, 11, 7, 7, 12, 7, 6, 15, 13, 11,
+          9, 7, 15, 11, 8, 6, 6, 14, 12, 13, 5, 14, 13, 13, 7, 5, 15, 5, 8, 11, 14, 14, 6, 14, 6, 9, 12, 9, 12, 5, 15, 8,
+          8, 5, 12, 9, 12, 5, 14, 6, 8, 13, 6, 5, 15, 13, 11, 11]
+    __k1=[0x00000000, 0x5A827999, 0x6ED9EBA1, 0x8F1BBCDC, 0xA953FD4E]
+    __k2=[0x50A28BE6, 0x5C4DD124, 0x6D703EF3, 0x7A6D76E9, 0x00000000]
+
+    @staticmethod
+    def __f(j, x, y, z):
+        if j < 16:
+            return x ^ y ^ z
+        if j < 32:
+            return (x & y) | (~x & z)
+        if j < 48:
+            return (x | ~y) ^ z
+        if j < 64:
+            return (x & z) | (y & ~z)
+        return x ^ (y | ~z)
+
+    @staticmethod
+    def __rol(x, n):
+        x&=0xffffffff
+        return ((x << n) | (x >> (32-n))) & 0xffffffff
+
+    @staticmethod
+    def digest(data):
+        msg=bytes(data) + b"\x80" + b"\x00"*((55-len(data)) % 64) + struct.pack("<Q", 8*len(data))
+        h=[0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476, 0xC3D2E1F0]
+        for off in range(0, len(msg), 64):
+            x=struct.unpack("<16I", msg[off:off+64])
+            a1,b1,c1,d1,e1=h
+            a2,b2,c2,d2,e2=h
+            for j in range(80):
+                rnd=j//16
+                t=Ripemd160.__rol(a1 + Ripemd160.__f(j, b1, c1, d1) + x[Ripemd160.__r1[j]] + Ripemd160.__k1[rnd], Ripemd160.__s1[j]) + e1
+                a1,e1,d1,c1,b1=e1,d1,Ripemd160.__rol(c1, 10),b1,t & 0xffffffff
+                t=Ripemd160.__rol(a2 + Ripemd160.__f(79-j, b2, c2, d2) + x[Ripemd160.__r2[j]] + Ripemd160.__k2[rnd], Ripemd160.__s2[j]) + e2
+                a2,e2,d2,c2,b2=e2,d2,Ripemd160.__rol(c2, 10),b2,t & 0xffffffff
+            t=(h[1] + c1 + d2) & 0xffffffff
+            h[1]=(h[2] + d1 + e2) & 0xffffffff
+            h[2]=(h[3] + e1 + a2) & 0xffffffff
+            h[3]=(h[4] + a1 + b2) & 0xffffffff
+            h[4]=(h[0] + b1 + c2) & 0xffffffff
+            h[0]=t
+        return struct.pack("<5I", *h)
+
+###########################################################################################
+class Secp256k1(object):
+    """secp256k1 arithmetic on python ints. Points are affine (x, y) tuples, None is the point at infinity; Jacobian
+    (X, Y, Z) coordinates are used internally. Multiples of the generator use a precomputed table of 4 bit windows."""
+
+    P=2**256 - 2**32 - 977
+    N=0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+    G=(0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+       0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+    __gTable=None
+
+    @staticmethod
+    def double(pt):
+        if pt is None:
+            return None
+        x,y,z=pt
+        if y == 0:
+            return None
+        p=Secp256k1.P
+        ysq=y*y % p
+        s=4*x*ysq % p
+        m=3*x*x % p
+        nx=(m*m - 2*s) % p
+        ny=(m*(s - nx) - 8*ysq*ysq) % p
+        return (nx, ny, 2*y*z % p)
+
+    @staticmethod
+    def add(pt1, pt2):
+        if pt1 is None:
+            return pt2
+        if pt2 is None:
+            return pt1
+        p=Secp256k1.P
+        x1,y1,z1=pt1
+        x2,y2,z2=pt2
+        z1sq=z1*z1 % p
+        if z2 == 1:
+            # pt2 is affine, as the generator table entries are
+            u1=x1
+            s1=y1
+        else:
+            z2sq=z2*z2 % p
+            u1=x1*z2sq % p
+            s1=y1*z2sq*z2 % p
+        u2=x2*z1sq % p
+        s2=y2*z1sq*z1 % p
+        if u1 == u2:
+            return Secp256k1.double(pt1) if s1 == s2 else None
+        h=(u2 - u1) % p
+        r=(s2 - s1) % p
+        hsq=h*h % p
+        hcu=hsq*h % p
+        u1hsq=u1*hsq % p
+        nx=(r*r - hcu - 2*u1hsq) % p
+        ny=(r*(u1hsq - nx) - s1*hcu) % p
+        return (nx, ny, h*z1*z2 % p)
+
+    @staticmethod
+    def inverse(x, m):
+        """x^-1 mod m for a prime m (P and N both are), by Fermat's little theorem as pow(x, -1, m) needs python 3.8."""
+        return pow(x, m-2, m)
+
+    @staticmethod
+    def toAffine(pt):
+        if pt is None:
+            return None
+        x,y,z=pt
+        p=Secp256k1.P
+        zinv=Secp256k1.inverse(z, p)
+        zinvsq=zinv*zinv % p
+        return (x*zinvsq % p, y*zinvsq*zinv % p)
+
+    @staticmethod
+    def multiply(point, k):
+        """k * point for an affine point."""
+        result=None
+        addend=(point[0], point[1], 1)
+        k%=Secp256k1.N
+        while k:
+            if k & 1:
+                result=Secp256k1.add(result, addend)
+            addend=Secp256k1.double(addend)
+            k>>=1
+        return Secp256k1.toAffine(result)
+
+    @staticmethod
+    def multiplyG(k):
+        """k * G"""
+        if Secp256k1.__gTable is None:
+            table=[]
+            base=(Secp256k1.G[0], Secp256k1.G[1], 1)
+            for _ in range(64):
+                row=[None]
+                for _ in range(15):
+                    row.append(Secp256k1.add(row[-1], base))
+                table.append([None] + [Secp256k1.toAffine(pt) + (1,) for pt in row[1:]])
+                for _ in range(4):
+                    base=Secp256k1.double(base)
+            Secp256k1.__gTable=table
+        result=None
+        k%=Secp256k1.N
+        for row in Secp256k1.__gTable:
+            if k & 0xf:
+                result=Secp256k1.add(result, row[k & 0xf])
+            k>>=4
+        return Secp256k1.toAffine(result)
+
+    @staticmethod
+    def decompress(x, odd):
+        p=Secp256k1.P
+        y=pow((pow(x, 3, p) + 7) % p, (p+1)//4, p)
+        if (y*y - x*x*x - 7) % p != 0:
+            raise ValueError("x is not on the curve")
+        if (y & 1) != odd:
+            y=p - y
+        return (x, y)
+
+    @staticmethod
+    def compress(point):
+        return bytes([2 + (point[1] & 1)]) + point[0].to_bytes(32, "big")
+
+###########################################################################################
+class EosKeys(object):
+    """EOS key and signature formats: WIF / PVT_K1_ private keys, EOS... / PUB_K1_ public keys and SIG_K1_ signatures,
+    with canonical secp256k1 signing (deterministic nonces, RFC 6979) the way fc produces them."""
+
+    Base58Alphabet="123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    PublicKeyPrefix="EOS"
+    # below this many keys createKeyPairs does not start worker processes
+    ParallelKeyPairsMin=256
+    __base58Index={c: i for i, c in enumerate(Base58Alphabet)}
+
+    @staticmethod
+    def ripemd160(data):
+        try:
+            return hashlib.new("ripemd160", data).digest()
+        except ValueError as _:
+            return Ripemd160.digest(data)
+
+    @staticmethod
+    def base58Encode(data):
+        num=int.from_bytes(data, "big")
+        chars=[]
+        # ten digits per big number division
+        while num:
+            num,rem=divmod(num, 430804206899405824)
+            for _ in range(10):
+                rem,digit=divmod(rem, 58)
+                chars.append(EosKeys.Base58Alphabet[digit])
+        while chars and chars[-1] == "1":
+            chars.pop()
+        pad=len(data) - len(data.lstrip(b"\x00"))
+        return "1"*pad + "".join(reversed(chars))
+
+    @staticmethod
+    def base58Decode(text):
+        num=0
+        for c in text:
+            num=num*58 + EosKeys.__base58Index[c]
+        pad=len(text) - len(text.lstrip("1"))
+        body=num.to_bytes((num.bit_length()+7)//8, "big") if num else b""
+        return b"\x00"*pad + body
+
+    @staticmethod
+    def __checkedDecode(text, suffix):
+        """base58 decode with the trailing 4 byte ripemd160 checksum (over data + suffix) verified and removed."""
+        raw=EosKeys.base58Decode(text)
+        data,checksum=raw[:-4],raw[-4:]
+        if EosKeys.ripemd160(data + suffix)[:4] != checksum:
+            raise ValueError("checksum mismatch in %s" % (text))
+        return data
+
+    @staticmethod
+    def __checkedEncode(data, suffix):
+        return EosKeys.base58Encode(data + EosKeys.ripemd160(data + suffix)[:4])
+
+    @staticmethod
+    def privateKeyFromString(wif):
+        """Returns the private key int for a WIF (5...) or PVT_K1_ private key string."""
+        if wif.startswith("PVT_K1_"):
+            return int.from_bytes(EosKeys.__checkedDecode(wif[7:], b"K1"), "big")
+        raw=EosKeys.base58Decode(wif)
+        data,checksum=raw[:-4],raw[-4:]
+        if hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4] != checksum or data[0] != 0x80:
+            raise ValueError("invalid WIF private key")
+        return int.from_bytes(data[1:33], "big")
+
+    @staticmethod
+    def privateKeyToWif(key):
+        data=b"\x80" + key.to_bytes(32, "big")
+        return EosKeys.base58Encode(data + hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4])
+
+    @staticmethod
+    def publicKeyPoint(key):
+        return Secp256k1.multiplyG(key)
+
+    @staticmethod
+    def publicKeyToString(point):
+        """EOS... (legacy format, what cleos prints) for a public key point or its 33 byte compressed form."""
+        data=bytes(point) if isinstance(point, (bytes, bytearray, memoryview)) else Secp256k1.compress(point)
+        return EosKeys.PublicKeyPrefix + EosKeys.__checkedEncode(data, b"")
+
+    @staticmethod
+    def publicKeyFromString(text):
+        """Returns the 33 byte compressed public key for an EOS... or PUB_K1_ public key string."""
+        if text.startswith("PUB_K1_"):
+            return EosKeys.__checkedDecode(text[7:], b"K1")
+        assert text.startswith(EosKeys.PublicKeyPrefix), print("ERROR: unknown public key format %s" % (text))
+        return EosKeys.__checkedDecode(text[len(EosKeys.PublicKeyPrefix):], b"")
+
+    @staticmethod
+    def publicKeyForPrivate(wif):
+        return EosKeys.publicKeyToString(EosKeys.publicKeyPoint(EosKeys.privateKeyFromString(wif)))
+
+    @staticmethod
+    def signatureToString(compact):
+        return "SIG_K1_" + EosKeys.__checkedEncode(compact, b"K1")
+
+    @staticmethod
+    def signatureFromString(text):
+        """Returns the 65 byte compact signature (recovery header, r, s) for a SIG_K1_ string."""
+        assert text.startswith("SIG_K1_"), print("ERROR: unknown signature format %s" % (text))
+        return EosKeys.__checkedDecode(text[7:], b"K1")
+
+    @staticmethod
+    def isCanonical(compact):
+        return not (compact[1] & 0x80) and not (compact[1] == 0 and not (compact[2] & 0x80)) and \
+               not (compact[33] & 0x80) and not (compact[33] == 0 and not (compact[34] & 0x80))
+
+    @staticmethod
+    def __nonce(key, digest, extra):
+        """RFC 6979 deterministic nonce, with extra entropy to get a different one for each signing attempt."""
+        x=key.to_bytes(32, "big")
+        h=(int.from_bytes(digest, "big") % Secp256k1.N).to_bytes(32, "big")
+        v=b"\x01"*32
+        k=b"\x00"*32
+        k=hmac.new(k, v + b"\x00" + x + h + extra, hashlib.sha256).digest()
+        v=hmac.new(k, v, hashlib.sha256).digest()
+        k=hmac.new(k, v + b"\x01" + x + h + extra, hashlib.sha256).digest()
+        v=hmac.new(k, v, hashlib.sha256).digest()
+        while True:
+            v=hmac.new(k, v, hashlib.sha256).digest()
+            nonce=int.from_bytes(v, "big")
+            if 1 <= nonce < Secp256k1.N:
+                return nonce
+            k=hmac.new(k, v + b"\x00", hashlib.sha256).digest()
+            v=hmac.new(k, v, hashlib.sha256).digest()
+
+    @staticmethod
+    def signDigest(digest, key):
+        """Canonical compact signature of a 32 byte digest, as a SIG_K1_ string. key is a private key int or string."""
+        if isinstance(key, str):
+            key=EosKeys.privateKeyFromString(key)
+        n=Secp256k1.N
+        z=int.from_bytes(digest, "big")
+        attempt=0
+        while True:
+            attempt+=1
+            k=EosKeys.__nonce(key, digest, struct.pack("<I", attempt) if attempt > 1 else b"")
+            point=Secp256k1.multiplyG(k)
+            r=point[0] % n
+            if r == 0:
+                continue
+            s=Secp256k1.inverse(k, n) * (z + r*key) % n
+            if s == 0:
+                continue
+            recId=(point[1] & 1) | (2 if point[0] >= n else 0)
+            if s > n//2:
+                s=n - s
+                recId^=1
+            compact=bytes([27 + 4 + recId]) + r.to_bytes(32, "big") + s.to_bytes(32, "big")
+            if EosKeys.isCanonical(compact):
+                return EosKeys.signatureToString(compact)
+
+    @staticmethod
+    def recoverPublicKey(digest, signature):
+        """Public key string that made signature (SIG_K1_ string) over digest."""
+        compact=EosKeys.signatureFromString(signature)
+        recId=(compact[0] - 27) & 3
+        r=int.from_bytes(compact[1:33], "big")
+        s=int.from_bytes(compact[33:65], "big")
+        n=Secp256k1.N
+        point=Secp256k1.decompress(r + (n if recId & 2 else 0), recId & 1)
+        z=int.from_bytes(digest, "big")
+        rInv=Secp256k1.inverse(r, n)
+        sR=Secp256k1.multiply(point, s*rInv % n)
+        zG=Secp256k1.multiplyG((-z*rInv) % n)
+        pub=Secp256k1.toAffine(Secp256k1.add((sR[0], sR[1], 1), (zG[0], zG[1], 1)))
+        return EosKeys.publicKeyToString(pub)
+
+    @staticmethod
+    def privateKeyFromSeed(seed):
+        """Private key int derived from a seed string, sha256 of it rehashed until it is a valid key."""
+        digest=hashlib.sha256(seed.encode("utf-8")).digest()
+        while not 1 <= int.from_bytes(digest, "big") < Secp256k1.N:
+            digest=hashlib.sha256(digest).digest()
+        return int.from_bytes(digest, "big")
+
+    @staticmethod
+    def createKeyPair(seed=None):
+        """(WIF private key, EOS... public key), random or derived from seed."""
+        key=EosKeys.privateKeyFromSeed(seed) if seed is not None else random.SystemRandom().randrange(1, Secp256k1.N)
+        return (EosKeys.privateKeyToWif(key), EosKeys.publicKeyToString(EosKeys.publicKeyPoint(key)))
+
+    @staticmethod
+    def keyPairsRange(first, last, seed=None):
+        """Key pairs first..last-1 of createKeyPairs."""
+        return [EosKeys.createKeyPair(None if seed is None else "%s/%d" % (seed, i)) for i in range(first, last)]
+
+    @staticmethod
+    def createKeyPairs(count, seed=None, workers=None):
+        """count (WIF private key, EOS... public key) pairs, generated by workers processes (default: one per cpu).
+        With a seed pair i is derived from seed and i, so the same seed gives the same keys on every run."""
+        workers=workers if workers is not None else os.cpu_count() or 1
+        if count < EosKeys.ParallelKeyPairsMin or workers < 2:
+            return EosKeys.keyPairsRange(0, count, seed)
+        chunk=(count+workers-1)//workers
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures=[executor.submit(EosKeys.keyPairsRange, first, min(first+chunk, count), seed) for first in range(0, count, chunk)]
+            return [pair for future in futures for pair in future.result()]
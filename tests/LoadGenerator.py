@@ -0,0 +1,342 @@
+import math
+import os
+import queue
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from testUtils import Utils
+from EosKeys import EosKeys
+from RpcClient import RpcClient
+from RpcClient import RpcError
+from TransactionBuilder import TransactionBuilder
+from TransactionTracker import TransactionTracker
+
+###########################################################################################
+class Schedule(object):
+    """Open loop arrival schedule: the offsets, in seconds from the start of a run, at which transactions are sent
+    whether or not the earlier ones have been answered yet."""
+
+    def __init__(self, description, offsets, duration):
+        self.description=description
+        self.offsets=offsets
+        self.duration=duration
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __str__(self):
+        return self.description
+
+    @staticmethod
+    def constant(rate, duration):
+        """rate transactions per second, evenly spaced, for duration seconds."""
+        assert rate > 0
+        count=int(rate*duration)
+        return Schedule("constant %g tps for %gs" % (rate, duration), array("d", (i/rate for i in range(count))), duration)
+
+    @staticmethod
+    def poisson(rate, duration, seed=None):
+        """Poisson arrivals averaging rate transactions per second for duration seconds. The same seed gives the same
+        arrivals."""
+        assert rate > 0
+        rand=random.Random(seed)
+        offsets=array("d")
+        offset=rand.expovariate(rate)
+        while offset < duration:
+            offsets.append(offset)
+            offset+=rand.expovariate(rate)
+        return Schedule("poisson %g tps for %gs" % (rate, duration), offsets, duration)
+
+    @staticmethod
+    def step(steps):
+        """Constant rate steps, [(rate, seconds), ...] one after the other."""
+        offsets=array("d")
+        start=0.0
+        for rate,duration in steps:
+            offsets.extend(start + i/rate for i in range(int(rate*duration)))
+            start+=duration
+        return Schedule("steps %s" % (", ".join("%g tps for %gs" % (rate, duration) for rate,duration in steps)), offsets, start)
+
+###########################################################################################
+class LoadStats(object):
+    """Live accounting of a load run, updated from the generator's threads. Latencies are in seconds from each
+    transaction's scheduled send time, so a generator or node falling behind shows up in them instead of being hidden
+    by sending later."""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self):
+        self.__lock=threading.Lock()
+        self.scheduled=0
+        self.sent=0
+        self.accepted=0
+        self.failed=0
+        self.included=0
+        self.irreversible=0
+        self.expired=0
+        self.dropped=0
+        self.errors={}            # error description -> count
+        self.maxSendLag=0.0       # most a send was behind its scheduled time
+        self.start=None
+        self.lastSend=None
+        self.lastInclusion=None
+        self.lastIrreversible=None
+        self.pushLatencies=array("d")
+        self.inclusionLatencies=array("d")
+        self.irreversibleLatencies=array("d")
+
+    def recordDispatch(self, lag):
+        with self.__lock:
+            self.maxSendLag=max(self.maxSendLag, lag)
+
+    def recordSent(self, count):
+        with self.__lock:
+            self.sent+=count
+
+    def recordPush(self, scheduledTime, now, error=None):
+        with self.__lock:
+            self.lastSend=now
+            if error is not None:
+                self.failed+=1
+                self.errors[error]=self.errors.get(error, 0)+1
+                return
+            self.accepted+=1
+            self.pushLatencies.append(now-scheduledTime)
+
+    def recordInclusion(self, scheduledTime):
+        """A transaction made it into a block (counted once, even if it is forked out and included again)."""
+        now=time.time()
+        with self.__lock:
+            self.included+=1
+            self.lastInclusion=now
+            self.inclusionLatencies.append(now-scheduledTime)
+
+    def recordFinal(self, scheduledTime, state):
+        """A transaction reached its final state: irreversible, expired or dropped."""
+        now=time.time()
+        with self.__lock:
+            if state == TransactionTracker.Irreversible:
+                self.irreversible+=1
+                self.lastIrreversible=now
+                self.irreversibleLatencies.append(now-scheduledTime)
+            elif state == TransactionTracker.Expired:
+                self.expired+=1
+            elif state == TransactionTracker.Dropped:
+                self.dropped+=1
+
+    def settled(self, waitForLib):
+        """Whether every accepted transaction has reached its final state (or inclusion, without waitForLib)."""
+        with self.__lock:
+            done=self.irreversible if waitForLib else self.included
+            return done + self.expired + self.dropped >= self.accepted
+
+    @staticmethod
+    def percentiles(values, pcts=(50, 95, 99)):
+        """{"p50": ..., ...} nearest rank percentiles of values, None if there are none."""
+        ordered=sorted(values)
+        return {"p%d" % (pct): ordered[max(int(math.ceil(pct/100.0*len(ordered)))-1, 0)] if ordered else None for pct in pcts}
+
+    @staticmethod
+    def rate(count, start, end):
+        return count/(end-start) if count and start is not None and end is not None and end > start else 0.0
+
+    def summary(self):
+        """The run's numbers as a dict: counts, achieved tps and p50/p95/p99 latencies (seconds) to the push
+        response, to inclusion and to LIB."""
+        with self.__lock:
+            summary={"scheduled": self.scheduled, "sent": self.sent, "accepted": self.accepted, "failed": self.failed,
+                     "included": self.included, "irreversible": self.irreversible, "expired": self.expired,
+                     "dropped": self.dropped, "errors": dict(self.errors), "maxSendLag": self.maxSendLag,
+                     "sentTps": LoadStats.rate(self.sent, self.start, self.lastSend),
+                     "includedTps": LoadStats.rate(self.included, self.start, self.lastInclusion)}
+            for name,values in [("pushLatency", self.pushLatencies), ("inclusionLatency", self.inclusionLatencies),
+                                ("irreversibleLatency", self.irreversibleLatencies)]:
+                summary[name]=LoadStats.percentiles(values)
+            return summary
+
+    def report(self):
+        summary=self.summary()
+        def latencies(name):
+            values=summary[name + "Latency"]
+            if values["p50"] is None:
+                return "%s latency: -" % (name)
+            return "%s latency: p50 %.3fs, p95 %.3fs, p99 %.3fs" % (name, values["p50"], values["p95"], values["p99"])
+        lines=["sent %d/%d (%.1f tps, max lag %.3fs), accepted %d, failed %d, included %d (%.1f tps), irreversible %d, expired %d, dropped %d" % (
+                   summary["sent"], summary["scheduled"], summary["sentTps"], summary["maxSendLag"], summary["accepted"], summary["failed"],
+                   summary["included"], summary["includedTps"], summary["irreversible"], summary["expired"], summary["dropped"]),
+               latencies("push"), latencies("inclusion"), latencies("irreversible")]
+        lines+=["error (%d times): %s" % (count, error) for error,count in sorted(summary["errors"].items(), key=lambda item: -item[1])]
+        return "\n".join(lines)
+
+###########################################################################################
+class LoadGenerator(object):
+    """Sends transactions to one node following a Schedule. makeActions(i) returns the actions of transaction i (it
+    must make each transaction unique, e.g. with a memo); signers maps account names to the Accounts whose private
+    keys sign them (see TransactionBuilder.keysFor).
+
+    All transactions are built and signed before the clock starts, by a process pool for large runs, so sending
+    costs only the push: a dispatcher releases each transaction at its scheduled time into a queue drained by a
+    fixed pool of workers over one pool of keep-alive connections, and a worker that finds more transactions due
+    sends them together in one push_transactions request (up to maxBatch). Inclusion and finality come from the
+    node's TransactionTracker, polled every PollInterval seconds in the background."""
+
+    # seconds transactions stay valid beyond the schedule's duration, covers signing them beforehand
+    ExpirationMargin=300
+    # nodeos' default max_transaction_lifetime
+    MaxExpiration=3600
+    PollInterval=0.1
+    # transactions per signing task of the process pool
+    SignChunk=500
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, node, schedule, makeActions, signers, workers=16, maxBatch=100, waitForLib=True, reportInterval=None):
+        assert 0 < maxBatch <= node.MaxPushTransactionsBatch
+        self.node=node
+        self.schedule=schedule
+        self.makeActions=makeActions
+        self.signers=signers
+        self.workers=workers
+        self.maxBatch=maxBatch
+        self.waitForLib=waitForLib
+        self.reportInterval=reportInterval
+        self.stats=LoadStats()
+        self.stats.scheduled=len(schedule)
+        self.transIds=[]
+        self.__signed=None
+        self.__expiration=None
+        self.__queue=queue.Queue()
+        self.__rpc=RpcClient(node.host, node.port, maxConnections=workers)
+
+    def prepare(self, signWorkers=None):
+        """Build and sign every transaction of the schedule."""
+        expiration=int(math.ceil(self.schedule.duration))+LoadGenerator.ExpirationMargin
+        assert expiration <= LoadGenerator.MaxExpiration, print("ERROR: %s is longer than transactions can be valid" % (self.schedule))
+        builder=self.node.transactionBuilder()
+        info=builder.tapos()
+        items=[]
+        for i in range(len(self.schedule)):
+            actions=[builder.serializeAction(action) for action in self.makeActions(i)]
+            trx=TransactionBuilder.makeTransaction(actions, info, None, expiration)
+            items.append((trx, TransactionBuilder.keysFor(actions, self.signers)))
+        self.__expiration=TransactionTracker.parseBlockTime(items[0][0]["expiration"]) if items else None
+
+        start=time.perf_counter()
+        signWorkers=signWorkers if signWorkers is not None else os.cpu_count() or 1
+        if len(items) < EosKeys.ParallelKeyPairsMin or signWorkers < 2:
+            self.__signed=TransactionBuilder.signTransactions(info["chain_id"], items)
+        else:
+            with ProcessPoolExecutor(max_workers=signWorkers) as executor:
+                futures=[executor.submit(TransactionBuilder.signTransactions, info["chain_id"], items[first:first+LoadGenerator.SignChunk])
+                         for first in range(0, len(items), LoadGenerator.SignChunk)]
+                self.__signed=[signed for future in futures for signed in future.result()]
+        if Utils.Debug: Utils.Print("Signed %d transactions in %.3f sec" % (len(items), time.perf_counter()-start))
+
+    def __push(self, batch):
+        """batch is [(index, scheduled time)]"""
+        params=[self.__signed[index][1] for index,_ in batch]
+        self.stats.recordSent(len(batch))
+        try:
+            results=self.__rpc.chain("push_transactions", params)
+        except RpcError as ex:
+            now=time.time()
+            for _,scheduledTime in batch:
+                self.stats.recordPush(scheduledTime, now, "push_transactions returned %s" % (ex.code))
+            return
+        now=time.time()
+        tracker=self.node.transactionTracker
+        for (index,scheduledTime),trans in zip(batch, results):
+            error=trans.get("processed", {}).get("error")
+            if error is not None:
+                self.stats.recordPush(scheduledTime, now, error.get("what") or error.get("name") or str(error.get("code")))
+                continue
+            transId=self.__signed[index][0]
+            blockNum=trans.get("processed", {}).get("block_num")
+            tracker.track(transId, hintBlockNum=blockNum, expiration=self.__expiration)
+            self.stats.recordPush(scheduledTime, now)
+            self.transIds.append(transId)
+            tracker.onState(transId, lambda transId, state, scheduledTime=scheduledTime: self.__recordState(transId, scheduledTime, state),
+                            TransactionTracker.Included)
+
+    def __recordState(self, transId, scheduledTime, state):
+        """Called once per transaction when it is included or final. An included transaction is then followed on to
+        its final state."""
+        if state in (TransactionTracker.Included, TransactionTracker.Irreversible):
+            self.stats.recordInclusion(scheduledTime)
+        if state in TransactionTracker.FinalStates:
+            self.stats.recordFinal(scheduledTime, state)
+        else:
+            self.node.transactionTracker.onState(transId, lambda _, state: self.stats.recordFinal(scheduledTime, state),
+                                                 TransactionTracker.Irreversible)
+
+    def __worker(self):
+        while True:
+            item=self.__queue.get()
+            if item is None:
+                # leave the end marker for the other workers
+                self.__queue.put(None)
+                return
+            batch=[item]
+            while len(batch) < self.maxBatch:
+                try:
+                    item=self.__queue.get_nowait()
+                except queue.Empty as _:
+                    break
+                if item is None:
+                    self.__queue.put(None)
+                    break
+                batch.append(item)
+            try:
+                self.__push(batch)
+            except Exception as ex: # pylint: disable=broad-except
+                now=time.time()
+                for _,scheduledTime in batch:
+                    self.stats.recordPush(scheduledTime, now, "push failed: %s" % (ex))
+
+    def __dispatch(self):
+        start=time.time()+0.1
+        self.stats.start=start
+        nextReport=start + self.reportInterval if self.reportInterval else None
+        for index,offset in enumerate(self.schedule.offsets):
+            due=start+offset
+            now=time.time()
+            if due > now:
+                time.sleep(due-now)
+                now=time.time()
+            self.__queue.put((index, due))
+            self.stats.recordDispatch(now-due)
+            if nextReport is not None and now >= nextReport:
+                Utils.Print("load %s at %.0fs: %s" % (self.schedule, now-start, self.stats.report().split("\n")[0]))
+                nextReport+=self.reportInterval
+
+    def run(self, timeout=None):
+        """Send the schedule (preparing it first if needed), then wait up to timeout seconds (default: the system wait
+        timeout) for the accepted transactions to be included, or irreversible with waitForLib. Returns the LoadStats."""
+        if self.__signed is None:
+            self.prepare()
+        Utils.Print("Load generator: %s to %s with %d workers" % (self.schedule, self.node, self.workers))
+        tracker=self.node.transactionTracker
+        startedTracker=not tracker.isRunning()
+        if startedTracker:
+            tracker.start(LoadGenerator.PollInterval)
+        try:
+            threads=[threading.Thread(target=self.__worker, name="LoadGenerator-%d" % (i), daemon=True) for i in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                self.__dispatch()
+            finally:
+                self.__queue.put(None)
+                for thread in threads:
+                    thread.join()
+            timeout=timeout if timeout is not None else Utils.systemWaitTimeout
+            if not Utils.waitForBool(lambda: self.stats.settled(self.waitForLib), timeout, sleepTime=LoadGenerator.PollInterval,
+                                     maxSleepTime=LoadGenerator.PollInterval):
+                Utils.Print("WARNING: not all accepted transactions were %s before timeout" % ("irreversible" if self.waitForLib else "included"))
+        finally:
+            if startedTracker:
+                tracker.stop()
+            self.__rpc.close()
+        Utils.Print("Load generator results for %s:\n%s" % (self.schedule, self.stats.report()))
+        return self.stats
@@ -0,0 +1,113 @@
+import atexit
+import json
+import sys
+import threading
+import time
+
+###########################################################################################
+class Logger(object):
+    """Leveled logger behind Utils.Print. Text goes to stream (sys.stdout by default) indented by call depth, as
+    Utils.Print always has; with trackDepth off there is no indentation at all. Records can also be written to a
+    JSON-lines file, one {"ts", "level", "depth", "thread", "msg"} object per line. Records are only flushed at Error
+    level, otherwise the stream's own buffering applies and the JSON file is flushed every flushInterval seconds."""
+
+    Debug=10
+    Info=20
+    Warning=30
+    Error=40
+    LevelNames={Debug: "DEBUG", Info: "INFO", Warning: "WARNING", Error: "ERROR"}
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, level=Info, stream=None, trackDepth=True, jsonLogFile=None, flushInterval=1.0):
+        self.level=level
+        self.stream=stream
+        self.trackDepth=trackDepth
+        self.flushInterval=flushInterval
+        self.recordCount=0
+        self.__jsonFile=None
+        self.__lastFlush=time.time()
+        self.__lock=threading.Lock()
+        if jsonLogFile is not None:
+            self.setJsonLogFile(jsonLogFile)
+        atexit.register(self.close)
+
+    @staticmethod
+    def levelOf(msg):
+        """Level for an unleveled message, from the ERROR/FAILURE/WARNING prefixes used throughout the tests."""
+        if msg.startswith("ERROR") or msg.startswith("FAILURE"):
+            return Logger.Error
+        if msg.startswith("WARN"):
+            return Logger.Warning
+        return Logger.Info
+
+    @staticmethod
+    def callDepth(skip=0):
+        """Number of frames on the calling thread's stack, less skip. Walks frame links only, unlike inspect.stack()
+        which also reads the source context of every frame."""
+        frame=sys._getframe(skip+1) # pylint: disable=protected-access
+        depth=0
+        while frame is not None:
+            depth+=1
+            frame=frame.f_back
+        return depth
+
+    def setJsonLogFile(self, path):
+        with self.__lock:
+            if self.__jsonFile is not None:
+                self.__jsonFile.close()
+                self.__jsonFile=None
+            if path is not None:
+                self.__jsonFile=open(path, "a", buffering=1024*1024)
+
+    def isEnabledFor(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, end="\n", depth=None):
+        """Write msg at level. depth defaults to the caller's call depth less one, the indentation Utils.Print has
+        always used (0 when trackDepth is off)."""
+        if level < self.level:
+            return
+        if depth is None:
+            depth=Logger.callDepth(1)-1 if self.trackDepth else 0
+        stream=self.stream if self.stream is not None else sys.stdout
+        with self.__lock:
+            self.recordCount+=1
+            stream.write("%s%s%s" % (' '*depth, msg, end))
+            if level >= Logger.Error:
+                stream.flush()
+            if self.__jsonFile is not None:
+                record={"ts": time.time(), "level": Logger.LevelNames.get(level, level), "depth": depth,
+                        "thread": threading.current_thread().name, "msg": msg}
+                self.__jsonFile.write(json.dumps(record) + "\n")
+                now=time.time()
+                if level >= Logger.Error or now - self.__lastFlush >= self.flushInterval:
+                    self.__jsonFile.flush()
+                    self.__lastFlush=now
+
+    def debug(self, msg):
+        self.log(Logger.Debug, msg, depth=Logger.callDepth(1)-1 if self.trackDepth else 0)
+
+    def info(self, msg):
+        self.log(Logger.Info, msg, depth=Logger.callDepth(1)-1 if self.trackDepth else 0)
+
+    def warning(self, msg):
+        self.log(Logger.Warning, msg, depth=Logger.callDepth(1)-1 if self.trackDepth else 0)
+
+    def error(self, msg):
+        self.log(Logger.Error, msg, depth=Logger.callDepth(1)-1 if self.trackDepth else 0)
+
+    def flush(self):
+        stream=self.stream if self.stream is not None else sys.stdout
+        with self.__lock:
+            stream.flush()
+            if self.__jsonFile is not None:
+                self.__jsonFile.flush()
+                self.__lastFlush=time.time()
+
+    def close(self):
+        try:
+            self.flush()
+        except (OSError, ValueError) as _:
+            # stream already closed during interpreter shutdown
+            pass
+        self.setJsonLogFile(None)
@@ -0,0 +1,310 @@
+import base64
+import datetime
+import json
+import queue
+import re
+import subprocess
+import threading
+import time
+
+from testUtils import Utils
+
+###########################################################################################
+class MongoError(Exception):
+    """Raised when a mongo shell query fails or the shell cannot be reached. output is the shell's error text."""
+
+    def __init__(self, expression, output):
+        self.expression=expression
+        self.output=output
+        super().__init__("mongo query \"%s\" failed: %s" % (expression, output))
+
+###########################################################################################
+class ExtendedJson(object):
+    """Decoder for MongoDB Extended JSON, both the mongo shell mode printed by tojson() (ObjectId("..."),
+    NumberLong(...), ISODate("..."), ...) and the strict mode {"$oid": ...} wrappers. BSON types decode to plain json
+    values: ObjectId -> hex string, dates -> ISO-8601 string, NumberLong/NumberInt -> int, NumberDecimal -> string,
+    BinData -> base64 string, Timestamp -> {"t": seconds, "i": increment}."""
+
+    __whitespace=re.compile(r"\s*")
+    __number=re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+    __identifier=re.compile(r"(?:new\s+)?([A-Za-z_$][\w$]*)")
+
+    def __init__(self, text):
+        self.text=text
+        self.pos=0
+
+    @staticmethod
+    def loads(text):
+        decoder=ExtendedJson(text)
+        value=decoder.__value()
+        decoder.__skip()
+        if decoder.pos != len(text):
+            decoder.__fail("trailing data")
+        return value
+
+    @staticmethod
+    def fromStrict(obj):
+        """object_hook for strict mode wrappers."""
+        if len(obj) == 1:
+            key,value=next(iter(obj.items()))
+            if key == "$oid":
+                return value
+            if key in ("$numberLong", "$numberInt"):
+                return int(value)
+            if key == "$numberDecimal":
+                return value
+            if key == "$date":
+                if isinstance(value, dict):
+                    value=int(value["$numberLong"])
+                if isinstance(value, int):
+                    return ExtendedJson.isoDate(value)
+                return value
+        elif len(obj) == 2 and "$binary" in obj and "$type" in obj:
+            return obj["$binary"]
+        if "$timestamp" in obj and len(obj) == 1:
+            return {"t": obj["$timestamp"]["t"], "i": obj["$timestamp"]["i"]}
+        return obj
+
+    @staticmethod
+    def isoDate(millis):
+        date=datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=millis)
+        return date.strftime("%Y-%m-%dT%H:%M:%S.") + "%03dZ" % (date.microsecond//1000)
+
+    def __fail(self, msg):
+        raise ValueError("%s at offset %d: %s" % (msg, self.pos, self.text[self.pos:self.pos+40]))
+
+    def __skip(self):
+        self.pos=ExtendedJson.__whitespace.match(self.text, self.pos).end()
+
+    def __expect(self, char):
+        self.__skip()
+        if not self.text.startswith(char, self.pos):
+            self.__fail("expected '%s'" % (char))
+        self.pos+=1
+
+    def __value(self):
+        self.__skip()
+        if self.pos >= len(self.text):
+            self.__fail("unexpected end")
+        char=self.text[self.pos]
+        if char == "{":
+            return self.__object()
+        if char == "[":
+            return self.__array()
+        if char == '"':
+            value,self.pos=json.decoder.scanstring(self.text, self.pos+1)
+            return value
+        match=ExtendedJson.__number.match(self.text, self.pos)
+        if match:
+            self.pos=match.end()
+            number=match.group(0)
+            return float(number) if any(c in number for c in ".eE") else int(number)
+        match=ExtendedJson.__identifier.match(self.text, self.pos)
+        if match:
+            self.pos=match.end()
+            return self.__constructor(match.group(1))
+        return self.__fail("unexpected character")
+
+    def __object(self):
+        self.pos+=1
+        obj={}
+        self.__skip()
+        if self.text.startswith("}", self.pos):
+            self.pos+=1
+            return obj
+        while True:
+            self.__skip()
+            key=self.__value()
+            if not isinstance(key, str):
+                self.__fail("object key must be a string")
+            self.__expect(":")
+            obj[key]=self.__value()
+            self.__skip()
+            if self.text.startswith(",", self.pos):
+                self.pos+=1
+                continue
+            self.__expect("}")
+            return ExtendedJson.fromStrict(obj)
+
+    def __array(self):
+        self.pos+=1
+        arr=[]
+        self.__skip()
+        if self.text.startswith("]", self.pos):
+            self.pos+=1
+            return arr
+        while True:
+            arr.append(self.__value())
+            self.__skip()
+            if self.text.startswith(",", self.pos):
+                self.pos+=1
+                continue
+            self.__expect("]")
+            return arr
+
+    def __args(self):
+        self.__skip()
+        if not self.text.startswith("(", self.pos):
+            return None
+        self.pos+=1
+        args=[]
+        self.__skip()
+        if self.text.startswith(")", self.pos):
+            self.pos+=1
+            return args
+        while True:
+            args.append(self.__value())
+            self.__skip()
+            if self.text.startswith(",", self.pos):
+                self.pos+=1
+                continue
+            self.__expect(")")
+            return args
+
+    # pylint: disable=too-many-return-statements
+    def __constructor(self, name):
+        if name in ("true", "false"):
+            return name == "true"
+        if name in ("null", "undefined"):
+            return None
+        if name in ("NaN", "Infinity"):
+            return float(name)
+        if name in ("MinKey", "MaxKey"):
+            self.__args()
+            return name
+        args=self.__args()
+        if args is None:
+            return self.__fail("unknown identifier %s" % (name))
+        if name in ("ObjectId", "NumberDecimal", "UUID", "HexData"):
+            return args[-1]
+        if name in ("NumberLong", "NumberInt"):
+            return int(args[0])
+        if name in ("ISODate", "Date"):
+            if not args:
+                return ExtendedJson.isoDate(int(time.time()*1000))
+            return args[0] if isinstance(args[0], str) else ExtendedJson.isoDate(int(args[0]))
+        if name == "Timestamp":
+            return {"t": args[0], "i": args[1]}
+        if name == "BinData":
+            # validate the payload, it is kept base64 encoded
+            base64.b64decode(args[1])
+            return args[1]
+        if name == "DBRef":
+            return {"$ref": args[0], "$id": args[1]}
+        return self.__fail("unsupported type %s" % (name))
+
+###########################################################################################
+class MongoSession(object):
+    """One long-lived mongo shell process, instead of a new shell per query. Queries (shell expressions) are written to
+    the shell's stdin one at a time, each framed by marker lines in the output, and their results decoded with
+    ExtendedJson. Cursors are converted to arrays. Safe to share between threads, queries are serialized."""
+
+    __marker="@@mongosession"
+
+    def __init__(self, mongoPath, endpointArgs, timeout=None):
+        self.cmd=[mongoPath, "--quiet"] + endpointArgs.split()
+        self.timeout=timeout if timeout is not None else Utils.rpcTimeout
+        self.__proc=None
+        self.__lines=None
+        self.__seq=0
+        self.__lock=threading.Lock()
+        self.queryCount=0
+        self.queryDuration=0.0
+
+    def __str__(self):
+        return " ".join(self.cmd)
+
+    def __start(self):
+        if Utils.Debug: Utils.Print("Starting mongo session: %s" % (self))
+        try:
+            self.__proc=subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                         universal_newlines=True, bufsize=1)
+        except OSError as ex:
+            raise MongoError("", "could not start \"%s\": %s" % (self, ex))
+        self.__lines=queue.Queue()
+        threading.Thread(target=MongoSession.__readLines, args=(self.__proc.stdout, self.__lines), daemon=True).start()
+
+    @staticmethod
+    def __readLines(stream, lines):
+        for line in stream:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    def isAlive(self):
+        return self.__proc is not None and self.__proc.poll() is None
+
+    def query(self, expression, timeout=None):
+        """Evaluate expression in the shell and return its decoded result (None for null)."""
+        assert(isinstance(expression, str))
+        if timeout is None:
+            timeout=self.timeout
+        with self.__lock:
+            if not self.isAlive():
+                self.close()
+                self.__start()
+            self.__seq+=1
+            marker="%s %d" % (MongoSession.__marker, self.__seq)
+            script=('print("%s begin"); try { var __r=(%s); '
+                    'if (__r !== null && __r !== undefined && typeof __r.toArray === "function") { __r=__r.toArray(); } '
+                    'print(tojson(__r, "", true)); } catch (__e) { print("%s error " + __e); } print("%s end");\n') % (
+                        marker, expression.replace("\n", " "), marker, marker)
+            start=time.perf_counter()
+            try:
+                self.__proc.stdin.write(script)
+                self.__proc.stdin.flush()
+            except OSError as ex:
+                self.close()
+                raise MongoError(expression, "mongo shell went away: %s" % (ex))
+
+            output=self.__collect(expression, marker, start+timeout)
+            self.queryCount+=1
+            self.queryDuration+=time.perf_counter()-start
+
+        errorPrefix="%s error " % (marker)
+        for line in output:
+            if line.startswith(errorPrefix):
+                raise MongoError(expression, line[len(errorPrefix):])
+        result=[line for line in output if line.strip()]
+        if not result:
+            raise MongoError(expression, "no output")
+        try:
+            return ExtendedJson.loads(result[-1])
+        except ValueError as ex:
+            raise MongoError(expression, "could not decode \"%s\": %s" % (result[-1], ex))
+
+    def __collect(self, expression, marker, deadline):
+        """Lines the shell printed between the begin and end markers of this query."""
+        output=None
+        noise=[]
+        while True:
+            try:
+                line=self.__lines.get(timeout=max(deadline-time.perf_counter(), 0))
+            except queue.Empty as _:
+                # the shell is stuck in this query, a new one is started for the next
+                self.close()
+                raise MongoError(expression, "timed out")
+            if line is None:
+                self.close()
+                raise MongoError(expression, "mongo shell exited. %s" % ("\n".join(noise)))
+            if line == marker + " begin":
+                output=[]
+            elif line == marker + " end":
+                return output
+            elif output is not None:
+                output.append(line)
+            else:
+                noise.append(line)
+
+    def close(self):
+        if self.__proc is None:
+            return
+        try:
+            self.__proc.stdin.close()
+        except OSError as _:
+            pass
+        try:
+            self.__proc.wait(timeout=1)
+        except subprocess.TimeoutExpired as _:
+            self.__proc.kill()
+            self.__proc.wait()
+        self.__proc=None
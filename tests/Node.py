@@ -1,11 +1,14 @@
 import copy
-import decimal
 import subprocess
 import time
 import os
 import re
 import datetime
 import json
+import struct
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from core_symbol import CORE_SYMBOL
 from testUtils import Utils
@@ -13,6 +16,15 @@ from testUtils import Account
 from testUtils import EnumType
 from testUtils import addEnum
 from testUtils import unhandledEnumType
+from RpcClient import RpcClient
+from RpcClient import RpcError
+from BlockFollower import BlockFollower
+from StateHistory import StateHistoryClient
+from BlockCache import BlockCache
+from TransactionTracker import TransactionTracker
+from TransactionBuilder import TransactionBuilder
+from MongoSession import MongoSession
+from MongoSession import MongoError
 
 class ReturnType(EnumType):
     pass
@@ -28,6 +40,17 @@ addEnum(BlockType, "lib")
 
 # pylint: disable=too-many-public-methods
 class Node(object):
+    # number of getInfo results kept to estimate the node's block rate
+    BlockSampleCount=20
+    # blocks before the speculative block num reported at push time that are searched for a tracked transaction
+    TransBlockHintMargin=12
+    # seconds past head block time that built transactions expire, matches the cleos --expiration default
+    TransExpiration=30
+    # nodeos rejects push_transactions requests with more transactions than this
+    MaxPushTransactionsBatch=1000
+    # concurrent get table requests of getBalances, the size of the node's rpc connection pool
+    BalanceQueryWorkers=8
+    __lastNonce=0
 
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-arguments
@@ -44,11 +67,19 @@ class Node(object):
         self.mongoDb=mongoDb
         self.endpointHttp="http://%s:%d" % (self.host, self.port)
         self.endpointArgs="--url %s" % (self.endpointHttp)
+        self.rpc=RpcClient(self.host, self.port)
+        self.stateHistory=self.__stateHistoryClient()
         self.mongoEndpointArgs=""
+        self.__mongoSession=None
+        self.__transactionBuilder=None
         self.infoValid=None
         self.lastRetrievedHeadBlockNum=None
         self.lastRetrievedLIB=None
-        self.transCache={}
+        self.lastRetrievedHeadBlockTime=None # (time, head block time), both in seconds since the epoch, of the last getInfo
+        self.blockSamples=deque(maxlen=Node.BlockSampleCount) # (time, head block num, lib) per successful getInfo
+        self.blockFollower=BlockFollower(self)
+        self.transactionTracker=TransactionTracker(self)
+        self.blockCache=BlockCache()
         self.walletMgr=walletMgr
         self.missingTransaction=False
         if self.enableMongo:
@@ -141,6 +172,13 @@ class Node(object):
         cntxt.index(0)
         return cntxt.add("block_num")
 
+    @staticmethod
+    def getTransBlockHint(trans):
+        """Block num the node reported applying trans in (speculatively, it may end up in another one), or None."""
+        try:
+            return int(Node.getTransBlockNum(trans))
+        except (AssertionError, TypeError, ValueError, KeyError) as _:
+            return None
 
     @staticmethod
     def stdinAndCheckOutput(cmd, subcommand):
@@ -162,50 +200,6 @@ class Node(object):
 
         return (ret, outs, errs)
 
-    @staticmethod
-    def normalizeJsonObject(extJStr):
-        tmpStr=extJStr
-        tmpStr=re.sub(r'ObjectId\("(\w+)"\)', r'"ObjectId-\1"', tmpStr)
-        tmpStr=re.sub(r'ISODate\("([\w|\-|\:|\.]+)"\)', r'"ISODate-\1"', tmpStr)
-        tmpStr=re.sub(r'NumberLong\("(\w+)"\)', r'"NumberLong-\1"', tmpStr)
-        return tmpStr
-
-    @staticmethod
-    def runMongoCmdReturnJson(cmd, subcommand, trace=False, exitOnError=False):
-        """Run mongodb subcommand and return response."""
-        assert(cmd)
-        assert(isinstance(cmd, list))
-        assert(subcommand)
-        assert(isinstance(subcommand, str))
-        retId,outs,errs=Node.stdinAndCheckOutput(cmd, subcommand)
-        if retId is not 0:
-            errorMsg="mongodb call failed. cmd=[ %s ] subcommand=\"%s\" - %s" % (", ".join(cmd), subcommand, errs)
-            if exitOnError:
-                Utils.cmdError(errorMsg)
-                Utils.errorExit(errorMsg)
-
-            Utils.Print("ERROR: %s" % (errMsg))
-            return None
-        outStr=Node.byteArrToStr(outs)
-        if not outStr:
-            return None
-        extJStr=Utils.filterJsonObjectOrArray(outStr)
-        if not extJStr:
-            return None
-        jStr=Node.normalizeJsonObject(extJStr)
-        if not jStr:
-            return None
-        if trace: Utils.Print ("RAW > %s"% (outStr))
-        if trace: Utils.Print ("JSON> %s"% jStr)
-        try:
-            jsonData=json.loads(jStr)
-        except json.decoder.JSONDecodeError as _:
-            Utils.Print ("ERROR: JSONDecodeError")
-            Utils.Print ("Raw MongoDB response: > %s"% (outStr))
-            Utils.Print ("Normalized MongoDB response: > %s"% (jStr))
-            raise
-        return jsonData
-
     @staticmethod
     def getTransId(trans):
         """Retrieve transaction id from dictionary object."""
@@ -228,6 +222,12 @@ class Node(object):
     def byteArrToStr(arr):
         return arr.decode("utf-8")
 
+    def mongoSession(self):
+        """Returns the node's persistent mongo shell session, started on first use."""
+        if self.__mongoSession is None:
+            self.__mongoSession=MongoSession(Utils.MongoPath, self.mongoEndpointArgs)
+        return self.__mongoSession
+
     def validateAccounts(self, accounts):
         assert(accounts)
         assert(isinstance(accounts, list))
@@ -248,30 +248,39 @@ class Node(object):
 
     # pylint: disable=too-many-branches
     def getBlock(self, blockNum, silentErrors=False, exitOnError=False):
-        """Given a blockId will return block details."""
+        """Given a blockId will return block details. Blocks are served from blockCache when possible, reversible ones
+        only after confirming the node still has the same block id at that height."""
         assert(isinstance(blockNum, int))
         if not self.enableMongo:
+            block,revalidate=self.blockCache.lookup(blockNum)
+            if revalidate:
+                block=self.blockCache.revalidate(blockNum, block, self.getBlockIdByNum(blockNum), self.lastRetrievedLIB)
+            if block is not None:
+                return block
+
             cmdDesc="get block"
             cmd="%s %d" % (cmdDesc, blockNum)
             msg="(block number=%s)" % (blockNum);
-            return self.processCleosCmd(cmd, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
+            params={"block_num_or_id": blockNum}
+            block=self.processQueryCmd(cmd, RpcClient.ChainApi + "get_block", params, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
+            self.blockCache.addFetched(blockNum, block, self.lastRetrievedLIB)
+            return block
         else:
-            cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
             subcommand='db.blocks.findOne( { "block_num": %d } )' % (blockNum)
-            if Utils.Debug: Utils.Print("cmd: echo '%s' | %s" % (subcommand, cmd))
+            if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
             start=time.perf_counter()
             try:
-                block=Node.runMongoCmdReturnJson(cmd.split(), subcommand, exitOnError=exitOnError)
+                block=self.mongoSession().query(subcommand)
                 if Utils.Debug:
                     end=time.perf_counter()
                     Utils.Print("cmd Duration: %.3f sec" % (end-start))
 
                 if block is not None:
                     return block
-            except subprocess.CalledProcessError as ex:
+            except MongoError as ex:
                 if not silentErrors:
                     end=time.perf_counter()
-                    msg=ex.output.decode("utf-8")
+                    msg=ex.output
                     errorMsg="Exception during get db node get block.  cmd Duration: %.3f sec. %s" % (end-start, msg)
                     if exitOnError:
                         Utils.cmdError(errorMsg)
@@ -282,22 +291,32 @@ class Node(object):
 
         return None
 
+    def getBlockIdByNum(self, blockNum):
+        """Returns the id of the reversible block at blockNum on this node's current fork, or None if blockNum is
+        not in the node's fork database (e.g. because it is irreversible)."""
+        cmdDesc="get block"
+        cmd="%s %d --header-state" % (cmdDesc, blockNum)
+        params={"block_num_or_id": blockNum}
+        state=self.processQueryCmd(cmd, RpcClient.ChainApi + "get_block_header_state", params, cmdDesc, silentErrors=True)
+        if state is None:
+            return None
+        return state["id"]
+
     def getBlockByIdMdb(self, blockId, silentErrors=False):
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
         subcommand='db.blocks.findOne( { "block_id": "%s" } )' % (blockId)
-        if Utils.Debug: Utils.Print("cmd: echo '%s' | %s" % (subcommand, cmd))
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
         start=time.perf_counter()
         try:
-            trans=Node.runMongoCmdReturnJson(cmd.split(), subcommand)
+            trans=self.mongoSession().query(subcommand)
             if Utils.Debug:
                 end=time.perf_counter()
                 Utils.Print("cmd Duration: %.3f sec" % (end-start))
             if trans is not None:
                 return trans
-        except subprocess.CalledProcessError as ex:
+        except MongoError as ex:
             if not silentErrors:
                 end=time.perf_counter()
-                msg=ex.output.decode("utf-8")
+                msg=ex.output
                 Utils.Print("ERROR: Exception during db get block by id.  cmd Duration: %.3f sec. %s" % (end-start, msg))
             return None
 
@@ -345,8 +364,10 @@ class Node(object):
             cmdDesc="get transaction"
             cmd="%s %s" % (cmdDesc, transId)
             msg="(transaction id=%s)" % (transId);
+            path=RpcClient.HistoryApi + "get_transaction"
+            params={"id": transId}
             for i in range(0,(int(60/timeout) - 1)):
-                trans=self.processCleosCmd(cmd, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnErrorForDelayed, exitMsg=msg)
+                trans=self.processQueryCmd(cmd, path, params, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnErrorForDelayed, exitMsg=msg)
                 if trans is not None or not delayedRetry:
                     return trans
                 if Utils.Debug: Utils.Print("Could not find transaction with id %s, delay and retry" % (transId))
@@ -354,7 +375,7 @@ class Node(object):
 
             self.missingTransaction=True
             # either it is there or the transaction has timed out
-            return self.processCleosCmd(cmd, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
+            return self.processQueryCmd(cmd, path, params, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=msg)
         else:
             for i in range(0,(int(60/timeout) - 1)):
                 trans=self.getTransactionMdb(transId, silentErrors=silentErrors, exitOnError=exitOnErrorForDelayed)
@@ -367,24 +388,23 @@ class Node(object):
 
     def getTransactionMdb(self, transId, silentErrors=False, exitOnError=False):
         """Get transaction from MongoDB. Since DB only contains finalized blocks, transactions can take a while to appear in DB."""
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
         #subcommand='db.Transactions.findOne( { $and : [ { "trx_id": "%s" }, {"irreversible":true} ] } )' % (transId)
         subcommand='db.transactions.findOne( { "trx_id": "%s" } )' % (transId)
-        if Utils.Debug: Utils.Print("cmd: echo '%s' | %s" % (subcommand, cmd))
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
         start=time.perf_counter()
         try:
-            trans=Node.runMongoCmdReturnJson(cmd.split(), subcommand, exitOnError=exitOnError)
+            trans=self.mongoSession().query(subcommand)
             if Utils.Debug:
                 end=time.perf_counter()
                 Utils.Print("cmd Duration: %.3f sec" % (end-start))
             if trans is not None:
                 return trans
-        except subprocess.CalledProcessError as ex:
+        except MongoError as ex:
             end=time.perf_counter()
-            msg=ex.output.decode("utf-8")
+            msg=ex.output
             errorMsg="Exception during get db node get trans in mongodb with transaction id=%s.  cmd Duration: %.3f sec.  %s" % (transId, end-start, msg)
             if exitOnError:
-                Utils.cmdError("" % (errorMsg))
+                Utils.cmdError(errorMsg)
                 Utils.errorExit("Failed to retrieve transaction in mongodb for transaction id=%s" % (transId))
             elif not silentErrors:
                 Utils.Print("ERROR: %s" % (errorMsg))
@@ -428,6 +448,32 @@ class Node(object):
         """Given a transaction Id (string), will return the actual block id (int) containing the transaction"""
         assert(transId)
         assert(isinstance(transId, str))
+        follower=self.blockFollower
+        follower.update()
+        blockNum=follower.getTransBlockNum(transId)
+        if blockNum is not None:
+            if Utils.Debug: Utils.Print("Found transaction %s in block %d" % (transId, blockNum))
+            return blockNum
+
+        # not in the followed blocks, extend them back far enough to cover the transaction if needed
+        startBlockNum=self.getTransStartBlockNum(transId, delayedRetry=delayedRetry)
+        if startBlockNum is None:
+            return None
+
+        if Utils.Debug: Utils.Print("Search start block num %d, followed blocks: %s-%s" % (startBlockNum, follower.firstBlockNum, follower.lastBlockNum))
+        if follower.firstBlockNum is None or startBlockNum < follower.firstBlockNum:
+            follower.backfill(startBlockNum)
+            blockNum=follower.getTransBlockNum(transId)
+            if blockNum is not None and Utils.Debug: Utils.Print("Found transaction %s in block %d" % (transId, blockNum))
+        return blockNum
+
+    def getTransStartBlockNum(self, transId, delayedRetry=True):
+        """Lowest block number that can contain transId. Based on the push result when this node sent the transaction,
+        otherwise on the transaction's reference block."""
+        tracked=self.transactionTracker.get(transId)
+        if tracked is not None and tracked.hintBlockNum is not None:
+            return tracked.hintBlockNum
+
         trans=self.getTransaction(transId, exitOnError=True, delayedRetry=delayedRetry)
 
         refBlockNum=None
@@ -444,21 +490,7 @@ class Node(object):
             Utils.Print("transaction%s not found. Transaction: %s" % (key, trans))
             return None
 
-        headBlockNum=self.getHeadBlockNum()
-        assert(headBlockNum)
-        try:
-            headBlockNum=int(headBlockNum)
-        except(ValueError) as _:
-            Utils.Print("ERROR: Block info parsing failed. %s" % (headBlockNum))
-            raise
-
-        if Utils.Debug: Utils.Print("Reference block num %d, Head block num: %d" % (refBlockNum, headBlockNum))
-        for blockNum in range(refBlockNum, headBlockNum+1):
-            if self.isTransInBlock(str(transId), blockNum):
-                if Utils.Debug: Utils.Print("Found transaction %s in block %d" % (transId, blockNum))
-                return blockNum
-
-        return None
+        return refBlockNum
 
     def getBlockIdByTransIdMdb(self, transId):
         """Given a transaction Id (string), will return block id (int) containing the transaction. This is specific to MongoDB."""
@@ -502,12 +534,19 @@ class Node(object):
         """Check if transaction (transId) has been finalized."""
         assert(transId)
         assert(isinstance(transId, str))
-        blockId=self.getBlockIdByTransId(transId)
-        if not blockId:
-            return False
-
-        assert(isinstance(blockId, int))
-        return self.isBlockPresent(blockId, blockType=BlockType.lib)
+        self.__trackTransaction(transId)
+        # waited on, so the followed blocks are extended back to it if needed
+        future=self.transactionTracker.future(transId, TransactionTracker.Irreversible)
+        self.transactionTracker.poll()
+        return future.done() and future.result() == TransactionTracker.Irreversible
+
+    def __trackTransaction(self, transId):
+        """Make sure transId is tracked, also when it was not sent through this node (then it is looked for from its
+        reference block on)."""
+        if self.transactionTracker.get(transId) is not None:
+            return
+        startBlockNum=self.getTransStartBlockNum(transId)
+        self.transactionTracker.track(transId, hintBlockNum=None if startBlockNum is None else startBlockNum+Node.TransBlockHintMargin)
 
 
     # Create & initialize account and return creation transactions. Return transaction json object
@@ -553,19 +592,19 @@ class Node(object):
             cmdDesc="get account"
             cmd="%s -j %s" % (cmdDesc, name)
             msg="( getEosAccount(name=%s) )" % (name);
-            return self.processCleosCmd(cmd, cmdDesc, silentErrors=False, exitOnError=exitOnError, exitMsg=msg)
+            params={"account_name": name}
+            return self.processQueryCmd(cmd, RpcClient.ChainApi + "get_account", params, cmdDesc, silentErrors=False, exitOnError=exitOnError, exitMsg=msg)
         else:
             return self.getEosAccountFromDb(name, exitOnError=exitOnError)
 
     def getEosAccountFromDb(self, name, exitOnError=False):
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
         subcommand='db.accounts.findOne({"name" : "%s"})' % (name)
-        if Utils.Debug: Utils.Print("cmd: echo '%s' | %s" % (subcommand, cmd))
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
         try:
             timeout = 3
             for i in range(0,(int(60/timeout) - 1)):
                 start=time.perf_counter()
-                trans=Node.runMongoCmdReturnJson(cmd.split(), subcommand, exitOnError=exitOnError)
+                trans=self.mongoSession().query(subcommand)
                 if trans is not None:
                     if Utils.Debug:
                         end=time.perf_counter()
@@ -573,8 +612,8 @@ class Node(object):
                     return trans
                 time.sleep(timeout)
             return trans
-        except subprocess.CalledProcessError as ex:
-            msg=ex.output.decode("utf-8")
+        except MongoError as ex:
+            msg=ex.output
             if exitOnError:
                 end=time.perf_counter()
                 Utils.cmdError("Exception during get account from db for %s.  cmd Duration: %.3f sec.  %s" % (name, end-start, msg))
@@ -587,7 +626,9 @@ class Node(object):
         cmdDesc = "get table"
         cmd="%s %s %s %s" % (cmdDesc, contract, scope, table)
         msg="contract=%s, scope=%s, table=%s" % (contract, scope, table);
-        return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+        # limit matches the cleos "get table" default
+        params={"json": True, "code": contract, "scope": scope, "table": table, "limit": 10}
+        return self.processQueryCmd(cmd, RpcClient.ChainApi + "get_table_rows", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
 
     def getTableAccountBalance(self, contract, scope):
         assert(isinstance(contract, str))
@@ -611,7 +652,15 @@ class Node(object):
         cmdDesc = "get currency balance"
         cmd="%s %s %s %s" % (cmdDesc, contract, account, symbol)
         msg="contract=%s, account=%s, symbol=%s" % (contract, account, symbol);
-        return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg, returnType=ReturnType.raw)
+        if Utils.UseCleos:
+            return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg, returnType=ReturnType.raw)
+
+        params={"code": contract, "account": account, "symbol": symbol}
+        balances=self.processRpcCmd(RpcClient.ChainApi + "get_currency_balance", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+        if balances is None:
+            return None
+        # reproduce cleos output, one balance per line
+        return "".join("%s\n" % (balance) for balance in balances)
 
     def getCurrencyStats(self, contract, symbol=CORE_SYMBOL, exitOnError=False):
         """returns Json output from get currency stats."""
@@ -622,7 +671,8 @@ class Node(object):
         cmdDesc = "get currency stats"
         cmd="%s %s %s" % (cmdDesc, contract, symbol)
         msg="contract=%s, symbol=%s" % (contract, symbol);
-        return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+        params={"code": contract, "symbol": symbol}
+        return self.processQueryCmd(cmd, RpcClient.ChainApi + "get_currency_stats", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
 
     # Verifies account. Returns "get account" json return object
     def verifyAccount(self, account):
@@ -654,25 +704,39 @@ class Node(object):
         """Wait for trans id to be finalized."""
         assert(isinstance(transId, str))
         lam = lambda: self.isTransInAnyBlock(transId)
-        ret=Utils.waitForBool(lam, timeout)
+        ret=Utils.waitForBool(lam, timeout, nextProbe=self.__nextBlockWait)
         return ret
 
+    def waitForTransactionsInBlock(self, transIds, timeout=None):
+        """Wait for all transIds to be in a block, see TransactionTracker.waitForTransactions."""
+        return self.transactionTracker.waitForTransactions(transIds, TransactionTracker.Included, timeout)
+
     def waitForTransFinalization(self, transId, timeout=None):
         """Wait for trans id to be finalized."""
         assert(isinstance(transId, str))
-        lam = lambda: self.isTransFinalized(transId)
-        ret=Utils.waitForBool(lam, timeout)
-        return ret
+        return self.waitForTransactionsFinalization([transId], timeout)
+
+    def waitForTransactionsFinalization(self, transIds, timeout=None):
+        """Wait for all transIds to be finalized. Their inclusion blocks are only looked up once, after that each poll
+        is one get info compared against LIB, whatever the number of transactions waited on."""
+        for transId in transIds:
+            self.__trackTransaction(transId)
+        return self.transactionTracker.waitForTransactions(transIds, TransactionTracker.Irreversible, timeout)
+
+    def __nextBlockWait(self):
+        if self.lastRetrievedHeadBlockNum is None:
+            return None
+        return self.estimateBlockWait(self.lastRetrievedHeadBlockNum+1)
 
     def waitForNextBlock(self, timeout=None, blockType=BlockType.head):
         num=self.getBlockNum(blockType=blockType)
         lam = lambda: self.getHeadBlockNum() > num
-        ret=Utils.waitForBool(lam, timeout)
+        ret=Utils.waitForBool(lam, timeout, nextProbe=lambda: self.estimateBlockWait(num+1))
         return ret
 
     def waitForBlock(self, blockNum, timeout=None, blockType=BlockType.head):
         lam = lambda: self.getBlockNum(blockType=blockType) > blockNum
-        ret=Utils.waitForBool(lam, timeout)
+        ret=Utils.waitForBool(lam, timeout, nextProbe=lambda: self.estimateBlockWait(blockNum+1, blockType=blockType))
         return ret
 
     def waitForIrreversibleBlock(self, blockNum, timeout=None, blockType=BlockType.head):
@@ -723,8 +787,9 @@ class Node(object):
         """Converts currency string of form "12.3456 SYS" to int 123456"""
         assert(isinstance(balanceStr, str))
         balanceStr=balanceStr.split()[0]
-        #balance=int(decimal.Decimal(balanceStr[1:])*10000)
-        balance=int(decimal.Decimal(balanceStr)*10000)
+        whole,_,fraction=balanceStr.partition(".")
+        # same as int(decimal.Decimal(balanceStr)*10000), without going through Decimal
+        balance=int(whole + fraction[:4].ljust(4, "0"))
 
         return balance
 
@@ -774,11 +839,24 @@ class Node(object):
         assert(accounts)
         assert(isinstance(accounts, list))
 
-        balances={}
-        for account in accounts:
-            balance = self.getAccountEosBalance(account.name)
-            balances[account]=balance
+        balances=self.getBalances([account.name for account in accounts])
+        return dict(zip(accounts, balances))
+
+    def getBalances(self, names, contract="eosio.token", symbol=CORE_SYMBOL):
+        """Balances of accounts names, as an array of integer amounts (like currencyStrToInt) in names order, 0 for
+        accounts without a balance. The accounts table scopes are queried with BalanceQueryWorkers concurrent
+        requests."""
+        def balance(name):
+            rows=self.getTable(contract, name, "accounts", exitOnError=True)["rows"]
+            for row in rows:
+                if row["balance"].endswith(" " + symbol):
+                    return Node.currencyStrToInt(row["balance"])
+            return 0
 
+        start=time.perf_counter()
+        with ThreadPoolExecutor(max_workers=Node.BalanceQueryWorkers) as executor:
+            balances=array("q", executor.map(balance, names))
+        if Utils.Debug: Utils.Print("Got %d %s balances in %.3f sec" % (len(names), symbol, time.perf_counter()-start))
         return balances
 
     # Gets accounts mapped to key. Returns json object
@@ -786,7 +864,8 @@ class Node(object):
         cmdDesc = "get accounts"
         cmd="%s %s" % (cmdDesc, key)
         msg="key=%s" % (key);
-        return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+        params={"public_key": key}
+        return self.processQueryCmd(cmd, RpcClient.HistoryApi + "get_key_accounts", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
 
     # Get actions mapped to an account (cleos get actions)
     def getActions(self, account, pos=-1, offset=-1, exitOnError=False):
@@ -798,7 +877,8 @@ class Node(object):
             cmdDesc = "get actions"
             cmd="%s -j %s %d %d" % (cmdDesc, account.name, pos, offset)
             msg="account=%s, pos=%d, offset=%d" % (account.name, pos, offset);
-            return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+            params={"account_name": account.name, "pos": pos, "offset": offset}
+            return self.processQueryCmd(cmd, RpcClient.HistoryApi + "get_actions", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
         else:
             return self.getActionsMdb(account, pos, offset, exitOnError=exitOnError)
 
@@ -807,20 +887,20 @@ class Node(object):
         assert(isinstance(pos, int))
         assert(isinstance(offset, int))
 
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
         subcommand='db.action_traces.find({$or: [{"act.data.from":"%s"},{"act.data.to":"%s"}]}).sort({"_id":%d}).limit(%d)' % (account.name, account.name, pos, abs(offset))
-        if Utils.Debug: Utils.Print("cmd: echo '%s' | %s" % (subcommand, cmd))
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
         start=time.perf_counter()
         try:
-            actions=Node.runMongoCmdReturnJson(cmd.split(), subcommand, exitOnError=exitOnError)
+            actions=self.mongoSession().query(subcommand)
             if Utils.Debug:
                 end=time.perf_counter()
                 Utils.Print("cmd Duration: %.3f sec" % (end-start))
-            if actions is not None:
-                return actions
-        except subprocess.CalledProcessError as ex:
+            if actions:
+                # a single action is returned as the document itself, as the mongo shell printed it
+                return actions[0] if len(actions) == 1 else actions
+        except MongoError as ex:
             end=time.perf_counter()
-            msg=ex.output.decode("utf-8")
+            msg=ex.output
             errorMsg="Exception during get db actions.  cmd Duration: %.3f sec.  %s" % (end-start, msg)
             if exitOnError:
                 Utils.cmdError(errorMsg)
@@ -829,6 +909,35 @@ class Node(object):
                 Utils.Print("ERROR: %s" % (errorMsg))
         return None
 
+    def __stateHistoryClient(self):
+        """StateHistoryClient of the node's state history endpoint, None if it was not launched with the plugin."""
+        if self.cmd is None or "state_history_plugin" not in self.cmd:
+            return None
+        args=self.cmd.split()
+        endpoint="0.0.0.0:%d" % (StateHistoryClient.DefaultPort)
+        if "--state-history-endpoint" in args:
+            endpoint=args[args.index("--state-history-endpoint")+1]
+        return StateHistoryClient(self.host, int(endpoint.rpartition(":")[2]))
+
+    # pylint: disable=too-many-arguments
+    def streamBlocks(self, first, last=None, fetchBlock=True, fetchTraces=False, fetchDeltas=False, irreversibleOnly=False, idleTimeout=None):
+        """Generator of the blocks first through last (default: keep following the head) streamed from the node's state
+        history plugin on a connection of its own, see StateHistoryClient.blocks. Traces need --trace-history and
+        deltas --chain-state-history."""
+        assert self.stateHistory is not None, print("ERROR: %s does not run the state history plugin" % (self))
+        client=StateHistoryClient(self.stateHistory.host, self.stateHistory.port)
+        end=StateHistoryClient.MaxBlockNum if last is None else last+1
+        return client.blocks(first, end, irreversibleOnly=irreversibleOnly, fetchBlock=fetchBlock, fetchTraces=fetchTraces,
+                             fetchDeltas=fetchDeltas, idleTimeout=idleTimeout)
+
+    def getTransactionTraces(self, first, last):
+        """{trans id: transaction trace} of the transactions in blocks first through last, streamed from state history."""
+        traces={}
+        for result in self.streamBlocks(first, last, fetchBlock=False, fetchTraces=True):
+            for trace in result["traces"] or []:
+                traces[trace["id"]]=trace
+        return traces
+
     # Gets accounts mapped to key. Returns array
     def getAccountsArrByKey(self, key):
         trans=self.getAccountsByKey(key)
@@ -841,7 +950,8 @@ class Node(object):
         cmdDesc = "get servants"
         cmd="%s %s" % (cmdDesc, name)
         msg="name=%s" % (name);
-        return self.processCleosCmd(cmd, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
+        params={"controlling_account": name}
+        return self.processQueryCmd(cmd, RpcClient.HistoryApi + "get_controlled_accounts", params, cmdDesc, exitOnError=exitOnError, exitMsg=msg)
 
     def getServantsArr(self, name):
         trans=self.getServants(name, exitOnError=True)
@@ -863,6 +973,12 @@ class Node(object):
         return balance
 
     def getAccountCodeHash(self, account):
+        if not Utils.UseCleos:
+            cmdDesc="get code hash"
+            msg="account=%s" % (account)
+            ret=self.processRpcCmd(RpcClient.ChainApi + "get_code_hash", {"account_name": account}, cmdDesc, silentErrors=False, exitMsg=msg)
+            return None if ret is None else ret["code_hash"]
+
         cmd="%s %s get code %s" % (Utils.EosClientPath, self.eosClientArgs(), account)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         start=time.perf_counter()
@@ -921,6 +1037,8 @@ class Node(object):
             return None
 
         Node.validateTransaction(trans)
+        if self.__transactionBuilder is not None:
+            self.__transactionBuilder.invalidateAbi(account)
         return self.waitForTransBlockIfNeeded(trans, waitForTransBlock, exitOnError=False)
 
     def getTableRows(self, contract, scope, table):
@@ -946,6 +1064,181 @@ class Node(object):
         keys=list(row.keys())
         return keys
 
+    @staticmethod
+    def parseTransactionOpts(opts):
+        """Returns (authorization, forceUnique) for the -p/--permission and -f/--force-unique options of a cleos
+        push action opts string. Used when building transactions without cleos, other options are not supported."""
+        authorization=[]
+        forceUnique=False
+        args=opts.split() if opts is not None else []
+        i=0
+        while i < len(args):
+            arg=args[i]
+            if arg in ("-p", "--permission"):
+                assert i+1 < len(args), print("ERROR: %s requires an argument. opts: %s" % (arg, opts))
+                actor,_,permission=args[i+1].partition("@")
+                authorization.append({"actor": actor, "permission": permission if permission else "active"})
+                i+=1
+            elif arg in ("-f", "--force-unique"):
+                forceUnique=True
+            else:
+                assert False, print("ERROR: unsupported option \"%s\". opts: %s" % (arg, opts))
+            i+=1
+        return (authorization, forceUnique)
+
+    @staticmethod
+    def makeAction(account, name, data, authorization):
+        """Action object for push_transaction. data is the hex serialized action data (see abi_json_to_bin)."""
+        return {"account": account, "name": name, "authorization": authorization, "data": data}
+
+    @staticmethod
+    def makeNonceAction():
+        """Context free action making a transaction unique, as added by cleos --force-unique."""
+        # current time in microseconds like cleos, but strictly increasing so transactions built back to back differ
+        Node.__lastNonce=max(int(time.time()*1e6), Node.__lastNonce+1)
+        return Node.makeAction("eosio.null", "nonce", struct.pack("<q", Node.__lastNonce).hex(), [])
+
+    @staticmethod
+    def makeTransferAction(source, destination, amountStr, memo="memo", contract="eosio.token"):
+        """transfer action for pushTransactions, what cleos transfer sends."""
+        data={"from": source.name, "to": destination.name, "quantity": amountStr, "memo": memo}
+        return Node.makeAction(contract, "transfer", data, [{"actor": source.name, "permission": "active"}])
+
+    @staticmethod
+    def makeNewAccountAction(account, creatorAccount):
+        """newaccount action for pushTransactions, what cleos create account sends (single key owner and active)."""
+        def authority(publicKey):
+            return {"threshold": 1, "keys": [{"key": publicKey, "weight": 1}], "accounts": [], "waits": []}
+        data={"creator": creatorAccount.name, "name": account.name,
+              "owner": authority(account.ownerPublicKey), "active": authority(account.activePublicKey)}
+        return Node.makeAction("eosio", "newaccount", data, [{"actor": creatorAccount.name, "permission": "active"}])
+
+    @staticmethod
+    def makeBuyRamAction(payer, receiver, quantity):
+        """buyram action for pushTransactions. quantity is an amount of CORE_SYMBOL, like cleos --buy-ram takes it."""
+        data={"payer": payer.name, "receiver": receiver.name, "quant": "%.04f %s" % (quantity, CORE_SYMBOL)}
+        return Node.makeAction("eosio", "buyram", data, [{"actor": payer.name, "permission": "active"}])
+
+    @staticmethod
+    def makeDelegatebwAction(fromAccount, receiver, netQuantity, cpuQuantity, transfer=False):
+        """delegatebw action for pushTransactions, quantities are amounts of CORE_SYMBOL."""
+        data={"from": fromAccount.name, "receiver": receiver.name, "stake_net_quantity": "%.04f %s" % (netQuantity, CORE_SYMBOL),
+              "stake_cpu_quantity": "%.04f %s" % (cpuQuantity, CORE_SYMBOL), "transfer": transfer}
+        return Node.makeAction("eosio", "delegatebw", data, [{"actor": fromAccount.name, "permission": "active"}])
+
+    # pylint: disable=too-many-arguments
+    @staticmethod
+    def makeCreateAccountActions(account, creatorAccount, stakedDeposit=1000, stakeNet=100, stakeCPU=100, buyRAM=10000):
+        """The actions createInitializeAccount has cleos send: newaccount, buyram and delegatebw (system newaccount),
+        then the stakedDeposit transfer to the new account, if any."""
+        actions=[Node.makeNewAccountAction(account, creatorAccount), Node.makeBuyRamAction(creatorAccount, account, buyRAM),
+                 Node.makeDelegatebwAction(creatorAccount, account, stakeNet, stakeCPU)]
+        if stakedDeposit > 0:
+            actions.append(Node.makeTransferAction(creatorAccount, account, Node.currencyIntToStr(stakedDeposit, CORE_SYMBOL), "init"))
+        return actions
+
+    @staticmethod
+    def makeTransaction(actions, info, contextFreeActions=None, expiration=None):
+        """Unsigned transaction for actions with expiration and TaPoS taken from a get info result, the way cleos sets
+        them (head block time + expiration seconds, referencing the last irreversible block)."""
+        if expiration is None:
+            expiration=Node.TransExpiration
+        return TransactionBuilder.makeTransaction(actions, info, contextFreeActions, expiration)
+
+    def serializeActions(self, actions):
+        """Returns actions with any json (str or object) action data replaced by its hex abi serialization."""
+        serialized=[]
+        for action in actions:
+            if not TransactionBuilder.isHexData(action["data"]):
+                data=json.loads(action["data"]) if isinstance(action["data"], str) else action["data"]
+                params={"code": action["account"], "action": action["name"], "args": data}
+                action=dict(action, data=self.rpc.chain("abi_json_to_bin", params)["binargs"])
+            serialized.append(action)
+        return serialized
+
+    def signTransaction(self, trx, chainId, requiredKeysCache=None):
+        """Returns the signatures keosd (walletMgr) makes for trx. requiredKeysCache, if given, maps the set of
+        authorizations in a transaction to its required keys so they are only looked up once per set."""
+        assert self.walletMgr is not None, print("ERROR: %s has no wallet manager to sign transactions with" % (self))
+        wallet=self.walletMgr.rpc()
+        auths=tuple(sorted(set((auth["actor"], auth["permission"]) for action in trx["actions"] for auth in action["authorization"])))
+        requiredKeys=requiredKeysCache.get(auths) if requiredKeysCache is not None else None
+        if requiredKeys is None:
+            availableKeys=wallet.wallet("get_public_keys")
+            requiredKeys=self.rpc.chain("get_required_keys", {"transaction": trx, "available_keys": availableKeys})["required_keys"]
+            if requiredKeysCache is not None:
+                requiredKeysCache[auths]=requiredKeys
+        return wallet.wallet("sign_transaction", [trx, requiredKeys, chainId])["signatures"]
+
+    def transactionBuilder(self):
+        """TransactionBuilder for this node, created on first use. Keeps the abis of the contracts it has serialized
+        actions for."""
+        if self.__transactionBuilder is None:
+            self.__transactionBuilder=TransactionBuilder(self.rpc)
+        return self.__transactionBuilder
+
+    # pylint: disable=too-many-arguments
+    def __pushTransactionParams(self, item, info, forceUnique, requiredKeysCache, signers):
+        if isinstance(item, dict) and "signatures" in item:
+            return item
+        contextFreeActions=[Node.makeNonceAction()] if forceUnique else None
+        if signers is not None:
+            actions=item if isinstance(item, list) else [item]
+            builder=self.transactionBuilder()
+            _,params=builder.build(actions, TransactionBuilder.keysFor(actions, signers), contextFreeActions, Node.TransExpiration)
+            return params
+        actions=self.serializeActions(item if isinstance(item, list) else [item])
+        trx=Node.makeTransaction(actions, info, contextFreeActions=contextFreeActions)
+        signatures=self.signTransaction(trx, info["chain_id"], requiredKeysCache)
+        return {"signatures": signatures, "compression": "none", "packed_context_free_data": "", "transaction": trx}
+
+    # pylint: disable=too-many-arguments
+    def pushTransactions(self, transactions, batchSize=100, forceUnique=False, silentErrors=False, exitOnError=False, signers=None):
+        """Push many transactions with push_transactions, batchSize per request. Each item is an action (see makeAction,
+        data as hex or json), a list of actions making up one transaction, or an already signed transaction (the
+        push_transaction parameters). Unsigned ones are built, with TaPoS from one get info per batch, and signed
+        through keosd. With signers (a dict of account name to Account) they are instead serialized and signed in
+        process by transactionBuilder(), using the Accounts' private keys. Returns a (success, trans or error message)
+        tuple per item, in order."""
+        assert(isinstance(transactions, list))
+        assert(0 < batchSize <= Node.MaxPushTransactionsBatch)
+        results=[]
+        requiredKeysCache={}
+        for first in range(0, len(transactions), batchSize):
+            batch=transactions[first:first+batchSize]
+            start=time.perf_counter()
+            try:
+                info=self.rpc.chain("get_info") if signers is None else None
+                params=[self.__pushTransactionParams(item, info, forceUnique, requiredKeysCache, signers) for item in batch]
+                pushed=self.rpc.chain("push_transactions", params)
+                if Utils.Debug:
+                    end=time.perf_counter()
+                    Utils.Print("push transactions batch of %d Duration: %.3f sec" % (len(batch), end-start))
+            except RpcError as ex:
+                errorMsg="Exception during push transactions.  rpc Duration=%.3f sec.  %s" % (time.perf_counter()-start, ex.output)
+                if exitOnError:
+                    Utils.cmdError(errorMsg)
+                    Utils.errorExit("Failed to push transactions %d-%d" % (first, first+len(batch)-1))
+                if not silentErrors:
+                    Utils.Print("ERROR: %s" % (errorMsg))
+                results+=[(False, ex.output)] * len(batch)
+                continue
+
+            for trans in pushed:
+                error=trans.get("processed", {}).get("error")
+                if error is None:
+                    self.trackCmdTransaction(trans)
+                    results.append((True, trans))
+                    continue
+                if exitOnError:
+                    Utils.cmdError("transaction %d of push transactions failed. %s" % (len(results), error))
+                    Utils.errorExit("Failed to push transaction %d" % (len(results)))
+                if not silentErrors:
+                    Utils.Print("ERROR: transaction %d of push transactions failed. %s" % (len(results), error))
+                results.append((False, error))
+
+        return results
+
     # returns tuple with transaction and
     def pushMessage(self, account, action, data, opts, silentErrors=False):
         cmd="%s %s push action -j %s %s" % (Utils.EosClientPath, self.eosClientArgs(), account, action)
@@ -1052,6 +1345,50 @@ class Node(object):
 
         return trans
 
+    def processRpcCmd(self, path, params, cmdDesc, silentErrors=True, exitOnError=False, exitMsg=None):
+        """HTTP RPC counterpart of processCleosCmd. Returns the decoded json response, or None on error."""
+        exitMsg=Node.startRpcCmd(self.endpointHttp, path, params, exitMsg)
+        start=time.perf_counter()
+        try:
+            trans=self.rpc.call(path, params)
+        except RpcError as ex:
+            Node.reportRpcCmdError(ex, cmdDesc, time.perf_counter()-start, silentErrors, exitOnError, exitMsg)
+            return None
+        return Node.checkRpcCmdResult(trans, cmdDesc, time.perf_counter()-start, exitOnError, exitMsg)
+
+    # The processRpcCmd steps around the call itself, shared with AsyncNode.processRpcCmd.
+    @staticmethod
+    def startRpcCmd(endpointHttp, path, params, exitMsg):
+        """Logs the call and returns exitMsg as it is reported."""
+        if Utils.Debug: Utils.Print("rpc: %s%s %s" % (endpointHttp, path, "" if params is None else json.dumps(params)))
+        return "Context: " + exitMsg if exitMsg is not None else ""
+
+    # pylint: disable=too-many-arguments
+    @staticmethod
+    def reportRpcCmdError(ex, cmdDesc, duration, silentErrors, exitOnError, exitMsg):
+        if not silentErrors:
+            errorMsg="Exception during \"%s\". Exception message: %s.  rpc Duration=%.3f sec. %s" % (cmdDesc, ex.output, duration, exitMsg)
+            if exitOnError:
+                Utils.cmdError(errorMsg)
+                Utils.errorExit(errorMsg)
+            else:
+                Utils.Print("ERROR: %s" % (errorMsg))
+
+    @staticmethod
+    def checkRpcCmdResult(ret, cmdDesc, duration, exitOnError, exitMsg):
+        if Utils.Debug: Utils.Print("rpc Duration: %.3f sec" % (duration))
+        if exitOnError and ret is None:
+            Utils.cmdError("could not \"%s\". %s" % (cmdDesc,exitMsg))
+            Utils.errorExit("Failed to \"%s\"" % (cmdDesc))
+        return ret
+
+    # pylint: disable=too-many-arguments
+    def processQueryCmd(self, cmd, path, params, cmdDesc, silentErrors=True, exitOnError=False, exitMsg=None):
+        """Run a read-only query over HTTP RPC (path, params), or as the cleos command cmd when Utils.UseCleos is set."""
+        if Utils.UseCleos:
+            return self.processCleosCmd(cmd, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=exitMsg)
+        return self.processRpcCmd(path, params, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError, exitMsg=exitMsg)
+
     def killNodeOnProducer(self, producer, whereInSequence, blockType=BlockType.head, silentErrors=True, exitOnError=False, exitMsg=None, returnType=ReturnType.json):
         assert(isinstance(producer, str))
         assert(isinstance(whereInSequence, int))
@@ -1101,7 +1438,7 @@ class Node(object):
             return trans
 
         transId=Node.getTransId(trans)
-        if not self.waitForTransInBlock(transId):
+        if not self.transactionTracker.waitForTransactions([transId], TransactionTracker.Included, TransactionTracker.WaitTimeout):
             if exitOnError:
                 Utils.cmdError("transaction with id %s never made it to a block" % (transId))
                 Utils.errorExit("Failed to find transaction with id %s in a block before timeout" % (transId))
@@ -1110,29 +1447,55 @@ class Node(object):
 
     def getInfo(self, silentErrors=False, exitOnError=False):
         cmdDesc = "get info"
-        info=self.processCleosCmd(cmdDesc, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError)
+        info=self.processQueryCmd(cmdDesc, RpcClient.ChainApi + "get_info", None, cmdDesc, silentErrors=silentErrors, exitOnError=exitOnError)
         if info is None:
             self.infoValid=False
         else:
             self.infoValid=True
             self.lastRetrievedHeadBlockNum=int(info["head_block_num"])
             self.lastRetrievedLIB=int(info["last_irreversible_block_num"])
+            self.lastRetrievedHeadBlockTime=(time.time(), TransactionTracker.parseBlockTime(info["head_block_time"]))
+            self.blockSamples.append((self.lastRetrievedHeadBlockTime[0], self.lastRetrievedHeadBlockNum, self.lastRetrievedLIB))
         return info
 
+    def estimateBlockWait(self, blockNum, blockType=BlockType.head):
+        """Estimate seconds until the node's head (or lib) reaches blockNum, from the block rate observed by getInfo.
+        Returns None when there is nothing to base an estimate on."""
+        return Node.estimateBlockWaitFromSamples(self.blockSamples, blockNum, blockType)
+
+    @staticmethod
+    def estimateBlockWaitFromSamples(blockSamples, blockNum, blockType=BlockType.head):
+        """estimateBlockWait for a sequence of (time, head block num, lib) samples, oldest first."""
+        assert isinstance(blockType, BlockType)
+        if len(blockSamples) == 0:
+            return None
+        idx=1 if blockType==BlockType.head else 2
+        firstTime,lastTime=blockSamples[0][0],blockSamples[-1][0]
+        firstNum,lastNum=blockSamples[0][idx],blockSamples[-1][idx]
+        if lastNum >= blockNum:
+            return None
+        if lastNum > firstNum:
+            interval=(lastTime-firstTime)/(lastNum-firstNum)
+        elif blockType==BlockType.head:
+            interval=Utils.BlockInterval
+        else:
+            # lib advances in jumps, without movement there is no basis for an estimate
+            return None
+        return lastTime + (blockNum-lastNum)*interval - time.time()
+
     def getBlockFromDb(self, idx):
-        cmd="%s %s" % (Utils.MongoPath, self.mongoEndpointArgs)
-        subcommand="db.blocks.find().sort({\"_id\":%d}).limit(1).pretty()" % (idx)
-        if Utils.Debug: Utils.Print("cmd: echo \"%s\" | %s" % (subcommand, cmd))
+        subcommand="db.blocks.find().sort({\"_id\":%d}).limit(1)" % (idx)
+        if Utils.Debug: Utils.Print("mongo: %s" % (subcommand))
         start=time.perf_counter()
         try:
-            trans=Node.runMongoCmdReturnJson(cmd.split(), subcommand)
+            blocks=self.mongoSession().query(subcommand)
             if Utils.Debug:
                 end=time.perf_counter()
                 Utils.Print("cmd Duration: %.3f sec" % (end-start))
-            return trans
-        except subprocess.CalledProcessError as ex:
+            return blocks[0] if blocks else None
+        except MongoError as ex:
             end=time.perf_counter()
-            msg=ex.output.decode("utf-8")
+            msg=ex.output
             Utils.Print("ERROR: Exception during get db block.  cmd Duration: %.3f sec.  %s" % (end-start, msg))
             return None
 
@@ -1284,7 +1647,8 @@ class Node(object):
                 if skip:
                     skip=False
                     continue
-                if "--genesis-json" == i or "--genesis-timestamp" == i:
+                # the existing chain state is kept, a snapshot can only initialize an empty one
+                if "--genesis-json" == i or "--genesis-timestamp" == i or "--snapshot" == i:
                     skip=True
                     continue
 
@@ -1334,6 +1698,13 @@ class Node(object):
 
         self.cmd=cmd
         self.killed=False
+        if self.stateHistory is not None:
+            self.stateHistory.close()
+        self.stateHistory=self.__stateHistoryClient()
+        # the relaunched node may have replayed or resynced its chain
+        self.blockCache.clear()
+        if self.__transactionBuilder is not None:
+            self.__transactionBuilder.clear()
         return True
 
     def trackCmdTransaction(self, trans, ignoreNonTrans=False):
@@ -1346,15 +1717,12 @@ class Node(object):
             return
 
         transId=Node.getTransId(trans)
+        blockNum=Node.getTransBlockHint(trans)
         if Utils.Debug:
             status=Node.getTransStatus(trans)
-            blockNum=Node.getTransBlockNum(trans)
-            if transId in self.transCache.keys():
-                replaceMsg="replacing previous trans=\n%s" % json.dumps(self.transCache[transId], indent=2, sort_keys=True)
-            else:
-                replaceMsg=""
-            Utils.Print("  cmd returned transaction id: %s, status: %s, (possible) block num: %s %s" % (transId, status, blockNum, replaceMsg))
-        self.transCache[transId]=trans
+            replaceMsg=" (already tracked)" if self.transactionTracker.get(transId) is not None else ""
+            Utils.Print("  cmd returned transaction id: %s, status: %s, (possible) block num: %s%s" % (transId, status, blockNum, replaceMsg))
+        self.transactionTracker.track(transId, hintBlockNum=blockNum)
 
     def reportStatus(self):
         Utils.Print("Node State:")
@@ -1367,3 +1735,4 @@ class Node(object):
         status="last getInfo returned None" if not self.infoValid else "at last call to getInfo"
         Utils.Print(" hbn   : %s (%s)" % (self.lastRetrievedHeadBlockNum, status))
         Utils.Print(" lib   : %s (%s)" % (self.lastRetrievedLIB, status))
+        Utils.Print(" blocks: %s" % (self.blockCache))
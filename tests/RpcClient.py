@@ -0,0 +1,250 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from collections import deque
+
+from testUtils import Utils
+
+###########################################################################################
+class RpcError(Exception):
+    """Raised when an RPC call fails. code is the HTTP status (None for transport failures), output is the raw response body."""
+
+    def __init__(self, path, code, output):
+        self.path=path
+        self.code=code
+        self.output=output
+        super().__init__("%s returned %s: %s" % (path, code, output))
+
+    def errorObj(self):
+        """Returns the decoded nodeos/keosd error object ({"code":..., "message":..., "error":{...}}) or None."""
+        try:
+            return json.loads(self.output)
+        except (TypeError, ValueError) as _:
+            return None
+
+###########################################################################################
+class RpcClient(object):
+    """HTTP/1.1 client for the nodeos and keosd JSON APIs (/v1/chain/*, /v1/history/*, /v1/wallet/*, ...).
+    Keeps a pool of keep-alive connections to one endpoint. Safe to share between threads."""
+
+    ChainApi="/v1/chain/"
+    HistoryApi="/v1/history/"
+    WalletApi="/v1/wallet/"
+    ProducerApi="/v1/producer/"
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, host, port, maxConnections=8, timeout=None):
+        self.host=host
+        self.port=port
+        self.timeout=timeout if timeout is not None else Utils.rpcTimeout
+        self.maxConnections=maxConnections
+        self.__idle=deque()
+        self.__lock=threading.Lock()
+        self.__slots=threading.BoundedSemaphore(maxConnections)
+        self.callCount=0
+        self.callDuration=0.0
+
+    def __str__(self):
+        return "http://%s:%d" % (self.host, self.port)
+
+    def __acquire(self, fresh=False):
+        self.__slots.acquire()
+        with self.__lock:
+            if self.__idle and not fresh:
+                return self.__idle.pop()
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def __release(self, conn, reuse):
+        if reuse:
+            with self.__lock:
+                self.__idle.append(conn)
+        else:
+            conn.close()
+        self.__slots.release()
+
+    @staticmethod
+    def encodeBody(params):
+        if params is None:
+            return b"{}"
+        if isinstance(params, (bytes, bytearray)):
+            return bytes(params)
+        if isinstance(params, str):
+            return params.encode("utf-8")
+        return json.dumps(params).encode("utf-8")
+
+    @staticmethod
+    def decodeResponse(path, status, data):
+        """Shared by the sync and async clients. Returns the decoded json object or raises RpcError."""
+        text=data.decode("utf-8")
+        if status < 200 or status >= 300:
+            raise RpcError(path, status, text)
+        if not text:
+            return None
+        try:
+            return json.loads(text)
+        except json.decoder.JSONDecodeError as _:
+            raise RpcError(path, status, text)
+
+    def call(self, path, params=None, timeout=None):
+        """POST params (json-able object, str or bytes) to path and return the decoded json response."""
+        body=RpcClient.encodeBody(params)
+        headers={"Content-Type": "application/json", "Connection": "keep-alive"}
+        start=time.perf_counter()
+        # A pooled connection may have been closed by the server since its last use, so retry once on a fresh one.
+        for attempt in range(2):
+            conn=self.__acquire(fresh=attempt > 0)
+            if timeout is not None:
+                conn.timeout=timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+            reuse=False
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp=conn.getresponse()
+                data=resp.read()
+                reuse=not resp.will_close
+                with self.__lock:
+                    self.callCount+=1
+                    self.callDuration+=time.perf_counter()-start
+                return RpcClient.decodeResponse(path, resp.status, data)
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError, ConnectionResetError) as ex:
+                if attempt == 0:
+                    continue
+                raise RpcError(path, None, str(ex))
+            except (OSError, http.client.HTTPException) as ex:
+                raise RpcError(path, None, str(ex))
+            finally:
+                if timeout is not None and reuse:
+                    conn.timeout=self.timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(self.timeout)
+                self.__release(conn, reuse)
+
+    def chain(self, call, params=None, timeout=None):
+        return self.call(RpcClient.ChainApi + call, params, timeout=timeout)
+
+    def history(self, call, params=None, timeout=None):
+        return self.call(RpcClient.HistoryApi + call, params, timeout=timeout)
+
+    def wallet(self, call, params=None, timeout=None):
+        return self.call(RpcClient.WalletApi + call, params, timeout=timeout)
+
+    def producer(self, call, params=None, timeout=None):
+        return self.call(RpcClient.ProducerApi + call, params, timeout=timeout)
+
+    def close(self):
+        with self.__lock:
+            while self.__idle:
+                self.__idle.pop().close()
+
+###########################################################################################
+class AsyncRpcClient(object):
+    """asyncio counterpart of RpcClient. Keeps a pool of keep-alive connections to one endpoint, at most maxConnections
+    requests are in flight at a time and further calls wait for a free connection. Use from a single event loop."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, host, port, maxConnections=64, timeout=None):
+        self.host=host
+        self.port=port
+        self.timeout=timeout if timeout is not None else Utils.rpcTimeout
+        self.maxConnections=maxConnections
+        self.__idle=deque()       # (reader, writer)
+        self.__slots=None         # created on first use, inside the running loop
+        self.callCount=0
+        self.callDuration=0.0
+
+    def __str__(self):
+        return "http://%s:%d" % (self.host, self.port)
+
+    @staticmethod
+    async def readResponse(reader):
+        """Reads one HTTP/1.1 response. Returns (status, willClose, body)."""
+        statusLine=await reader.readline()
+        if not statusLine:
+            raise ConnectionResetError("connection closed by server")
+        version,status=statusLine.decode("latin-1").split(None, 2)[0:2]
+        headers={}
+        while True:
+            line=await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key,_,value=line.decode("latin-1").partition(":")
+            headers[key.strip().lower()]=value.strip()
+
+        willClose=version == "HTTP/1.0" or headers.get("connection", "").lower() == "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks=[]
+            while True:
+                size=int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body=b"".join(chunks)
+        elif "content-length" in headers:
+            body=await reader.readexactly(int(headers["content-length"]))
+        else:
+            body=await reader.read()
+            willClose=True
+        return (int(status), willClose, body)
+
+    async def call(self, path, params=None, timeout=None):
+        """POST params (json-able object, str or bytes) to path and return the decoded json response."""
+        if timeout is None:
+            timeout=self.timeout
+        if self.__slots is None:
+            self.__slots=asyncio.Semaphore(self.maxConnections)
+        body=RpcClient.encodeBody(params)
+        request=("POST %s HTTP/1.1\r\nHost: %s:%d\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+                 "Connection: keep-alive\r\n\r\n" % (path, self.host, self.port, len(body))).encode("latin-1") + body
+        async with self.__slots:
+            start=time.perf_counter()
+            # A pooled connection may have been closed by the server since its last use, so retry once on a fresh one.
+            for attempt in range(2):
+                conn=self.__idle.pop() if attempt == 0 and self.__idle else None
+                reuse=False
+                try:
+                    if conn is None:
+                        conn=await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+                    reader,writer=conn
+                    writer.write(request)
+                    await writer.drain()
+                    status,willClose,data=await asyncio.wait_for(AsyncRpcClient.readResponse(reader), timeout)
+                    reuse=not willClose
+                    self.callCount+=1
+                    self.callDuration+=time.perf_counter()-start
+                    return RpcClient.decodeResponse(path, status, data)
+                except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError) as ex:
+                    if attempt == 0:
+                        continue
+                    raise RpcError(path, None, str(ex))
+                except asyncio.TimeoutError as _:
+                    raise RpcError(path, None, "timed out after %s seconds" % (timeout))
+                except (OSError, ValueError) as ex:
+                    raise RpcError(path, None, str(ex))
+                finally:
+                    if conn is not None:
+                        if reuse:
+                            self.__idle.append(conn)
+                        else:
+                            conn[1].close()
+
+    async def chain(self, call, params=None, timeout=None):
+        return await self.call(RpcClient.ChainApi + call, params, timeout=timeout)
+
+    async def history(self, call, params=None, timeout=None):
+        return await self.call(RpcClient.HistoryApi + call, params, timeout=timeout)
+
+    async def wallet(self, call, params=None, timeout=None):
+        return await self.call(RpcClient.WalletApi + call, params, timeout=timeout)
+
+    async def producer(self, call, params=None, timeout=None):
+        return await self.call(RpcClient.ProducerApi + call, params, timeout=timeout)
+
+    def close(self):
+        while self.__idle:
+            self.__idle.pop()[1].close()
@@ -0,0 +1,141 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+
+from testUtils import Utils
+
+###########################################################################################
+class SnapshotCache(object):
+    """On-disk cache of bootstrapped chains, so a cluster can be started from a chain snapshot instead of being bootstrapped
+    from genesis. An entry holds the snapshot taken right after bootstrap, the node config dirs the launcher generated
+    (they carry the randomly generated producer keys the snapshot's schedule refers to) and the keys bootstrap imported
+    into the wallet. Entries are keyed by the launcher arguments, the bootstrap mode, the system contract wasm/abi files
+    and the nodeos version; storing an entry removes the entries for the same layout it supersedes."""
+
+    # bump when the entry layout changes
+    FormatVersion=1
+    # contracts loaded by Cluster.bootstrap and bios_boot.sh
+    Contracts=["eosio.bios", "eosio.token", "eosio.system", "eosio.msig", "eosio.sudo"]
+    SnapshotFile="snapshot.bin"
+    MetaFile="meta.json"
+    WalletKeysFile="wallet_keys.json"
+    ConfigDir="config"
+
+    __nodeosVersion=None
+
+    def __init__(self, cacheDir, contractsDir="contracts"):
+        self.cacheDir=cacheDir
+        self.contractsDir=contractsDir
+
+    @staticmethod
+    def nodeosVersion():
+        if SnapshotCache.__nodeosVersion is None:
+            try:
+                SnapshotCache.__nodeosVersion=Utils.checkOutput([Utils.EosServerPath, "--version"]).strip()
+            except (OSError, subprocess.CalledProcessError) as ex:
+                Utils.Print("WARNING: could not get %s version: %s" % (Utils.EosServerName, ex))
+                SnapshotCache.__nodeosVersion="unknown"
+        return SnapshotCache.__nodeosVersion
+
+    @staticmethod
+    def layoutKey(launcherArgs, bootstrapMode):
+        """Hash of what determines the cluster layout and the bootstrap steps. launcherArgs must not contain anything
+        that changes from run to run, like the genesis timestamp."""
+        layout=json.dumps({"launcher": launcherArgs, "bootstrap": bootstrapMode}, sort_keys=True)
+        return hashlib.sha256(layout.encode("utf-8")).hexdigest()
+
+    def contractFiles(self):
+        files=[]
+        for contract in SnapshotCache.Contracts:
+            for ext in ["wasm", "abi"]:
+                path=os.path.join(self.contractsDir, contract, "%s.%s" % (contract, ext))
+                if os.path.exists(path):
+                    files.append(path)
+        return files
+
+    def makeKey(self, launcherArgs, bootstrapMode):
+        """Cache key for a bootstrapped chain. Returns (key, layout key)."""
+        layout=SnapshotCache.layoutKey(launcherArgs, bootstrapMode)
+        digest=hashlib.sha256()
+        digest.update(("%d\n%s\n%s\n" % (SnapshotCache.FormatVersion, layout, SnapshotCache.nodeosVersion())).encode("utf-8"))
+        for path in self.contractFiles():
+            digest.update(path.encode("utf-8"))
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024*1024), b""):
+                    digest.update(chunk)
+        return (digest.hexdigest(), layout)
+
+    def entryDir(self, key):
+        return os.path.join(self.cacheDir, key)
+
+    def snapshotPath(self, key):
+        return os.path.abspath(os.path.join(self.entryDir(key), SnapshotCache.SnapshotFile))
+
+    def lookup(self, key):
+        """Meta data of the entry for key, None if there is no complete entry."""
+        entry=self.entryDir(key)
+        try:
+            with open(os.path.join(entry, SnapshotCache.MetaFile), "r") as f:
+                meta=json.load(f)
+        except (OSError, ValueError) as _:
+            return None
+        if not os.path.isfile(os.path.join(entry, SnapshotCache.SnapshotFile)) or not os.path.isdir(os.path.join(entry, SnapshotCache.ConfigDir)):
+            return None
+        return meta
+
+    def walletKeys(self, key):
+        """[(name, private key, public key)] bootstrap imported into the wallet."""
+        with open(os.path.join(self.entryDir(key), SnapshotCache.WalletKeysFile), "r") as f:
+            return [tuple(k) for k in json.load(f)]
+
+    def restoreConfig(self, key, configDir):
+        """Replace the node config dirs in configDir with the ones of the entry."""
+        for path in glob.glob(os.path.join(configDir, "node_*")):
+            shutil.rmtree(path)
+        source=os.path.join(self.entryDir(key), SnapshotCache.ConfigDir)
+        for name in os.listdir(source):
+            shutil.copytree(os.path.join(source, name), os.path.join(configDir, name))
+
+    # pylint: disable=too-many-arguments
+    def store(self, key, layout, snapshotFile, configDir, walletKeys, headBlockNum):
+        """Add the entry for key. Written to a temporary dir and renamed into place, so concurrent runs never see a partial
+        entry. Entries of the same layout with other keys (older contracts or nodeos) are removed."""
+        os.makedirs(self.cacheDir, exist_ok=True)
+        entry=self.entryDir(key)
+        if os.path.isdir(entry):
+            return True
+        tmpEntry="%s.tmp.%d" % (entry, os.getpid())
+        try:
+            os.makedirs(tmpEntry)
+            shutil.copyfile(snapshotFile, os.path.join(tmpEntry, SnapshotCache.SnapshotFile))
+            for path in glob.glob(os.path.join(configDir, "node_*")):
+                shutil.copytree(path, os.path.join(tmpEntry, SnapshotCache.ConfigDir, os.path.basename(path)))
+            with open(os.path.join(tmpEntry, SnapshotCache.WalletKeysFile), "w") as f:
+                json.dump([list(k) for k in walletKeys], f)
+            meta={"key": key, "layout": layout, "head_block_num": headBlockNum, "nodeos_version": SnapshotCache.nodeosVersion(),
+                  "created": time.time()}
+            with open(os.path.join(tmpEntry, SnapshotCache.MetaFile), "w") as f:
+                json.dump(meta, f, indent=1)
+            os.rename(tmpEntry, entry)
+        except OSError as ex:
+            Utils.Print("ERROR: Failed to store snapshot cache entry %s: %s" % (entry, ex))
+            shutil.rmtree(tmpEntry, ignore_errors=True)
+            return os.path.isdir(entry)
+
+        for path in glob.glob(os.path.join(self.cacheDir, "*", SnapshotCache.MetaFile)):
+            otherEntry=os.path.dirname(path)
+            if otherEntry == entry:
+                continue
+            try:
+                with open(path, "r") as f:
+                    other=json.load(f)
+            except (OSError, ValueError) as _:
+                continue
+            if other.get("layout") == layout:
+                if Utils.Debug: Utils.Print("Removing superseded snapshot cache entry %s" % (otherEntry))
+                shutil.rmtree(otherEntry, ignore_errors=True)
+        return True
@@ -0,0 +1,385 @@
+import base64
+import hashlib
+import json
+import os
+import select
+import socket
+import struct
+import zlib
+
+from testUtils import Utils
+from BlockLog import BinaryReader
+from BlockLog import BlockLog
+from TransactionBuilder import AbiSerializer
+
+###########################################################################################
+class WebSocketError(Exception):
+    """Raised when the websocket handshake fails or the server closes the connection."""
+
+###########################################################################################
+class WebSocket(object):
+    """Minimal RFC 6455 websocket client, enough for the state history plugin: one connection, whole messages,
+    masked client frames, pings answered. Not safe to share between threads."""
+
+    Guid="258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    OpContinuation=0x0
+    OpText=0x1
+    OpBinary=0x2
+    OpClose=0x8
+    OpPing=0x9
+    OpPong=0xa
+    __u16=struct.Struct("!H")
+    __u64=struct.Struct("!Q")
+
+    def __init__(self, host, port, path="/", timeout=None):
+        self.host=host
+        self.port=port
+        self.timeout=timeout if timeout is not None else Utils.rpcTimeout
+        self.__buffer=bytearray()
+        self.__sock=socket.create_connection((host, port), timeout=self.timeout)
+        self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            self.__handshake(path)
+        except:
+            self.close()
+            raise
+
+    def __str__(self):
+        return "ws://%s:%d" % (self.host, self.port)
+
+    def __handshake(self, path):
+        key=base64.b64encode(os.urandom(16)).decode("ascii")
+        request=("GET %s HTTP/1.1\r\nHost: %s:%d\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 "Sec-WebSocket-Key: %s\r\nSec-WebSocket-Version: 13\r\n\r\n") % (path, self.host, self.port, key)
+        self.__sock.sendall(request.encode("ascii"))
+        while b"\r\n\r\n" not in self.__buffer:
+            self.__receive()
+        end=self.__buffer.index(b"\r\n\r\n")
+        lines=bytes(self.__buffer[:end]).decode("latin-1").split("\r\n")
+        del self.__buffer[:end+4]
+        if len(lines[0].split()) < 2 or lines[0].split()[1] != "101":
+            raise WebSocketError("%s refused the websocket upgrade: %s" % (self, lines[0]))
+        headers={name.strip().lower(): value.strip() for name,_,value in (line.partition(":") for line in lines[1:])}
+        accept=base64.b64encode(hashlib.sha1((key + WebSocket.Guid).encode("ascii")).digest()).decode("ascii")
+        if headers.get("sec-websocket-accept") != accept:
+            raise WebSocketError("%s answered the websocket upgrade with a wrong accept key" % (self))
+
+    def __receive(self):
+        data=self.__sock.recv(1 << 20)
+        if not data:
+            raise WebSocketError("%s closed the connection" % (self))
+        self.__buffer.extend(data)
+
+    def __read(self, size):
+        while len(self.__buffer) < size:
+            self.__receive()
+        data=bytes(self.__buffer[:size])
+        del self.__buffer[:size]
+        return data
+
+    def send(self, data, opcode=OpBinary):
+        """Send one message (bytes, or str for a text message), masked like every client frame has to be."""
+        if isinstance(data, str):
+            data=data.encode("utf-8")
+            opcode=WebSocket.OpText
+        header=bytearray([0x80 | opcode])
+        if len(data) < 126:
+            header.append(0x80 | len(data))
+        elif len(data) < 1 << 16:
+            header.append(0x80 | 126)
+            header.extend(WebSocket.__u16.pack(len(data)))
+        else:
+            header.append(0x80 | 127)
+            header.extend(WebSocket.__u64.pack(len(data)))
+        mask=os.urandom(4)
+        # xor the whole payload as one integer instead of byte by byte
+        keyStream=(mask * (len(data)//4 + 1))[:len(data)]
+        masked=(int.from_bytes(data, "big") ^ int.from_bytes(keyStream, "big")).to_bytes(len(data), "big")
+        self.__sock.sendall(bytes(header) + mask + masked)
+
+    def readable(self, timeout=0):
+        """Whether data arrived within timeout seconds (None waits for it)."""
+        if self.__buffer:
+            return True
+        return bool(select.select([self.__sock], [], [], timeout)[0])
+
+    def recv(self, timeout=None):
+        """Next whole message (bytes for binary, str for text). None if nothing started arriving within timeout seconds
+        (None: wait up to the connection timeout); once a message started it is always read to its end."""
+        if timeout is not None and not self.readable(timeout):
+            return None
+        fragments=[]
+        messageOpcode=None
+        while True:
+            first,second=self.__read(2)
+            fin=first & 0x80
+            opcode=first & 0x0f
+            size=second & 0x7f
+            if size == 126:
+                size=WebSocket.__u16.unpack(self.__read(2))[0]
+            elif size == 127:
+                size=WebSocket.__u64.unpack(self.__read(8))[0]
+            mask=self.__read(4) if second & 0x80 else None
+            payload=self.__read(size)
+            if mask is not None:
+                keyStream=(mask * (size//4 + 1))[:size]
+                payload=(int.from_bytes(payload, "big") ^ int.from_bytes(keyStream, "big")).to_bytes(size, "big")
+
+            if opcode == WebSocket.OpPing:
+                self.send(payload, WebSocket.OpPong)
+                continue
+            if opcode == WebSocket.OpPong:
+                continue
+            if opcode == WebSocket.OpClose:
+                try:
+                    self.send(payload[:2], WebSocket.OpClose)
+                except OSError as _:
+                    pass
+                raise WebSocketError("%s closed the websocket: %s" % (self, payload[2:].decode("utf-8", "replace")))
+            if opcode != WebSocket.OpContinuation:
+                messageOpcode=opcode
+            fragments.append(payload)
+            if fin:
+                message=b"".join(fragments)
+                return message.decode("utf-8") if messageOpcode == WebSocket.OpText else message
+
+    def close(self):
+        if self.__sock is not None:
+            try:
+                self.__sock.close()
+            finally:
+                self.__sock=None
+
+###########################################################################################
+class AbiDeserializer(AbiSerializer):
+    """Binary deserialization to json values (as abi_bin_to_json returns them) for the types of one abi. With
+    bytesAsHex False bytes values are returned as is, for payloads that are decoded further."""
+
+    def __init__(self, abi, bytesAsHex=True):
+        super().__init__(abi)
+        self.readers={
+            "bool": lambda r: r.u8() != 0,
+            "int8": lambda r: struct.unpack("<b", r.raw(1))[0],
+            "uint8": lambda r: r.u8(),
+            "int16": lambda r: struct.unpack("<h", r.raw(2))[0],
+            "uint16": lambda r: r.u16(),
+            "int32": lambda r: struct.unpack("<i", r.raw(4))[0],
+            "uint32": lambda r: r.u32(),
+            "int64": lambda r: r.i64(),
+            "uint64": lambda r: r.u64(),
+            "int128": lambda r: int.from_bytes(r.raw(16), "little", signed=True),
+            "uint128": lambda r: int.from_bytes(r.raw(16), "little"),
+            "varint32": AbiDeserializer.readVarint32,
+            "varuint32": lambda r: r.varuint32(),
+            "float32": lambda r: struct.unpack("<f", r.raw(4))[0],
+            "float64": lambda r: struct.unpack("<d", r.raw(8))[0],
+            "float128": lambda r: "0x" + r.raw(16).hex(),
+            "time_point": lambda r: r.timePoint(),
+            "time_point_sec": lambda r: r.timePointSec(),
+            "block_timestamp_type": lambda r: r.blockTimestamp(),
+            "name": lambda r: r.name(),
+            "bytes": (lambda r: r.bytes().hex()) if bytesAsHex else (lambda r: r.bytes()),
+            "string": lambda r: r.bytes().decode("utf-8", "replace"),
+            "checksum160": lambda r: r.raw(20).hex(),
+            "checksum256": lambda r: r.checksum256(),
+            "checksum512": lambda r: r.raw(64).hex(),
+            "public_key": lambda r: r.publicKey(),
+            "signature": lambda r: r.signature(),
+            "symbol": AbiDeserializer.readSymbol,
+            "symbol_code": lambda r: AbiDeserializer.symbolCodeToStr(r.u64()),
+            "asset": AbiDeserializer.readAsset,
+            "extended_asset": lambda r: {"quantity": AbiDeserializer.readAsset(r), "contract": r.name()},
+        }
+
+    @staticmethod
+    def readVarint32(reader):
+        value=reader.varuint32()
+        return (value >> 1) ^ -(value & 1)
+
+    @staticmethod
+    def symbolCodeToStr(value):
+        return value.to_bytes(8, "little").rstrip(b"\x00").decode("ascii")
+
+    @staticmethod
+    def readSymbol(reader):
+        value=reader.u64()
+        return "%d,%s" % (value & 0xff, AbiDeserializer.symbolCodeToStr(value >> 8))
+
+    @staticmethod
+    def readAsset(reader):
+        amount=reader.i64()
+        symbol=reader.u64()
+        precision=symbol & 0xff
+        digits=str(abs(amount)).rjust(precision+1, "0")
+        number=digits[:len(digits)-precision] + ("." + digits[len(digits)-precision:] if precision else "")
+        return "%s%s %s" % ("-" if amount < 0 else "", number, AbiDeserializer.symbolCodeToStr(symbol >> 8))
+
+    def unpack(self, typeName, reader):
+        """Read one typeName value from reader (a BinaryReader). Variants are [type name, value] like in nodeos."""
+        if typeName.endswith("[]"):
+            itemType=typeName[:-2]
+            return [self.unpack(itemType, reader) for _ in range(reader.varuint32())]
+        if typeName.endswith("?"):
+            return self.unpack(typeName[:-1], reader) if reader.u8() else None
+        typeName=self.resolveType(typeName)
+        read=self.readers.get(typeName)
+        if read is not None:
+            return read(reader)
+        if typeName in self.structs:
+            return self.unpackStruct(typeName, reader)
+        if typeName in self.variants:
+            variantType=self.variants[typeName][reader.varuint32()]
+            return [variantType, self.unpack(variantType, reader)]
+        raise KeyError("unknown abi type %s" % (typeName))
+
+    def unpackStruct(self, structName, reader, value=None):
+        value={} if value is None else value
+        base,fields=self.structs[structName]
+        if base:
+            self.unpackStruct(self.resolveType(base), reader, value)
+        for fieldName, fieldType in fields:
+            if fieldType.endswith("$"):
+                # binary extension, absent when the data ends before it
+                if reader.pos >= len(reader.buf):
+                    break
+                fieldType=fieldType[:-1]
+            value[fieldName]=self.unpack(fieldType, reader)
+        return value
+
+    def deserialize(self, typeName, data):
+        reader=BinaryReader(data)
+        value=self.unpack(typeName, reader)
+        assert reader.pos == len(data), print("ERROR: %d bytes left after deserializing %s" % (len(data)-reader.pos, typeName))
+        return value
+
+###########################################################################################
+class StateHistoryClient(object):
+    """Client of the state history plugin's websocket endpoint (--plugin eosio::state_history_plugin,
+    --state-history-endpoint). The plugin sends its abi as the first message; requests and results are binary
+    request/result variants of it. blocks() streams a range of blocks, with their traces and table deltas as far
+    as the node keeps them, decoded with that abi."""
+
+    DefaultPort=8080
+    MaxBlockNum=0xffffffff
+
+    def __init__(self, host, port=DefaultPort, timeout=None):
+        self.host=host
+        self.port=port
+        self.timeout=timeout
+        self.__ws=None
+        self.abi=None
+        self.__rawAbi=None
+        self.__streaming=False
+
+    def __str__(self):
+        return "ws://%s:%d" % (self.host, self.port)
+
+    def connect(self):
+        if self.__ws is None:
+            self.__ws=WebSocket(self.host, self.port, timeout=self.timeout)
+            abi=json.loads(self.__ws.recv())
+            self.abi=AbiDeserializer(abi)
+            self.__rawAbi=AbiDeserializer(abi, bytesAsHex=False)
+            if Utils.Debug: Utils.Print("Connected to state history at %s" % (self))
+        return self
+
+    def close(self):
+        if self.__ws is not None:
+            self.__ws.close()
+            self.__ws=None
+        self.__streaming=False
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __request(self, requestType, value):
+        self.connect()
+        self.__ws.send(self.abi.serialize("request", [requestType, value]))
+
+    def __result(self, timeout=None):
+        data=self.__ws.recv(timeout)
+        return None if data is None else self.__rawAbi.deserialize("result", data)
+
+    def getStatus(self):
+        """get_status_result_v0: head, last_irreversible and the block ranges of the trace and chain state logs."""
+        assert not self.__streaming, "state history connection is busy streaming blocks"
+        self.__request("get_status_request_v0", {})
+        resultType,result=self.__result()
+        assert resultType == "get_status_result_v0", print("ERROR: unexpected state history result %s" % (resultType))
+        return result
+
+    def decodeTraces(self, traces):
+        """transaction_trace[] of a get_blocks_result_v0 traces field (zlib compressed packed bytes)."""
+        return self.abi.deserialize("transaction_trace[]", zlib.decompress(traces))
+
+    def decodeDeltas(self, deltas, decodeRows=True):
+        """table_delta[] of a get_blocks_result_v0 deltas field. With decodeRows each row's data is replaced by the
+        decoded table row (a variant, [type name, value])."""
+        tableDeltas=self.__rawAbi.deserialize("table_delta[]", zlib.decompress(deltas))
+        tableTypes={table["name"]: table["type"] for table in self.abi.abi.get("tables", [])} if decodeRows else {}
+        for _,delta in tableDeltas:
+            tableType=tableTypes.get(delta["name"])
+            for row in delta["rows"]:
+                row["data"]=row["data"].hex() if tableType is None else self.abi.deserialize(tableType, row["data"])
+        return tableDeltas
+
+    def __decodeResult(self, result, decodeRows):
+        blockNum=result["this_block"]["block_num"]
+        decoded={"head": result["head"], "last_irreversible": result["last_irreversible"], "this_block": result["this_block"],
+                 "prev_block": result["prev_block"], "block": None, "traces": None, "deltas": None}
+        if result["block"] is not None:
+            decoded["block"]=BlockLog.unpackBlock(result["block"], blockNum)
+        if result["traces"] is not None:
+            decoded["traces"]=[trace for _,trace in self.decodeTraces(result["traces"])]
+        if result["deltas"] is not None:
+            decoded["deltas"]=[delta for _,delta in self.decodeDeltas(result["deltas"], decodeRows)]
+        return decoded
+
+    # pylint: disable=too-many-arguments
+    # pylint: disable=too-many-locals
+    def blocks(self, start, end=MaxBlockNum, irreversibleOnly=False, fetchBlock=True, fetchTraces=False, fetchDeltas=False,
+               decodeRows=True, havePositions=None, window=16, idleTimeout=None):
+        """Generator of the blocks start up to (not including) end, each a dict of head, last_irreversible, this_block,
+        prev_block and the decoded block (as get block returns it), traces (transaction traces) and deltas (table
+        deltas) fetched. When the node switches forks the stream starts over at the first block of the new branch.
+
+        At most window results are in flight: the plugin only sends more after they are acknowledged, which happens
+        as the caller consumes them, so a slow consumer holds the node back instead of buffering without bound. If
+        idleTimeout is set, None is yielded whenever no result arrived for that long (the caller may stop or go on
+        waiting); otherwise the stream waits for new blocks until end. The plugin keeps sending head updates on
+        the connection after a stream, so it is closed when the stream ends and the next request reconnects."""
+        assert window > 0
+        assert not self.__streaming, "state history connection is already streaming blocks"
+        self.__request("get_blocks_request_v0", {
+            "start_block_num": start, "end_block_num": end, "max_messages_in_flight": window,
+            "have_positions": havePositions or [], "irreversible_only": irreversibleOnly,
+            "fetch_block": fetchBlock, "fetch_traces": fetchTraces, "fetch_deltas": fetchDeltas})
+        self.__streaming=True
+        try:
+            unacked=0
+            while True:
+                if unacked >= (window+1)//2:
+                    self.__request("get_blocks_ack_request_v0", {"num_messages": unacked})
+                    unacked=0
+                result=self.__result(idleTimeout)
+                if result is None:
+                    if unacked:
+                        # the plugin waits for these acks before sending anything more
+                        self.__request("get_blocks_ack_request_v0", {"num_messages": unacked})
+                        unacked=0
+                    yield None
+                    continue
+                unacked+=1
+                resultType,result=result
+                assert resultType == "get_blocks_result_v0", print("ERROR: unexpected state history result %s" % (resultType))
+                if result["this_block"] is None:
+                    # status update without a block, sent when the node's head moves
+                    continue
+                yield self.__decodeResult(result, decodeRows)
+                if result["this_block"]["block_num"]+1 >= end:
+                    return
+        finally:
+            self.close()
@@ -105,6 +105,10 @@ class TestHelper(object):
             parser.add_argument("--clean-run", help="Kill all nodeos and kleos instances", action='store_true')
         if "--sanity-test" in includeArgs:
             parser.add_argument("--sanity-test", help="Validates nodeos and kleos are in path and can be started up.", action='store_true')
+        if "--use-cleos" in includeArgs:
+            parser.add_argument("--use-cleos", help="Query nodes through cleos instead of the HTTP RPC client", action='store_true')
+        if "--snapshot-cache" in includeArgs:
+            parser.add_argument("--snapshot-cache", type=str, help="Directory caching bootstrapped chain snapshots. Clusters start from a cached snapshot when there is one for their layout", default=None)
 
         for arg in applicationSpecificArgs.args:
             parser.add_argument(arg.flag, type=arg.type, help=arg.help, choices=arg.choices, default=arg.default)
@@ -139,6 +143,9 @@ class TestHelper(object):
 
         Utils.ShuttingDown=True
 
+        if cluster.stopDivergenceMonitor(raiseOnDivergence=False) is not None:
+            testSuccessful=False
+
         if testSuccessful:
             Utils.Print("Test succeeded.")
         else:
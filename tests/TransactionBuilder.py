@@ -0,0 +1,382 @@
+import datetime
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+
+from EosKeys import EosKeys
+
+###########################################################################################
+class AbiSerializer(object):
+    """Binary serialization of json values (as accepted by abi_json_to_bin) for the types of one contract abi."""
+
+    # pylint: disable=too-many-public-methods
+    def __init__(self, abi):
+        self.abi=abi
+        self.typedefs={t["new_type_name"]: t["type"] for t in abi.get("types", [])}
+        self.structs={s["name"]: (s.get("base", ""), [(f["name"], f["type"]) for f in s["fields"]]) for s in abi.get("structs", [])}
+        self.variants={v["name"]: v["types"] for v in abi.get("variants", [])}
+        self.actions={a["name"]: a["type"] for a in abi.get("actions", [])}
+        self.builtins={
+            "bool": AbiSerializer.packBool,
+            "int8": lambda v, b: b.extend(struct.pack("<b", int(v))),
+            "uint8": lambda v, b: b.extend(struct.pack("<B", int(v))),
+            "int16": lambda v, b: b.extend(struct.pack("<h", int(v))),
+            "uint16": lambda v, b: b.extend(struct.pack("<H", int(v))),
+            "int32": lambda v, b: b.extend(struct.pack("<i", int(v))),
+            "uint32": lambda v, b: b.extend(struct.pack("<I", int(v))),
+            "int64": lambda v, b: b.extend(struct.pack("<q", int(v))),
+            "uint64": lambda v, b: b.extend(struct.pack("<Q", int(v))),
+            "int128": lambda v, b: b.extend(AbiSerializer.intValue(v).to_bytes(16, "little", signed=True)),
+            "uint128": lambda v, b: b.extend(AbiSerializer.intValue(v).to_bytes(16, "little")),
+            "varint32": lambda v, b: AbiSerializer.packVaruint32(((int(v) << 1) ^ (int(v) >> 31)) & 0xffffffff, b),
+            "varuint32": lambda v, b: AbiSerializer.packVaruint32(int(v), b),
+            "float32": lambda v, b: b.extend(struct.pack("<f", float(v))),
+            "float64": lambda v, b: b.extend(struct.pack("<d", float(v))),
+            "float128": lambda v, b: b.extend(bytes.fromhex(v[2:] if v.startswith("0x") else v)),
+            "time_point": lambda v, b: b.extend(struct.pack("<q", AbiSerializer.microseconds(v))),
+            "time_point_sec": lambda v, b: b.extend(struct.pack("<I", AbiSerializer.microseconds(v)//1000000)),
+            "block_timestamp_type": lambda v, b: b.extend(struct.pack("<I", (AbiSerializer.microseconds(v)//1000 - 946684800000)//500)),
+            "name": lambda v, b: b.extend(struct.pack("<Q", AbiSerializer.nameToInt(v))),
+            "bytes": AbiSerializer.packBytes,
+            "string": AbiSerializer.packString,
+            "checksum160": lambda v, b: b.extend(AbiSerializer.fixedHex(v, 20)),
+            "checksum256": lambda v, b: b.extend(AbiSerializer.fixedHex(v, 32)),
+            "checksum512": lambda v, b: b.extend(AbiSerializer.fixedHex(v, 64)),
+            "public_key": lambda v, b: b.extend(b"\x00" + EosKeys.publicKeyFromString(v)),
+            "signature": lambda v, b: b.extend(b"\x00" + EosKeys.signatureFromString(v)),
+            "symbol": lambda v, b: b.extend(struct.pack("<Q", AbiSerializer.symbolToInt(v))),
+            "symbol_code": lambda v, b: b.extend(struct.pack("<Q", AbiSerializer.symbolCodeToInt(v))),
+            "asset": AbiSerializer.packAsset,
+            "extended_asset": AbiSerializer.packExtendedAsset,
+        }
+
+    @staticmethod
+    def intValue(value):
+        return int(value, 0) if isinstance(value, str) else int(value)
+
+    @staticmethod
+    def nameToInt(name):
+        def charToSymbol(c):
+            if "a" <= c <= "z":
+                return ord(c) - ord("a") + 6
+            if "1" <= c <= "5":
+                return ord(c) - ord("1") + 1
+            return 0
+        assert len(name) <= 13, print("ERROR: name %s is longer than 13 characters" % (name))
+        value=0
+        for i in range(13):
+            c=charToSymbol(name[i]) if i < len(name) else 0
+            if i < 12:
+                value|=(c & 0x1f) << (64 - 5*(i+1))
+            else:
+                value|=c & 0x0f
+        return value
+
+    @staticmethod
+    def intToName(value):
+        charmap=".12345abcdefghijklmnopqrstuvwxyz"
+        chars=[]
+        for i in range(13):
+            if i == 0:
+                chars.append(charmap[value & 0x0f])
+                value>>=4
+            else:
+                chars.append(charmap[value & 0x1f])
+                value>>=5
+        return "".join(reversed(chars)).rstrip(".")
+
+    @staticmethod
+    def symbolCodeToInt(code):
+        value=0
+        for i, c in enumerate(code):
+            value|=ord(c) << (8*i)
+        return value
+
+    @staticmethod
+    def symbolToInt(symbol):
+        """"4,SYS" -> precision in the low byte, symbol code above it"""
+        precision,_,code=symbol.partition(",")
+        return int(precision) | (AbiSerializer.symbolCodeToInt(code) << 8)
+
+    @staticmethod
+    def microseconds(isoTime):
+        """"2018-06-01T12:00:00.500" (optionally with a Z suffix) -> microseconds since epoch"""
+        isoTime=isoTime.rstrip("Z")
+        seconds,_,fraction=isoTime.partition(".")
+        fmt="%Y-%m-%dT%H:%M:%S" if seconds.count(":") == 2 else "%Y-%m-%dT%H:%M"
+        date=datetime.datetime.strptime(seconds, fmt)
+        epochSeconds=int((date - datetime.datetime(1970, 1, 1)).total_seconds())
+        return epochSeconds*1000000 + int((fraction + "000000")[:6])
+
+    @staticmethod
+    def fixedHex(value, size):
+        data=bytes.fromhex(value)
+        assert len(data) == size, print("ERROR: expected %d bytes of hex, got %s" % (size, value))
+        return data
+
+    @staticmethod
+    def packVaruint32(value, buf):
+        while True:
+            byte=value & 0x7f
+            value>>=7
+            if value:
+                buf.append(byte | 0x80)
+            else:
+                buf.append(byte)
+                return
+
+    @staticmethod
+    def packBool(value, buf):
+        if isinstance(value, str):
+            value=value == "true"
+        buf.append(1 if value else 0)
+
+    @staticmethod
+    def packBytes(value, buf):
+        data=bytes.fromhex(value) if isinstance(value, str) else bytes(value)
+        AbiSerializer.packVaruint32(len(data), buf)
+        buf.extend(data)
+
+    @staticmethod
+    def packString(value, buf):
+        data=value.encode("utf-8")
+        AbiSerializer.packVaruint32(len(data), buf)
+        buf.extend(data)
+
+    @staticmethod
+    def packAsset(value, buf):
+        """"1.0000 SYS" -> int64 amount, symbol"""
+        amount,code=value.split()
+        negative=amount.startswith("-")
+        whole,_,fraction=amount.lstrip("-").partition(".")
+        units=int(whole + fraction)
+        buf.extend(struct.pack("<q", -units if negative else units))
+        buf.extend(struct.pack("<Q", len(fraction) | (AbiSerializer.symbolCodeToInt(code) << 8)))
+
+    @staticmethod
+    def packExtendedAsset(value, buf):
+        AbiSerializer.packAsset(value["quantity"], buf)
+        buf.extend(struct.pack("<Q", AbiSerializer.nameToInt(value["contract"])))
+
+    def resolveType(self, typeName):
+        while typeName in self.typedefs:
+            typeName=self.typedefs[typeName]
+        return typeName
+
+    def pack(self, typeName, value, buf):
+        """Append the serialization of value as typeName to buf (a bytearray)."""
+        if typeName.endswith("[]"):
+            AbiSerializer.packVaruint32(len(value), buf)
+            for item in value:
+                self.pack(typeName[:-2], item, buf)
+            return
+        if typeName.endswith("?"):
+            buf.append(0 if value is None else 1)
+            if value is not None:
+                self.pack(typeName[:-1], value, buf)
+            return
+        typeName=self.resolveType(typeName)
+        builtin=self.builtins.get(typeName)
+        if builtin is not None:
+            builtin(value, buf)
+        elif typeName in self.structs:
+            self.packStruct(typeName, value, buf)
+        elif typeName in self.variants:
+            variantType,variantValue=value
+            types=self.variants[typeName]
+            assert variantType in types, print("ERROR: %s is not a type of variant %s" % (variantType, typeName))
+            AbiSerializer.packVaruint32(types.index(variantType), buf)
+            self.pack(variantType, variantValue, buf)
+        else:
+            raise KeyError("unknown abi type %s" % (typeName))
+
+    def packStruct(self, structName, value, buf):
+        base,fields=self.structs[structName]
+        if base:
+            self.packStruct(self.resolveType(base), value, buf)
+        for i, (fieldName, fieldType) in enumerate(fields):
+            if fieldType.endswith("$"):
+                # binary extension, may only be left out together with all the fields after it
+                if fieldName not in value:
+                    assert all(name not in value for name,_ in fields[i:]), print("ERROR: %s.%s missing" % (structName, fieldName))
+                    return
+                fieldType=fieldType[:-1]
+            assert fieldName in value, print("ERROR: %s.%s missing in %s" % (structName, fieldName, value))
+            self.pack(fieldType, value[fieldName], buf)
+
+    def serialize(self, typeName, value):
+        buf=bytearray()
+        self.pack(typeName, value, buf)
+        return bytes(buf)
+
+    def serializeActionData(self, action, data):
+        assert action in self.actions, print("ERROR: action %s is not in the abi" % (action))
+        return self.serialize(self.actions[action], data)
+
+###########################################################################################
+class TransactionBuilder(object):
+    """Builds and signs transactions without keosd or cleos: action data is serialized with contract abis fetched once
+    per account, TaPoS data comes from a get info result reused for up to TaposMaxAge seconds, signatures are made
+    with private keys held by the caller (e.g. Account.activePrivateKey) and the transaction id is computed locally.
+    build() returns push_transaction parameters with the transaction in packed form."""
+
+    # seconds a get info result (reference block, chain id) is used for TaPoS before it is refreshed
+    TaposMaxAge=10
+
+    TransactionAbi=AbiSerializer({
+        "structs": [
+            {"name": "permission_level", "base": "", "fields": [{"name": "actor", "type": "name"}, {"name": "permission", "type": "name"}]},
+            {"name": "action", "base": "", "fields": [{"name": "account", "type": "name"}, {"name": "name", "type": "name"},
+                                                      {"name": "authorization", "type": "permission_level[]"}, {"name": "data", "type": "bytes"}]},
+            {"name": "extension", "base": "", "fields": [{"name": "type", "type": "uint16"}, {"name": "data", "type": "bytes"}]},
+            {"name": "transaction_header", "base": "", "fields": [
+                {"name": "expiration", "type": "time_point_sec"}, {"name": "ref_block_num", "type": "uint16"},
+                {"name": "ref_block_prefix", "type": "uint32"}, {"name": "max_net_usage_words", "type": "varuint32"},
+                {"name": "max_cpu_usage_ms", "type": "uint8"}, {"name": "delay_sec", "type": "varuint32"}]},
+            {"name": "transaction", "base": "transaction_header", "fields": [
+                {"name": "context_free_actions", "type": "action[]"}, {"name": "actions", "type": "action[]"},
+                {"name": "transaction_extensions", "type": "extension[]"}]}
+        ]
+    })
+
+    def __init__(self, rpc):
+        self.rpc=rpc
+        self.__abis={}
+        self.__info=None
+        self.__infoTime=0
+        self.__lock=threading.Lock()
+        self.transactionsBuilt=0
+
+    @staticmethod
+    def makeTransaction(actions, info, contextFreeActions, expiration):
+        """Unsigned transaction for actions with expiration and TaPoS taken from a get info result, the way cleos sets
+        them (head block time + expiration seconds, referencing the last irreversible block)."""
+        headTime=datetime.datetime.strptime(info["head_block_time"].split(".")[0], "%Y-%m-%dT%H:%M:%S")
+        expires=headTime + datetime.timedelta(seconds=expiration)
+        refBlockId=info["last_irreversible_block_id"]
+        return {
+            "expiration": expires.strftime("%Y-%m-%dT%H:%M:%S"),
+            "ref_block_num": int(refBlockId[0:8], 16) & 0xffff,
+            "ref_block_prefix": struct.unpack("<I", bytes.fromhex(refBlockId[16:24]))[0],
+            "max_net_usage_words": 0,
+            "max_cpu_usage_ms": 0,
+            "delay_sec": 0,
+            "context_free_actions": contextFreeActions if contextFreeActions is not None else [],
+            "actions": actions,
+            "transaction_extensions": []
+        }
+
+    @staticmethod
+    def packTransaction(trx):
+        return TransactionBuilder.TransactionAbi.serialize("transaction", trx)
+
+    @staticmethod
+    def transactionId(packedTrx):
+        return hashlib.sha256(packedTrx).hexdigest()
+
+    @staticmethod
+    def signingDigest(chainId, packedTrx):
+        # no context free data, so its digest is all zeros
+        return hashlib.sha256(bytes.fromhex(chainId) + packedTrx + b"\x00"*32).digest()
+
+    @staticmethod
+    def keysFor(actions, signers):
+        """Private keys for the authorizations of actions. signers maps account names to Accounts, owner permissions
+        use Account.ownerPrivateKey and all others Account.activePrivateKey."""
+        keys=[]
+        for action in actions:
+            for auth in action["authorization"]:
+                account=signers.get(auth["actor"])
+                assert account is not None, print("ERROR: no signer for %s@%s" % (auth["actor"], auth["permission"]))
+                key=account.ownerPrivateKey if auth["permission"] == "owner" else account.activePrivateKey
+                if key not in keys:
+                    keys.append(key)
+        return keys
+
+    def getAbi(self, account):
+        """AbiSerializer for account's contract, fetched with get_abi on first use. Raises RpcError."""
+        with self.__lock:
+            abi=self.__abis.get(account)
+        if abi is None:
+            ret=self.rpc.chain("get_abi", {"account_name": account})
+            assert "abi" in ret, print("ERROR: account %s has no abi" % (account))
+            abi=AbiSerializer(ret["abi"])
+            with self.__lock:
+                self.__abis[account]=abi
+        return abi
+
+    def invalidateAbi(self, account=None):
+        """Forget the cached abi of account (all of them if None), e.g. after a new contract is set."""
+        with self.__lock:
+            if account is None:
+                self.__abis.clear()
+            else:
+                self.__abis.pop(account, None)
+
+    def tapos(self):
+        """Returns the cached get info result used for TaPoS and the chain id, refreshed when older than TaposMaxAge."""
+        return self.__tapos()[0]
+
+    def __tapos(self):
+        """(tapos(), time it was retrieved)"""
+        with self.__lock:
+            if self.__info is not None and time.time() - self.__infoTime < TransactionBuilder.TaposMaxAge:
+                return (self.__info, self.__infoTime)
+        info=self.rpc.chain("get_info")
+        infoTime=time.time()
+        with self.__lock:
+            self.__info=info
+            self.__infoTime=infoTime
+        return (info, infoTime)
+
+    def clear(self):
+        with self.__lock:
+            self.__abis.clear()
+            self.__info=None
+
+    @staticmethod
+    def isHexData(data):
+        """Whether action data is already serialized: a string of hex byte pairs."""
+        return isinstance(data, str) and re.fullmatch(r"([0-9a-fA-F]{2})*", data) is not None
+
+    def serializeAction(self, action):
+        """Returns action with json (str or object) data replaced by its hex serialization. Raises ValueError for a
+        string that is neither hex nor json."""
+        data=action["data"]
+        if TransactionBuilder.isHexData(data):
+            return action
+        if isinstance(data, str):
+            try:
+                data=json.loads(data)
+            except ValueError as _:
+                raise ValueError("data of action %s::%s is neither hex nor json: %r" % (action["account"], action["name"], data))
+        return dict(action, data=self.getAbi(action["account"]).serializeActionData(action["name"], data).hex())
+
+    # pylint: disable=too-many-arguments
+    def build(self, actions, keys, contextFreeActions=None, expiration=30):
+        """Returns (transaction id, push_transaction params) for actions signed with keys (private key strings)."""
+        info,infoTime=self.__tapos()
+        actions=[self.serializeAction(action) for action in actions]
+        # expire relative to the head block time now, not when the cached info was retrieved, so like with cleos the
+        # same actions built a second or more apart get different transaction ids
+        expiration+=max(int(time.time() - infoTime), 0)
+        trx=TransactionBuilder.makeTransaction(actions, info, contextFreeActions, expiration)
+        self.transactionsBuilt+=1
+        return TransactionBuilder.signTransaction(trx, info["chain_id"], keys)
+
+    @staticmethod
+    def signTransaction(trx, chainId, keys):
+        """Returns (transaction id, push_transaction params) for trx (action data already hex) signed with keys."""
+        packed=TransactionBuilder.packTransaction(trx)
+        digest=TransactionBuilder.signingDigest(chainId, packed)
+        signatures=[EosKeys.signDigest(digest, key) for key in keys]
+        return (TransactionBuilder.transactionId(packed),
+                {"signatures": signatures, "compression": "none", "packed_context_free_data": "", "packed_trx": packed.hex()})
+
+    @staticmethod
+    def signTransactions(chainId, items):
+        """signTransaction for each (trx, keys) of items, for process pools."""
+        return [TransactionBuilder.signTransaction(trx, chainId, keys) for trx,keys in items]
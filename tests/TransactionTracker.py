@@ -0,0 +1,264 @@
+import calendar
+import datetime
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import wait as waitForFutures
+
+from testUtils import Utils
+
+###########################################################################################
+class TrackedTransaction(object):
+    """State of one tracked transaction, see TransactionTracker."""
+    __slots__=["transId", "state", "blockNum", "hintBlockNum", "expiration", "wasIncluded", "waiters"]
+
+    def __init__(self, transId, hintBlockNum, expiration):
+        self.transId=transId
+        self.state=TransactionTracker.Pending
+        self.blockNum=None
+        self.hintBlockNum=hintBlockNum
+        self.expiration=expiration
+        self.wasIncluded=False
+        self.waiters=[]
+
+###########################################################################################
+class TransactionTracker(object):
+    """Follows the state of the transactions submitted through one node: pending, included (in a block of the node's
+    current chain), irreversible, expired (never included before its expiration) or dropped (included, forked out and
+    then expired). All pending transactions are resolved by one pass over the blocks the node's BlockFollower has
+    ingested since the last poll, and an included transaction's block is recorded once and then only compared against
+    LIB, so waiting on any number of transactions costs one get info and the new blocks per poll. Polls happen in
+    waitForTransactions, or on a background thread once started.
+
+    Waiters are futures resolving to the state a transaction ended up in, once it reached the state waited for or
+    can no longer reach it. Final transactions are kept for lookups up to maxFinished."""
+
+    Pending="pending"
+    Included="included"
+    Irreversible="irreversible"
+    Expired="expired"
+    Dropped="dropped"
+    FinalStates=[Irreversible, Expired, Dropped]
+    WaitTimeout=60 # default seconds waitForTransactions waits, the Utils.waitForObj default
+
+    def __init__(self, node, maxFinished=100000):
+        self.node=node
+        self.maxFinished=maxFinished
+        self.__active={}
+        self.__finished=OrderedDict()
+        self.__pending={}       # the active transactions not in a block
+        self.__included=[]      # heap of (block num, trans id) of included transactions, stale entries are skipped
+        self.__blocksDropped=node.blockFollower.blocksDropped
+        self.__lock=threading.RLock()
+        self.__pollLock=threading.Lock()    # one poll at a time, only it queries the node
+        self.__thread=None
+        self.__stopEvent=threading.Event()
+        self.polls=0
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__active)
+
+    @staticmethod
+    def parseBlockTime(timeStr):
+        """Seconds since the epoch of a head_block_time like 2018-06-01T12:00:00.500 (UTC)."""
+        date=datetime.datetime.strptime(timeStr if "." in timeStr else timeStr + ".0", "%Y-%m-%dT%H:%M:%S.%f")
+        return calendar.timegm(date.timetuple()) + date.microsecond/1000000
+
+    def track(self, transId, hintBlockNum=None, expiration=None):
+        """Start tracking transId. hintBlockNum is a block number the transaction can not be below (e.g. the head when
+        it was pushed), expiration its expiration in seconds since the epoch (default: TransExpiration past the head
+        block time of the node's last get info plus the time since, never earlier than the expiration cleos or
+        TransactionBuilder set from the head block time at push; without a get info yet, TransExpiration past the
+        head block time of the first poll). Returns its TrackedTransaction."""
+        with self.__lock:
+            entry=self.__active.get(transId) or self.__finished.get(transId)
+            if entry is not None:
+                if hintBlockNum is not None:
+                    entry.hintBlockNum=hintBlockNum
+                return entry
+            if hintBlockNum is None and self.node.lastRetrievedHeadBlockNum is not None:
+                hintBlockNum=self.node.lastRetrievedHeadBlockNum
+            if hintBlockNum is not None:
+                hintBlockNum=max(hintBlockNum-self.node.TransBlockHintMargin, 1)
+            if expiration is None and self.node.lastRetrievedHeadBlockTime is not None:
+                retrievedTime,headTime=self.node.lastRetrievedHeadBlockTime
+                expiration=headTime+(time.time()-retrievedTime)+self.node.TransExpiration
+            entry=TrackedTransaction(transId, hintBlockNum, expiration)
+            self.__active[transId]=entry
+            self.__pending[transId]=entry
+            return entry
+
+    def get(self, transId):
+        """TrackedTransaction of transId, None if it is not tracked."""
+        with self.__lock:
+            return self.__active.get(transId) or self.__finished.get(transId)
+
+    def state(self, transId):
+        entry=self.get(transId)
+        return None if entry is None else entry.state
+
+    @staticmethod
+    def reached(state, target):
+        """Whether a transaction in state has reached target (irreversible includes included)."""
+        if target == TransactionTracker.Included:
+            return state in (TransactionTracker.Included, TransactionTracker.Irreversible)
+        return state == target
+
+    def future(self, transId, state=Included):
+        """Future resolving to the state of transId once it has reached state, or is final without having reached it."""
+        future=Future()
+        with self.__lock:
+            entry=self.track(transId)
+            if TransactionTracker.reached(entry.state, state) or entry.state in TransactionTracker.FinalStates:
+                future.set_result(entry.state)
+            else:
+                entry.waiters.append((state, future))
+        return future
+
+    def onState(self, transId, callback, state=Included):
+        """Call callback(transId, state reached) once transId has reached state or is final, see future."""
+        self.future(transId, state).add_done_callback(lambda future: callback(transId, future.result()))
+
+    def __setState(self, entry, state, blockNum=None):
+        entry.state=state
+        entry.blockNum=blockNum
+        if state == TransactionTracker.Pending:
+            self.__pending[entry.transId]=entry
+        else:
+            self.__pending.pop(entry.transId, None)
+        if state == TransactionTracker.Included:
+            entry.wasIncluded=True
+            heapq.heappush(self.__included, (blockNum, entry.transId))
+        resolved=[]
+        remaining=[]
+        for target,future in entry.waiters:
+            if TransactionTracker.reached(state, target) or state in TransactionTracker.FinalStates:
+                resolved.append(future)
+            else:
+                remaining.append((target, future))
+        entry.waiters=remaining
+        if state in TransactionTracker.FinalStates:
+            del self.__active[entry.transId]
+            self.__finished[entry.transId]=entry
+            while len(self.__finished) > self.maxFinished:
+                self.__finished.popitem(last=False)
+        # only once the state change is complete, callbacks may wait on the transaction again
+        for future in resolved:
+            future.set_result(state)
+
+    def __include(self, entry, blockNum, lib):
+        if blockNum <= lib:
+            self.__setState(entry, TransactionTracker.Irreversible, blockNum)
+        elif entry.state != TransactionTracker.Included or entry.blockNum != blockNum:
+            self.__setState(entry, TransactionTracker.Included, blockNum)
+
+    def poll(self):
+        """Bring the node's followed blocks up to date and move every tracked transaction along, for one get info.
+        Pending transactions are looked up in the blocks followed, included ones are only compared against LIB
+        (and looked up again when blocks were forked out since the last poll). The followed blocks are only extended
+        back for pending transactions someone waits on, and the node is queried without holding the lock future and
+        track take. Returns False if the node could not be queried."""
+        with self.__pollLock:
+            with self.__lock:
+                self.polls+=1
+                if not self.__active:
+                    return True
+            info=self.node.getInfo(silentErrors=True)
+            if info is None:
+                return False
+            follower=self.node.blockFollower
+            if not follower.update(info):
+                return False
+            defaultHint=max(int(info["head_block_num"])-self.node.TransBlockHintMargin, 1)
+            headTime=TransactionTracker.parseBlockTime(info["head_block_time"])
+            with self.__lock:
+                for entry in self.__pending.values():
+                    # tracked before the node's head was known, it can't be below the head seen now (less the margin)
+                    # nor expire before TransExpiration past its time
+                    if entry.hintBlockNum is None:
+                        entry.hintBlockNum=defaultHint
+                    if entry.expiration is None:
+                        entry.expiration=headTime+self.node.TransExpiration
+                hints=[entry.hintBlockNum for entry in self.__pending.values() if entry.waiters]
+            if hints and min(hints) < follower.firstBlockNum:
+                follower.backfill(min(hints))
+
+            lib=int(info["last_irreversible_block_num"])
+            with self.__lock:
+                if follower.blocksDropped != self.__blocksDropped:
+                    self.__blocksDropped=follower.blocksDropped
+                    for entry in [entry for entry in self.__active.values() if entry.state == TransactionTracker.Included]:
+                        blockNum=follower.getTransBlockNum(entry.transId)
+                        if blockNum is not None:
+                            self.__include(entry, blockNum, lib)
+                        elif follower.firstBlockNum is not None and entry.blockNum >= follower.firstBlockNum:
+                            # its block was forked out, it may still make it into another one before it expires
+                            if Utils.Debug: Utils.Print("Transaction %s was forked out of block %d on %s" % (entry.transId, entry.blockNum, self.node))
+                            self.__setState(entry, TransactionTracker.Pending)
+
+                for entry in list(self.__pending.values()):
+                    blockNum=follower.getTransBlockNum(entry.transId)
+                    if blockNum is not None:
+                        self.__include(entry, blockNum, lib)
+                    elif headTime > entry.expiration and entry.hintBlockNum >= follower.firstBlockNum:
+                        self.__setState(entry, TransactionTracker.Dropped if entry.wasIncluded else TransactionTracker.Expired)
+                    # otherwise, when it can be in a block below the followed ones it stays pending until waited on
+
+                # everything included at or below LIB is final, whatever the number of waiters
+                while self.__included and self.__included[0][0] <= lib:
+                    blockNum,transId=heapq.heappop(self.__included)
+                    entry=self.__active.get(transId)
+                    if entry is not None and entry.state == TransactionTracker.Included and entry.blockNum == blockNum:
+                        self.__setState(entry, TransactionTracker.Irreversible, blockNum)
+            return True
+
+    def __nextProbe(self):
+        if self.node.lastRetrievedHeadBlockNum is None:
+            return None
+        return self.node.estimateBlockWait(self.node.lastRetrievedHeadBlockNum+1)
+
+    def waitForTransactions(self, transIds, state=Included, timeout=None):
+        """Wait for all transIds to reach state (included or irreversible). Returns True if they all did, False if
+        any of them ended up expired or dropped, or the wait timed out (default: WaitTimeout seconds); see states for
+        the details."""
+        if timeout is None:
+            timeout=TransactionTracker.WaitTimeout
+        futures=[self.future(transId, state) for transId in transIds]
+        if self.isRunning():
+            waitForFutures(futures, timeout)
+        else:
+            def allDone():
+                self.poll()
+                return all(future.done() for future in futures)
+            Utils.waitForBool(allDone, timeout, nextProbe=self.__nextProbe)
+        return all(future.done() and TransactionTracker.reached(future.result(), state) for future in futures)
+
+    def states(self, transIds):
+        """{transId: state} of transIds, None for those not tracked."""
+        return {transId: self.state(transId) for transId in transIds}
+
+    def start(self, interval=None):
+        """Poll on a background thread, every interval seconds (default: the block interval)."""
+        assert self.__thread is None, "transaction tracker already started"
+        interval=Utils.BlockInterval if interval is None else interval
+        self.__stopEvent.clear()
+        def run():
+            while not self.__stopEvent.wait(interval):
+                try:
+                    self.poll()
+                except Exception as ex: # pylint: disable=broad-except
+                    Utils.Print("ERROR: transaction tracker poll failed on %s: %s" % (self.node, ex))
+        self.__thread=threading.Thread(target=run, name="TransactionTracker", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__stopEvent.set()
+            self.__thread.join()
+            self.__thread=None
+
+    def isRunning(self):
+        return self.__thread is not None
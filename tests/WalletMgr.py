@@ -6,8 +6,12 @@ import os
 from collections import namedtuple
 import re
 import sys
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 from testUtils import Utils
+from RpcClient import RpcClient
+from RpcClient import RpcError
 
 Wallet=namedtuple("Wallet", "name password host port")
 # pylint: disable=too-many-instance-attributes
@@ -16,6 +20,9 @@ class WalletMgr(object):
     __walletLogErrFile="test_keosd_err.log"
     __walletDataDir="test_wallet_0"
     __MaxPort=9999
+    __dupKeyMsg="Key already in wallet"
+    # concurrent keosd import_key requests, also the size of the keosd connection pool
+    importKeyWorkers=8
 
     # pylint: disable=too-many-arguments
     # walletd [True|False] True=Launch wallet(keosd) process; False=Manage launch process externally.
@@ -27,6 +34,9 @@ class WalletMgr(object):
         self.host=host
         self.wallets={}
         self.__walletPid=None
+        self.__rpc=None
+        # wallet name -> private keys known to be in the wallet, to skip importing them again
+        self.__walletKeys={}
 
     def getWalletEndpointArgs(self):
         if not self.walletd or not self.isLaunched():
@@ -37,6 +47,18 @@ class WalletMgr(object):
     def getArgs(self):
         return " --url http://%s:%d%s %s" % (self.nodeosHost, self.nodeosPort, self.getWalletEndpointArgs(), Utils.MiscEosClientArgs)
 
+    def useRpc(self):
+        """keosd HTTP API is used directly when this manager launched keosd itself, unless Utils.UseCleos is set."""
+        return self.walletd and self.isLaunched() and not Utils.UseCleos
+
+    def rpc(self):
+        """Returns the pooled keosd client, recreated if keosd was relaunched on a different port."""
+        if self.__rpc is None or self.__rpc.host != self.host or self.__rpc.port != self.port:
+            if self.__rpc is not None:
+                self.__rpc.close()
+            self.__rpc=RpcClient(self.host, self.port, maxConnections=WalletMgr.importKeyWorkers)
+        return self.__rpc
+
     def isLaunched(self):
         return self.__walletPid is not None
 
@@ -86,6 +108,7 @@ class WalletMgr(object):
         with open(WalletMgr.__walletLogOutFile, 'w') as sout, open(WalletMgr.__walletLogErrFile, 'w') as serr:
             popen=subprocess.Popen(cmd.split(), stdout=sout, stderr=serr)
             self.__walletPid=popen.pid
+        self.__walletKeys={}
 
         # Give keosd time to warm up
         time.sleep(2)
@@ -99,11 +122,29 @@ class WalletMgr(object):
 
         return True
 
-    def create(self, name, accounts=None, exitOnError=True):
+    def create(self, name, accounts=None, exitOnError=True, privateKeys=None):
+        """Create wallet name, pre-seeded with the keys of accounts and with privateKeys, see importKeys."""
         wallet=self.wallets.get(name)
         if wallet is not None:
             if Utils.Debug: Utils.Print("Wallet \"%s\" already exists. Returning same." % name)
             return wallet
+
+        if self.useRpc():
+            try:
+                password=self.rpc().wallet("create", json.dumps(name))
+            except RpcError as ex:
+                errorMsg="ERROR: Failed to create wallet - %s. %s" % (name, ex.output)
+                if exitOnError:
+                    Utils.errorExit("%s" % (errorMsg))
+                Utils.Print("%s" % (errorMsg))
+                return None
+            wallet=Wallet(name, password, self.host, self.port)
+            self.wallets[name]=wallet
+            self.__walletKeys[name]=set()
+            if (accounts or privateKeys) and not self.importKeys(accounts or [], wallet, privateKeys=privateKeys) and exitOnError:
+                Utils.errorExit("Failed to import keys into wallet %s" % (name))
+            return wallet
+
         p = re.compile(r'\n\"(\w+)\"\n', re.MULTILINE)
         cmdDesc="wallet create"
         cmd="%s %s %s --name %s --to-console" % (Utils.EosClientPath, self.getArgs(), cmdDesc, name)
@@ -150,20 +191,96 @@ class WalletMgr(object):
         wallet=Wallet(name, p, self.host, self.port)
         self.wallets[name] = wallet
 
-        if accounts:
-            self.importKeys(accounts,wallet)
+        if accounts or privateKeys:
+            self.importKeys(accounts or [],wallet,privateKeys=privateKeys)
 
         return wallet
 
-    def importKeys(self, accounts, wallet, ignoreDupKeyWarning=False):
+    @staticmethod
+    def accountKeys(accounts):
+        """Owner and active private keys of accounts, without duplicates, in order."""
+        keys=[]
         for account in accounts:
-            Utils.Print("Importing keys for account %s into wallet %s." % (account.name, wallet.name))
-            if not self.importKey(account, wallet, ignoreDupKeyWarning):
-                Utils.Print("ERROR: Failed to import key for account %s" % (account.name))
+            if account.activePrivateKey is None:
+                Utils.Print("WARNING: Active private key is not defined for account \"%s\"" % (account.name))
+            keys+=[key for key in [account.ownerPrivateKey, account.activePrivateKey] if key is not None]
+        return list(dict.fromkeys(keys))
+
+    def importKeys(self, accounts, wallet, ignoreDupKeyWarning=False, privateKeys=None):
+        """Import the owner and active keys of accounts, plus privateKeys, into wallet. Over the keosd API keys are
+        deduplicated up front, keys already known to be in the wallet are skipped and the rest are imported with
+        importKeyWorkers concurrent requests; through cleos they are imported one account at a time."""
+        if not self.useRpc():
+            for account in accounts:
+                Utils.Print("Importing keys for account %s into wallet %s." % (account.name, wallet.name))
+                if not self.importKey(account, wallet, ignoreDupKeyWarning):
+                    Utils.Print("ERROR: Failed to import key for account %s" % (account.name))
+                    return False
+            for privateKey in privateKeys or []:
+                if not self.__importKeyCleos(privateKey, wallet, ignoreDupKeyWarning):
+                    return False
+            return True
+
+        keys=list(dict.fromkeys(WalletMgr.accountKeys(accounts) + list(privateKeys or [])))
+        Utils.Print("Importing %d keys for %d accounts into wallet %s." % (len(keys), len(accounts), wallet.name))
+        walletKeys=self.__knownKeys(wallet)
+        if walletKeys is None:
+            return False
+        dupKeys=[key for key in keys if key in walletKeys]
+        if dupKeys and not ignoreDupKeyWarning:
+            Utils.Print("WARNING: %d keys are already imported into the wallet." % (len(dupKeys)))
+        keys=[key for key in keys if key not in walletKeys]
+
+        def importPrivateKey(privateKey):
+            try:
+                self.rpc().wallet("import_key", [wallet.name, privateKey])
+            except RpcError as ex:
+                if WalletMgr.__dupKeyMsg not in ex.output:
+                    return ex
+            return None
+
+        start=time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WalletMgr.importKeyWorkers) as executor:
+            errors=list(executor.map(importPrivateKey, keys))
+        walletKeys.update(key for key,error in zip(keys, errors) if error is None)
+        if Utils.Debug: Utils.Print("Imported %d keys in %.3f sec" % (len(keys), time.perf_counter()-start))
+        for key,error in zip(keys, errors):
+            if error is not None:
+                Utils.Print("ERROR: Failed to import key %s. %s" % (key, error.output))
+                return False
+        return True
+
+    def __knownKeys(self, wallet):
+        """Set of the private keys in wallet, read from keosd the first time."""
+        walletKeys=self.__walletKeys.get(wallet.name)
+        if walletKeys is None:
+            try:
+                walletKeys=set(pair[1] for pair in self.rpc().wallet("list_keys", [wallet.name, wallet.password]))
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to get keys of wallet %s. %s" % (wallet.name, ex.output))
+                return None
+            self.__walletKeys[wallet.name]=walletKeys
+        return walletKeys
+
+    def __importKeyCleos(self, privateKey, wallet, ignoreDupKeyWarning):
+        cmd="%s %s wallet import --name %s --private-key %s" % (Utils.EosClientPath, self.getArgs(), wallet.name, privateKey)
+        if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
+        try:
+            Utils.checkOutput(cmd.split())
+        except subprocess.CalledProcessError as ex:
+            msg=ex.output.decode("utf-8")
+            if WalletMgr.__dupKeyMsg not in msg:
+                Utils.Print("ERROR: Failed to import key %s. %s" % (privateKey, msg))
                 return False
+            if not ignoreDupKeyWarning:
+                Utils.Print("WARNING: This key is already imported into the wallet.")
+        return True
 
     def importKey(self, account, wallet, ignoreDupKeyWarning=False):
-        warningMsg="Key already in wallet"
+        if self.useRpc():
+            return self.importKeys([account], wallet, ignoreDupKeyWarning)
+
+        warningMsg=WalletMgr.__dupKeyMsg
         cmd="%s %s wallet import --name %s --private-key %s" % (
             Utils.EosClientPath, self.getArgs(), wallet.name, account.ownerPrivateKey)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
@@ -199,6 +316,14 @@ class WalletMgr(object):
         return True
 
     def lockWallet(self, wallet):
+        if self.useRpc():
+            try:
+                self.rpc().wallet("lock", json.dumps(wallet.name))
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to lock wallet %s. %s" % (wallet.name, ex.output))
+                return False
+            return True
+
         cmd="%s %s wallet lock --name %s" % (Utils.EosClientPath, self.getArgs(), wallet.name)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         if 0 != subprocess.call(cmd.split(), stdout=Utils.FNull):
@@ -208,6 +333,14 @@ class WalletMgr(object):
         return True
 
     def unlockWallet(self, wallet):
+        if self.useRpc():
+            try:
+                self.rpc().wallet("unlock", [wallet.name, wallet.password])
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to unlock wallet %s: %s" % (wallet.name, ex.output))
+                return False
+            return True
+
         cmd="%s %s wallet unlock --name %s" % (Utils.EosClientPath, self.getArgs(), wallet.name)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         popen=subprocess.Popen(cmd.split(), stdout=Utils.FNull, stdin=subprocess.PIPE)
@@ -219,6 +352,14 @@ class WalletMgr(object):
         return True
 
     def lockAllWallets(self):
+        if self.useRpc():
+            try:
+                self.rpc().wallet("lock_all")
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to lock all wallets. %s" % (ex.output))
+                return False
+            return True
+
         cmd="%s %s wallet lock_all" % (Utils.EosClientPath, self.getArgs())
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
         if 0 != subprocess.call(cmd.split(), stdout=Utils.FNull):
@@ -230,6 +371,16 @@ class WalletMgr(object):
     def getOpenWallets(self):
         wallets=[]
 
+        if self.useRpc():
+            try:
+                retArr=self.rpc().wallet("list_wallets")
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to open wallets. %s" % (ex.output))
+                return False
+            # unlocked wallets are reported as "<name> *"
+            wallets=[w[:-2] for w in retArr if w.endswith(" *")]
+            return wallets
+
         p = re.compile(r'\s+\"(\w+)\s\*\",?\n', re.MULTILINE)
         cmd="%s %s wallet list" % (Utils.EosClientPath, self.getArgs())
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
@@ -252,6 +403,16 @@ class WalletMgr(object):
     def getKeys(self, wallet):
         keys=[]
 
+        if self.useRpc():
+            try:
+                retArr=self.rpc().wallet("list_keys", [wallet.name, wallet.password])
+            except RpcError as ex:
+                Utils.Print("ERROR: Failed to get keys. %s" % (ex.output))
+                return False
+            # list_keys returns [public key, private key] pairs
+            keys=[pair[1] for pair in retArr]
+            return keys
+
         p = re.compile(r'\n\s+\"(\w+)\"\n', re.MULTILINE)
         cmd="%s %s wallet private_keys --name %s --password %s " % (Utils.EosClientPath, self.getArgs(), wallet.name, wallet.password)
         if Utils.Debug: Utils.Print("cmd: %s" % (cmd))
@@ -261,11 +261,9 @@ def myTest(transWillEnterBlock):
         Print("Creating wallet \"%s\"." % (testWalletName))
         testWallet=walletMgr.create(testWalletName)
 
-        for account in accounts:
-            Print("Importing keys for account %s into wallet %s." % (account.name, testWallet.name))
-            if not walletMgr.importKey(account, testWallet):
-                error("Failed to import key for account %s" % (account.name))
-                return False
+        if not walletMgr.importKeys(accounts, testWallet):
+            error("Failed to import account keys into wallet %s" % (testWallet.name))
+            return False
 
         node=cluster.getNode(0)
         node2=cluster.getNode(1)
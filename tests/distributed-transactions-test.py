@@ -11,7 +11,7 @@ Print=Utils.Print
 errorExit=Utils.errorExit
 
 args=TestHelper.parse_args({"-p","-n","-d","-s","--nodes-file","--seed","--p2p-plugin"
-                           ,"--dump-error-details","-v","--leave-running","--clean-run","--keep-logs"})
+                           ,"--dump-error-details","-v","--leave-running","--clean-run","--keep-logs","--snapshot-cache"})
 
 pnodes=args.p
 topo=args.s
@@ -26,6 +26,7 @@ dumpErrorDetails=args.dump_error_details
 killAll=args.clean_run
 keepLogs=args.keep_logs
 p2pPlugin=args.p2p_plugin
+snapshotCacheDir=args.snapshot_cache
 
 killWallet=not dontKill
 killEosInstances=not dontKill
@@ -63,7 +64,7 @@ try:
                (pnodes, total_nodes-pnodes, topo, delay))
 
         Print("Stand up cluster")
-        if cluster.launch(pnodes, total_nodes, topo=topo, delay=delay, p2pPlugin=p2pPlugin) is False:
+        if cluster.launch(pnodes, total_nodes, topo=topo, delay=delay, p2pPlugin=p2pPlugin, snapshotCacheDir=snapshotCacheDir) is False:
             errorExit("Failed to stand up eos cluster.")
 
         Print ("Wait for Cluster stabilization")
@@ -71,6 +72,9 @@ try:
         if not cluster.waitOnClusterBlockNumSync(3):
             errorExit("Cluster never stabilized")
 
+    Print("Monitor the nodes for divergence")
+    cluster.startDivergenceMonitor()
+
     accountsCount=total_nodes
     walletName="MyWallet-%d" % (random.randrange(10000))
     Print("Creating wallet %s if one doesn't already exist." % walletName)
@@ -93,12 +97,15 @@ try:
     if not cluster.createAccounts(eosioAccount):
         errorExit("Accounts creation failed.")
 
-    Print("Spread funds and validate")
-    if not cluster.spreadFundsAndValidate(10):
+    Print("Spread funds down a tree of fanout 4 and validate")
+    if not cluster.spreadFundsAndValidate(10, fanout=4):
         errorExit("Failed to spread and validate funds.")
 
     print("Funds spread validated")
 
+    # raises a divergence found while the nodes are still up
+    cluster.stopDivergenceMonitor()
+
     if not dontKill:
         cluster.killall(allInstances=killAll)
     else:
@@ -99,11 +99,9 @@ try:
 
     Print("Wallet \"%s\" password=%s." % (testWalletName, testWallet.password.encode("utf-8")))
 
-    for account in accounts:
-        Print("Importing keys for account %s into wallet %s." % (account.name, testWallet.name))
-        if not walletMgr.importKey(account, testWallet):
-            cmdError("%s wallet import" % (ClientName))
-            errorExit("Failed to import key for account %s" % (account.name))
+    if not walletMgr.importKeys(accounts, testWallet):
+        cmdError("%s wallet import" % (ClientName))
+        errorExit("Failed to import account keys into wallet %s" % (testWallet.name))
 
     defproduceraWalletName="defproducera"
     Print("Creating wallet \"%s\"." % (defproduceraWalletName))
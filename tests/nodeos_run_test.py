@@ -22,7 +22,7 @@ from core_symbol import CORE_SYMBOL
 
 args = TestHelper.parse_args({"--host","--port","--prod-count","--defproducera_prvt_key","--defproducerb_prvt_key","--mongodb"
                               ,"--dump-error-details","--dont-launch","--keep-logs","-v","--leave-running","--only-bios","--clean-run"
-                              ,"--sanity-test","--p2p-plugin","--wallet-port"})
+                              ,"--sanity-test","--p2p-plugin","--wallet-port","--use-cleos","--snapshot-cache"})
 server=args.host
 port=args.port
 debug=args.v
@@ -39,8 +39,10 @@ killAll=args.clean_run
 sanityTest=args.sanity_test
 p2pPlugin=args.p2p_plugin
 walletPort=args.wallet_port
+snapshotCacheDir=args.snapshot_cache
 
 Utils.Debug=debug
+Utils.setUseCleos(args.use_cleos)
 localTest=True if server == TestHelper.LOCAL_HOST else False
 cluster=Cluster(host=server, port=port, walletd=True, enableMongo=enableMongo, defproduceraPrvtKey=defproduceraPrvtKey, defproducerbPrvtKey=defproducerbPrvtKey)
 walletMgr=WalletMgr(True, port=walletPort)
@@ -67,7 +69,11 @@ try:
         cluster.killall(allInstances=killAll)
         cluster.cleanup()
         Print("Stand up cluster")
-        if cluster.launch(prodCount=prodCount, onlyBios=onlyBios, dontBootstrap=dontBootstrap, p2pPlugin=p2pPlugin) is False:
+        # node 00 streams blocks and traces to the test over state history, which requires --disable-replay-opts
+        stateHistoryArgs={0: "--plugin eosio::state_history_plugin --trace-history --chain-state-history --disable-replay-opts "
+                             "--state-history-endpoint 127.0.0.1:8080"}
+        if cluster.launch(prodCount=prodCount, onlyBios=onlyBios, dontBootstrap=dontBootstrap, p2pPlugin=p2pPlugin, snapshotCacheDir=snapshotCacheDir,
+                          specificExtraNodeosArgs=stateHistoryArgs) is False:
             cmdError("launcher")
             errorExit("Failed to stand up eos cluster.")
     else:
@@ -121,11 +127,9 @@ try:
 
     Print("Wallet \"%s\" password=%s." % (testWalletName, testWallet.password.encode("utf-8")))
 
-    for account in accounts:
-        Print("Importing keys for account %s into wallet %s." % (account.name, testWallet.name))
-        if not walletMgr.importKey(account, testWallet):
-            cmdError("%s wallet import" % (ClientName))
-            errorExit("Failed to import key for account %s" % (account.name))
+    if not walletMgr.importKeys(accounts, testWallet):
+        cmdError("%s wallet import" % (ClientName))
+        errorExit("Failed to import account keys into wallet %s" % (testWallet.name))
 
     defproduceraWalletName="defproducera"
     Print("Creating wallet \"%s\"." % (defproduceraWalletName))
@@ -309,6 +313,25 @@ try:
     if typeVal != "transfer" or amountVal != 975311:
         errorExit("FAILURE - get transaction trans_id failed: %s %s %s" % (transId, typeVal, amountVal), raw=True)
 
+    if node.stateHistory is not None:
+        Print("Validate transfer trace streamed from state history")
+        blockNum=node.getBlockIdByTransId(transId)
+        traces=node.getTransactionTraces(blockNum, blockNum)
+        trace=traces.get(transId)
+        transferData=node.transactionBuilder().getAbi("eosio.token").serializeActionData("transfer", {
+            "from": testeraAccount.name, "to": currencyAccount.name, "quantity": transferAmount, "memo": "test transfer a->b"}).hex()
+        try:
+            assert(trace["status"] == 0) # executed
+            _,actionTrace=trace["action_traces"][0]
+            assert(actionTrace["act"]["account"] == "eosio.token")
+            assert(actionTrace["act"]["name"] == "transfer")
+            assert(actionTrace["act"]["data"] == transferData)
+        except (AssertionError, TypeError, KeyError, IndexError) as _:
+            Print("Trace validation failed. Block %s traces: %s" % (blockNum, traces))
+            raise
+    else:
+        Print("Node 00 does not run the state history plugin, skipping the transfer trace validation")
+
     Print("Currency Contract Tests")
     Print("verify no contract in place")
     Print("Get code hash for account %s" % (currencyAccount.name))
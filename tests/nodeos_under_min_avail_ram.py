@@ -101,8 +101,7 @@ try:
     Print("Creating wallet \"%s\"." % (testWalletName))
     testWallet=walletMgr.create(testWalletName, [cluster.eosioAccount])
 
-    for _, account in cluster.defProducerAccounts.items():
-        walletMgr.importKey(account, testWallet, ignoreDupKeyWarning=True)
+    walletMgr.importKeys(list(cluster.defProducerAccounts.values()), testWallet, ignoreDupKeyWarning=True)
 
     Print("Wallet \"%s\" password=%s." % (testWalletName, testWallet.password.encode("utf-8")))
 
@@ -113,8 +112,7 @@ try:
     nodes.append(cluster.getNode(3))
 
 
-    for account in accounts:
-        walletMgr.importKey(account, testWallet)
+    walletMgr.importKeys(accounts, testWallet)
 
     # create accounts via eosio as otherwise a bid is needed
     for account in accounts:
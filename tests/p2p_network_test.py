@@ -113,11 +113,9 @@ testWalletName="test"
 Print("Creating wallet \"%s\"." % (testWalletName))
 testWallet=walletMgr.create(testWalletName)
 
-for account in accounts:
-    Print("Importing keys for account %s into wallet %s." % (account.name, testWallet.name))
-    if not walletMgr.importKey(account, testWallet):
-        cmdError("%s wallet import" % (ClientName))
-        errorExit("Failed to import key for account %s" % (account.name))
+if not walletMgr.importKeys(accounts, testWallet):
+    cmdError("%s wallet import" % (ClientName))
+    errorExit("Failed to import account keys into wallet %s" % (testWallet.name))
 
 defproduceraWalletName="defproducera"
 Print("Creating wallet \"%s\"." % (defproduceraWalletName))
@@ -171,7 +169,7 @@ try:
                 if host in successhosts:
                     continue
                 if len(checkacct) > 0:
-                    actBal = cluster.getNode(i).getAccountBalance(checkacct)
+                    actBal = cluster.getNode(i).getBalances([checkacct])[0]
                     if expBal == actBal:
                         Print("acct balance verified in host %s" % (host))
                     else:
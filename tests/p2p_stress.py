@@ -1,17 +1,16 @@
 import testUtils
 import p2p_test_peers
 import random
-import time
 import copy
-import threading
 
 from core_symbol import CORE_SYMBOL
+from LoadGenerator import LoadGenerator
+from LoadGenerator import Schedule
+from Node import Node
 
 class StressNetwork:
     speeds=[1,5,10,30,60,100,500]
     sec=10
-    maxthreads=100
-    trList=[]
 
     def maxIndex(self):
         return len(self.speeds)
@@ -22,11 +21,6 @@ class StressNetwork:
             s=s+random.choice("abcdefghijklmnopqrstuvwxyz12345")
         return s
     
-    def _transfer(self, node, acc1, acc2, amount, threadId, round):
-        memo="%d %d" % (threadId, round)
-        tr = node.transferFunds(acc1, acc2, amount, memo)
-        self.trList.append(tr)
-
     def execute(self, cmdInd, node, ta, eosio):
         print("\n==== network stress test: %d transaction(s)/s for %d secs ====" % (self.speeds[cmdInd], self.sec))
         total = self.speeds[cmdInd] * self.sec
@@ -61,44 +55,19 @@ class StressNetwork:
         print("transaction id %s" % (trid))
         node.waitForTransInBlock(trid)
 
-        self.trList = []
-        expBal = 0
-        nthreads=self.maxthreads
-        if nthreads > self.speeds[cmdInd]:
-            nthreads = self.speeds[cmdInd]
-        cycle = int(total / nthreads)
-        total = cycle * nthreads # rounding
-        delay = 1.0 / self.speeds[cmdInd] * nthreads
-
-        print("start currency0000 trasfer from %s to %s for %d times with %d threads" % (acc1.name, acc2.name, total, nthreads))
+        amount = 1
+        quantity = Node.currencyIntToStr(amount, CORE_SYMBOL)
+        def makeActions(i):
+            return [Node.makeTransferAction(acc1, acc2, quantity, "%d %d" % (cmdInd, i))]
 
-        t00 = time.time()
-        for k in range(cycle):
-            t0 = time.time()
-            amount = 1
-            threadList = []
-            for m in range(nthreads):
-                th = threading.Thread(target = self._transfer,args = (node, acc1, acc2, amount, m, k))
-                th.start()
-                threadList.append(th)
-            for th in threadList:
-                th.join()
-            expBal = expBal + amount * nthreads
-            t1 = time.time()
-            if (t1-t0 < delay):
-                time.sleep(delay - (t1-t0))
-        t11 = time.time()
-        print("time used = %lf" % (t11 - t00))
+        print("start currency0000 transfer from %s to %s for %d times" % (acc1.name, acc2.name, total))
+        generator = LoadGenerator(node, Schedule.constant(self.speeds[cmdInd], self.sec), makeActions, {acc1.name: acc1}, reportInterval=1)
+        stats = generator.run()
+        expBal = amount * stats.irreversible
 
-        actBal = node.getAccountBalance(acc2.name)
+        actBal = node.getBalances([acc2.name])[0]
         print("account %s: expect Balance:%d, actual Balance %d" % (acc2.name, expBal, actBal))
-
-        transIdlist = []
-        for tr in self.trList:
-            trid = node.getTransId(tr)
-            transIdlist.append(trid)
-            node.waitForTransInBlock(trid)
-        return (transIdlist, acc2.name, expBal, "")
+        return (generator.transIds, acc2.name, expBal, "")
     
     def on_exit(self):
         print("end of network stress tests")
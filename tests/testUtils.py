@@ -3,9 +3,9 @@ import subprocess
 import time
 import os
 import platform
+import random
 from collections import deque
 from collections import namedtuple
-import inspect
 import json
 import shlex
 import socket
@@ -13,9 +13,12 @@ from sys import stdout
 from sys import exit
 import traceback
 
+from Logger import Logger
+
 ###########################################################################################
 class Utils:
     Debug=False
+    Log=Logger()
     FNull = open(os.devnull, 'w')
 
     EosClientPath="programs/cleos/cleos"
@@ -36,10 +39,22 @@ class Utils:
 
     @staticmethod
     def Print(*args, **kwargs):
-        stackDepth=len(inspect.stack())-2
-        s=' '*stackDepth
-        stdout.write(s)
-        print(*args, **kwargs)
+        """print(), through Utils.Log. The level is inferred from an ERROR/FAILURE/WARNING prefix."""
+        if kwargs.get("file") is not None and kwargs["file"] is not stdout:
+            print(*args, **kwargs)
+            return
+        msg=kwargs.get("sep", " ").join(str(arg) for arg in args)
+        depth=Logger.callDepth(1)-1 if Utils.Log.trackDepth else 0
+        Utils.Log.log(Logger.levelOf(msg), msg, end=kwargs.get("end", "\n"), depth=depth)
+        if kwargs.get("flush"):
+            Utils.Log.flush()
+
+    @staticmethod
+    def setLogPolicy(level=None, trackDepth=None, jsonLogFile=None):
+        """level is one of the Logger levels. jsonLogFile additionally writes every record as a line of json to that file."""
+        if level is not None: Utils.Log.level=level
+        if trackDepth is not None: Utils.Log.trackDepth=trackDepth
+        if jsonLogFile is not None: Utils.Log.setJsonLogFile(jsonLogFile)
 
     SyncStrategy=namedtuple("ChainSyncStrategy", "name id arg")
 
@@ -53,6 +68,10 @@ class Utils:
 
     systemWaitTimeout=90
     irreversibleTimeout=60
+    rpcTimeout=30
+
+    # When True, Node queries go through cleos processes instead of the built-in HTTP RPC client
+    UseCleos=False
 
     @staticmethod
     def setIrreversibleTimeout(timeout):
@@ -62,6 +81,10 @@ class Utils:
     def setSystemWaitTimeout(timeout):
         Utils.systemWaitTimeout=timeout
 
+    @staticmethod
+    def setUseCleos(useCleos):
+        Utils.UseCleos=useCleos
+
     @staticmethod
     def getChainStrategies():
         chainSyncStrategies={}
@@ -96,6 +119,7 @@ class Utils:
             Utils.Print("ERROR:" if not raw else "", " errorExit called during shutdown, ignoring.  msg=", msg)
             return
         Utils.Print("ERROR:" if not raw else "", msg)
+        Utils.Log.flush()
         traceback.print_stack(limit=-1)
         exit(errorCode)
 
@@ -104,37 +128,95 @@ class Utils:
         msg="FAILURE - %s%s" % (name, ("" if cmdCode == 0 else (" returned error code %d" % cmdCode)))
         Utils.Print(msg)
 
+    # Polling schedule for waitForObj. Probes start waitInitialInterval apart and back off by waitBackoffFactor
+    # up to waitMaxInterval, each sleep randomized by +/- waitJitter (fraction of the sleep).
+    waitInitialInterval=0.25
+    waitMaxInterval=3
+    waitBackoffFactor=1.5
+    waitJitter=0.1
+    # nodeos block interval, used until a node's actual block rate has been observed
+    BlockInterval=0.5
+
     @staticmethod
-    def waitForObj(lam, timeout=None):
+    def setWaitPolicy(initialInterval=None, maxInterval=None, backoffFactor=None, jitter=None):
+        if initialInterval is not None: Utils.waitInitialInterval=initialInterval
+        if maxInterval is not None: Utils.waitMaxInterval=maxInterval
+        if backoffFactor is not None: Utils.waitBackoffFactor=backoffFactor
+        if jitter is not None: Utils.waitJitter=jitter
+
+    # pylint: disable=too-many-arguments
+    @staticmethod
+    def nextWaitDelay(backoffSleep, sleepTime, maxSleepTime, remaining, estimate=None):
+        """One step of the waitForObj schedule, shared with the asyncio wait helpers. Returns (delay, next backoffSleep)."""
+        delay=backoffSleep
+        backoffSleep=min(backoffSleep*Utils.waitBackoffFactor, maxSleepTime)
+        if estimate is not None:
+            # sleep until the expected time, but still re-probe at least every maxSleepTime
+            delay=min(max(estimate, sleepTime/2), maxSleepTime)
+        if Utils.waitJitter > 0:
+            delay*=random.uniform(1-Utils.waitJitter, 1+Utils.waitJitter)
+        return (min(delay, remaining), backoffSleep)
+
+    @staticmethod
+    def waitDelays(timeout=None, sleepTime=None, maxSleepTime=None, nextProbe=None):
+        """The waitForObj schedule, shared with the asyncio wait helpers: an iterator of (delay, remaining seconds) to sleep
+        after each probe that did not succeed, ending once timeout (default 60) seconds have passed since this call."""
         if timeout is None:
             timeout=60
+        if sleepTime is None:
+            sleepTime=Utils.waitInitialInterval
+        if maxSleepTime is None:
+            maxSleepTime=max(Utils.waitMaxInterval, sleepTime)
 
         endTime=time.time()+timeout
+        def delays():
+            backoffSleep=sleepTime
+            while True:
+                remaining=endTime - time.time()
+                if remaining <= 0:
+                    return
+                estimate=nextProbe() if nextProbe is not None else None
+                delay,backoffSleep=Utils.nextWaitDelay(backoffSleep, sleepTime, maxSleepTime, remaining, estimate)
+                yield (delay, remaining)
+        return delays()
+
+    @staticmethod
+    def waitForObj(lam, timeout=None, sleepTime=None, maxSleepTime=None, nextProbe=None):
+        """Call lam until it returns something other than None, or timeout (default 60) seconds pass, in which case None is returned.
+        sleepTime/maxSleepTime override Utils.waitInitialInterval/waitMaxInterval. nextProbe is an optional function returning the
+        number of seconds until the condition is expected to become true (e.g. when a target block should arrive), or None if
+        unknown. Its estimate replaces the backoff schedule for that sleep. lam is always probed once more at the deadline."""
         needsNewLine=False
+        sleptSinceDot=0
+        delays=Utils.waitDelays(timeout, sleepTime=sleepTime, maxSleepTime=maxSleepTime, nextProbe=nextProbe)
         try:
-            while endTime > time.time():
+            while True:
                 ret=lam()
                 if ret is not None:
                     return ret
-                sleepTime=3
+                step=next(delays, None)
+                if step is None:
+                    return None
+                delay,remaining=step
+
                 if Utils.Debug:
-                    Utils.Print("cmd: sleep %d seconds, remaining time: %d seconds" %
-                                (sleepTime, endTime - time.time()))
+                    Utils.Print("cmd: sleep %.3f seconds, remaining time: %d seconds" % (delay, remaining))
                 else:
-                    stdout.write('.')
-                    stdout.flush()
-                    needsNewLine=True
-                time.sleep(sleepTime)
+                    sleptSinceDot+=delay
+                    if sleptSinceDot >= 3:
+                        sleptSinceDot=0
+                        stdout.write('.')
+                        stdout.flush()
+                        needsNewLine=True
+                time.sleep(delay)
         finally:
             if needsNewLine:
                 Utils.Print()
 
-        return None
-
     @staticmethod
-    def waitForBool(lam, timeout=None):
+    def waitForBool(lam, timeout=None, sleepTime=None, maxSleepTime=None, nextProbe=None):
         myLam = lambda: True if lam() else None
-        ret=Utils.waitForObj(myLam, timeout)
+        ret=Utils.waitForObj(myLam, timeout, sleepTime=sleepTime, maxSleepTime=maxSleepTime, nextProbe=nextProbe)
         return False if ret is None else ret
 
     @staticmethod